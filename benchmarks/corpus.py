@@ -0,0 +1,102 @@
+"""Synthetic quarterly report corpora for the offline benchmarks.
+
+PDF reports carry an income statement page with the current and prior-year
+quarter behind filler pages, like the interim reports on the CSE site, together
+with the multi-period extraction response Gemini would return for each of them. CSV corpora match the processed datasets.
+"""
+import os
+import json
+import hashlib
+import pandas as pd
+from src.backend.core.config import FILES_METADATA
+from src.backend.services.fact_store import facts_from_frame
+
+COMPANIES = {"DIPD": "Dipped Products PLC", "REXP": "Richard Pieris Exports PLC"}
+METRICS = ["Revenue", "COGS", "Gross Profit", "Operating Expenses", "Operating Income", "Net Income"]
+
+#Statement headings matched by each company's keyword_regex
+STATEMENT_HEADINGS = {"DIPD": "STATEMENT OF PROFIT OR LOSS", "REXP": "CONSOLIDATED INCOME STATEMENT"}
+
+FILLER_TEXT = (
+    "The Board of Directors is pleased to present the interim financial statements for the period. "
+    "These statements have been prepared in accordance with Sri Lanka Accounting Standard LKAS 34. "
+    "The accounting policies are consistent with those of the previous financial year."
+)
+
+#The last `count` quarter-end periods up to December of `last_year`, oldest first
+def quarter_periods(count, last_year=2024):
+    last = last_year * 4 + 3
+    return [f"{(ordinal % 4 + 1) * 3:02d}/{ordinal // 4}" for ordinal in range(last - count + 1, last + 1)]
+
+#Deterministic P&L figures for a company's n-th quarter
+def quarter_values(offset, step):
+    revenue = 1_000_000 * (offset + 2) + 37_000 * step
+    cogs = -int(revenue * 0.62)
+    opex = -int(revenue * 0.15)
+    gross = revenue + cogs
+    return dict(zip(METRICS, [revenue, cogs, gross, opex, gross + opex, int((gross + opex) * 0.7)]))
+
+#Wide frame in the processed csv layout
+def wide_frame(offset, periods):
+    wide = {"Data Point Name": METRICS}
+    for step, period in enumerate(periods):
+        wide[period] = list(quarter_values(offset, step).values())
+    return pd.DataFrame(wide)
+
+#Long-format facts for the given years, one frame for all companies
+def synthetic_facts(years=(2022, 2023, 2024)):
+    periods = quarter_periods(len(years) * 4, years[-1])
+    frames = [
+        facts_from_frame(wide_frame(offset, periods), {"symbol": symbol, "company": company}, "synthetic")
+        for offset, (symbol, company) in enumerate(COMPANIES.items())
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+#Processed csvs with `quarters` periods per company
+def write_csv_corpus(data_path, quarters=40):
+    os.makedirs(data_path, exist_ok=True)
+    periods = quarter_periods(quarters)
+    symbols = list(COMPANIES)
+    for filename, metadata in FILES_METADATA.items():
+        wide_frame(symbols.index(metadata["symbol"]), periods).to_csv(os.path.join(data_path, filename), index=False)
+    return len(periods) * len(METRICS) * len(FILES_METADATA)
+
+#Interim report PDFs under root/reports/<symbol>/ and the recorded extraction response for each
+def write_pdf_corpus(root, reports=8, filler_pages=3):
+    import fitz
+    periods = quarter_periods(reports)
+    reports_by_symbol, recordings = {}, {}
+
+    for offset, (symbol, company) in enumerate(COMPANIES.items()):
+        report_dir = os.path.join(root, "reports", symbol)
+        os.makedirs(report_dir, exist_ok=True)
+        reports_by_symbol[symbol] = []
+
+        #Newest report first, like the Financials tab
+        for step, period in reversed(list(enumerate(periods))):
+            values = quarter_values(offset, step)
+            doc = fitz.open()
+            for page_number in range(filler_pages):
+                page = doc.new_page()
+                page.insert_textbox(fitz.Rect(72, 72, 540, 770), f"{company}\nInterim report, page {page_number + 1}\n\n{FILLER_TEXT}", fontsize=10)
+
+            #Current quarter next to the prior-year comparative, like the published statements
+            prior_period, prior_values = f"{period[:3]}{int(period[3:]) - 1}", quarter_values(offset, step - 4)
+            page = doc.new_page()
+            lines = [company, STATEMENT_HEADINGS[symbol], "Group", f"{'3 months ended':<24} {period:>12} {prior_period:>12}", "Rs. '000", ""]
+            lines += [f"{metric:<24} {value / 1000:>12,.0f} {prior_values[metric] / 1000:>12,.0f}" for metric, value in values.items()]
+            page.insert_textbox(fitz.Rect(72, 72, 540, 770), "\n".join(lines), fontsize=10, fontname="cour")
+
+            relative_path = f"reports/{symbol}/report_{period.replace('/', '_')}.pdf"
+            doc.save(os.path.join(root, relative_path))
+            doc.close()
+
+            with open(os.path.join(root, relative_path), "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            recordings[digest] = json.dumps({"Columns": [
+                {"Period": period, "Months": 3, "Role": "current", **{metric: str(value) for metric, value in values.items()}},
+                {"Period": prior_period, "Months": 3, "Role": "comparative", **{metric: str(value) for metric, value in prior_values.items()}},
+            ]})
+            reports_by_symbol[symbol].append(relative_path)
+
+    return reports_by_symbol, recordings
@@ -0,0 +1,352 @@
+"""End-to-end offline benchmark.
+
+Runs every pipeline stage in a temporary workspace against the local fakes in
+benchmarks/fakes.py and reports throughput, p50/p95 latency and peak memory per
+stage. Exits with status 1 when a stage regresses beyond the tolerance.
+
+    python -m benchmarks.e2e_benchmark
+    python -m benchmarks.e2e_benchmark --reports 12 --quarters 80 --repeat 10 --rounds 5
+    python -m benchmarks.e2e_benchmark --update-baseline export
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import contextlib
+import logging
+import argparse
+import tempfile
+import tracemalloc
+import pyarrow as pa
+from fastapi.testclient import TestClient
+from src.backend.core.config import DIPPED_PLC_URL, RICHARD_PLC_URL, PROCESSED_CSV_DATA_PATH, CHECKPOINT_DIR, CATALOGUE_DIR, RAW_STORE_DIR, COMPANY_CONFIGS
+from src.backend.services import container
+from src.backend.services.web_scrape import web_scrape
+from src.backend.services.scrape_scheduler import check_filings
+from src.backend.services.extract_data import data_extractor
+from src.backend.services.dataset_creation import create_dataset
+from src.backend.services.data_analysis import check_datasets
+from src.backend.services.fact_store import get_fact_frame, fact_source
+from src.backend.services.analytics import compute_analytics
+from src.backend.services.snapshot import publish_snapshot, load_snapshot
+from src.backend.services.data_export import export_stream
+from src.backend.services.rag_vector_save import rag_pipeline
+from src.backend.services.rag_retriver import query_process_agent
+from src.backend.services.ingest_pipeline import start_ingest
+from src.backend.main import app
+from benchmarks.corpus import write_pdf_corpus, write_csv_corpus, COMPANIES, METRICS
+from benchmarks.fakes import FakeCSESite, InMemoryVectorStore, install_fakes
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "data", "e2e_baseline.json")
+
+#Single-measure lookups served by the fast path
+FAST_PATH_QUERIES = [
+    "What is the gross profit margin of DIPD in Q2 2024?",
+    "REXP revenue",
+    "Net income of Dipped Products in Q4 2024",
+    "What was the operating margin of Richard Pieris in September 2024?",
+]
+
+#Screening sheet: every template asked for every company in one batch request
+SCREEN_TEMPLATES = [
+    "What is the gross profit margin of {symbol} in Q2 2024?",
+    "{symbol} revenue",
+    "Why did the net income of {symbol} change in Q4 2024?",
+    "Explain the net income of {company} in Q4 2024",
+    "Analyze the operating expenses and gross profit of {company} in 2024",
+]
+
+#Follow-ups asked in one session after "Why did the net income of REXP change in Q4 2024?"
+FOLLOW_UP_QUERIES = [
+    "Explain that in more detail",
+    "and what about the previous quarter?",
+    "Why did it change?",
+    "and for DIPD?",
+]
+
+#Questions that go through planning, retrieval and synthesis
+PLANNED_QUERIES = [
+    "Compare the revenue of DIPD and REXP in Q3 2024",
+    "Why did the net income of REXP change in Q4 2024?",
+    "Analyze the operating expenses and gross profit of Dipped Products in 2024",
+    "Compare the revenue growth of both companies",
+]
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+#One untimed warm-up call, `iterations` timed calls of run(i), then one call under tracemalloc for the memory peak
+def measure(name, run, iterations, items_per_iteration):
+    run(0)
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        run(i)
+        latencies.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    run(iterations)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return name, {
+        "iterations": iterations,
+        "items": items_per_iteration,
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "throughput": round(items_per_iteration * iterations / sum(latencies), 2),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+def require(condition, message):
+    if not condition:
+        raise RuntimeError(f"Benchmark sanity check failed: {message}")
+
+def run(reports=8, quarters=40, repeat=5, llm_latency=0.0):
+    workspace = tempfile.mkdtemp(prefix="e2e-benchmark-")
+    cwd = os.getcwd()
+    results = {}
+    try:
+        os.chdir(workspace)
+        reports_by_symbol, recordings = write_pdf_corpus(workspace, reports=reports)
+
+        with FakeCSESite(workspace, reports_by_symbol) as site:
+            install_fakes(recordings=recordings, site=site, llm_latency=llm_latency)
+            pdfs = reports * len(COMPANIES)
+
+            #Full report download from the fake CSE site, starting without a catalogue or raw store each time
+            def scrape(_):
+                shutil.rmtree(CATALOGUE_DIR, ignore_errors=True)
+                shutil.rmtree(RAW_STORE_DIR, ignore_errors=True)
+                for config in COMPANY_CONFIGS.values():
+                    shutil.rmtree(config["input_dir"], ignore_errors=True)
+                for url in (DIPPED_PLC_URL, RICHARD_PLC_URL):
+                    asyncio.run(web_scrape(url))
+            name, stats = measure("scrape", scrape, repeat, pdfs)
+            results[name] = stats
+
+            #Scheduled check of both listings when there are no new filings
+            def filing_check(_):
+                summary = asyncio.run(check_filings(ingest=False))
+                require(summary["new_reports"] == 0, f"unexpected new filings: {summary}")
+            name, stats = measure("filing_check", filing_check, repeat, len(COMPANIES))
+            results[name] = stats
+
+            #Income statement page extraction
+            def extract(_):
+                result = asyncio.run(data_extractor())
+                require(not result["failed_pdfs"], f"extraction failed for {result['failed_pdfs']}")
+            name, stats = measure("extract", extract, repeat, pdfs)
+            results[name] = stats
+
+            #Dataset creation from the recorded Gemini responses
+            name, stats = measure("dataset", lambda _: asyncio.run(create_dataset()), repeat, pdfs)
+            results[name] = stats
+            report = check_datasets()
+            require(all(entry.get("periods") == reports and entry.get("nulls") == 0 for entry in report.values()),
+                    f"unexpected processed datasets: {report}")
+
+            #Staged pipeline from the reports to the vector store, starting without checkpoints each time
+            def pipeline(_):
+                shutil.rmtree(CHECKPOINT_DIR, ignore_errors=True)
+                store = InMemoryVectorStore(embeddings=container.get("embeddings"))
+                container.override("vector_store", store)
+                async def ingest_all():
+                    run = start_ingest()
+                    await run.task
+                    return run
+                run = asyncio.run(ingest_all())
+                require(run.state == "done" and not run.errors, f"pipeline run failed: {run.summary()}")
+                require(len(store.documents) == pdfs * len(METRICS), f"expected {pdfs * len(METRICS)} documents, stored {len(store.documents)}")
+            name, stats = measure("pipeline", pipeline, repeat, pdfs)
+            results[name] = stats
+
+            #Larger csv corpus for analytics, ingest and chat
+            facts = write_csv_corpus(PROCESSED_CSV_DATA_PATH, quarters=quarters)
+            version = publish_snapshot()
+
+            #Mapping a published snapshot, as a worker does when the version changes
+            def snapshot(_):
+                loaded = load_snapshot(version)
+                require(len(loaded["facts"]) == facts, f"snapshot holds {len(loaded['facts'])} facts, expected {facts}")
+            name, stats = measure("snapshot", snapshot, repeat, facts)
+            results[name] = stats
+
+            #Full Arrow export of the served snapshot, as the export endpoint streams it
+            def export(_):
+                source, _version = fact_source()
+                rows = pa.ipc.open_stream(b"".join(export_stream(source, "arrow"))).read_all().num_rows
+                require(rows == facts, f"export streamed {rows} facts, expected {facts}")
+            name, stats = measure("export", export, repeat, facts)
+            results[name] = stats
+
+            name, stats = measure("analytics", lambda _: compute_analytics(get_fact_frame()), repeat, quarters * len(COMPANIES))
+            results[name] = stats
+
+            #Embedding and upsert into a fresh store each time
+            def ingest(_):
+                store = InMemoryVectorStore(embeddings=container.get("embeddings"))
+                container.override("vector_store", store)
+                require(asyncio.run(rag_pipeline()) == "succesfully stored", "rag pipeline did not store documents")
+                require(len(store.documents) == facts, f"expected {facts} documents, stored {len(store.documents)}")
+            name, stats = measure("ingest", ingest, repeat, facts)
+            results[name] = stats
+
+            #Chat queries through the API route, one query per iteration
+            client = TestClient(app)
+            def chat(queries, expect_fast_path):
+                def ask(i):
+                    response = client.post("/query/v1/query_data", json={"query": queries[i % len(queries)]})
+                    require(response.status_code == 200, f"chat returned {response.status_code}: {response.text}")
+                    answered_directly = response.json().startswith(tuple(f"{company} (" for company in COMPANIES.values()))
+                    require(answered_directly == expect_fast_path, f"unexpected route for '{queries[i % len(queries)]}': {response.json()}")
+                return ask
+            name, stats = measure("chat_fast_path", chat(FAST_PATH_QUERIES, True), repeat * len(FAST_PATH_QUERIES), 1)
+            results[name] = stats
+            name, stats = measure("chat_planned", chat(PLANNED_QUERIES, False), repeat * len(PLANNED_QUERIES), 1)
+            results[name] = stats
+
+            #ReAct agent, the chat route's answer path when AGENT_MODE is not "plan": one data tool call and a QA chain per question
+            def react(i):
+                #The agent executor is verbose; its transcript would bury the report
+                with contextlib.redirect_stdout(io.StringIO()):
+                    answer = asyncio.run(query_process_agent(PLANNED_QUERIES[i % len(PLANNED_QUERIES)]))
+                require(answer.startswith("Based on the retrieved data"), f"unexpected ReAct answer: {answer}")
+            name, stats = measure("chat_react", react, repeat * len(PLANNED_QUERIES), 1)
+            results[name] = stats
+
+            #Follow-ups in a session that already asked a planned question; retrieved facts are reused
+            def follow_up(i):
+                session_id = f"benchmark-{i}"
+                client.post("/query/v1/query_data", json={"query": PLANNED_QUERIES[1], "session_id": session_id})
+                for query in FOLLOW_UP_QUERIES:
+                    response = client.post("/query/v1/query_data", json={"query": query, "session_id": session_id})
+                    require(response.status_code == 200, f"chat returned {response.status_code}: {response.text}")
+                    require(response.headers.get("X-Session-Id") == session_id, "session id was not echoed")
+            name, stats = measure("chat_follow_up", follow_up, repeat, len(FOLLOW_UP_QUERIES) + 1)
+            results[name] = stats
+
+            #Screening batch streamed back as NDJSON
+            screen = [template.replace("{symbol}", symbol).replace("{company}", company)
+                      for template in SCREEN_TEMPLATES for symbol, company in COMPANIES.items()]
+            def batch(_):
+                response = client.post("/query/v1/query_batch", json={"questions": screen})
+                require(response.status_code == 200, f"batch returned {response.status_code}: {response.text}")
+                lines = [json.loads(line) for line in response.text.splitlines()]
+                require(len(lines) == len(screen) + 1 and not any("error" in line for line in lines), f"unexpected batch result: {lines}")
+            name, stats = measure("chat_batch", batch, repeat, len(screen))
+            results[name] = stats
+
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    config = {"reports": reports, "quarters": quarters, "repeat": repeat, "llm_latency": llm_latency, "metrics": len(METRICS)}
+    return {"config": config, "stages": results}
+
+#Best result per stage over several rounds, which filters out scheduler and frequency noise like timeit does
+def best_of(rounds):
+    best = {"config": dict(rounds[0]["config"], rounds=len(rounds)), "stages": {}}
+    for stage in rounds[0]["stages"]:
+        samples = [result["stages"][stage] for result in rounds]
+        best["stages"][stage] = dict(
+            samples[0],
+            p50_ms=min(sample["p50_ms"] for sample in samples),
+            p95_ms=min(sample["p95_ms"] for sample in samples),
+            throughput=max(sample["throughput"] for sample in samples),
+            peak_kib=min(sample["peak_kib"] for sample in samples),
+        )
+    return best
+
+#Regressions against the baseline: slower p95, lower throughput or higher memory beyond the tolerance
+def compare(results, baseline, tolerance=0.3, floor_ms=2.0, floor_kib=64.0):
+    regressions = []
+    for stage, stats in results["stages"].items():
+        reference = baseline["stages"].get(stage)
+        if reference is None:
+            continue
+        if stats["p95_ms"] > reference["p95_ms"] * (1 + tolerance) and stats["p95_ms"] - reference["p95_ms"] > floor_ms:
+            regressions.append(f"{stage}: p95 {reference['p95_ms']} ms -> {stats['p95_ms']} ms")
+        slower_ms = (stats["items"] / stats["throughput"] - reference["items"] / reference["throughput"]) * 1000
+        if stats["throughput"] < reference["throughput"] / (1 + tolerance) and slower_ms > floor_ms:
+            regressions.append(f"{stage}: throughput {reference['throughput']} -> {stats['throughput']} items/s")
+        if stats["peak_kib"] > reference["peak_kib"] * (1 + tolerance) and stats["peak_kib"] - reference["peak_kib"] > floor_kib:
+            regressions.append(f"{stage}: peak memory {reference['peak_kib']} KiB -> {stats['peak_kib']} KiB")
+    return regressions
+
+#Replace the named stages in the stored baseline and keep every other stage as recorded, so a slowdown elsewhere
+#still fails compare(); without stage names, or when the config changed, the whole baseline is rewritten
+def update_baseline(path, results, stages):
+    unknown = [stage for stage in stages if stage not in results["stages"]]
+    if unknown:
+        raise SystemExit(f"Unknown stages {unknown}, expected some of {list(results['stages'])}")
+    baseline = None
+    if stages and os.path.exists(path):
+        with open(path) as f:
+            baseline = json.load(f)
+    if baseline is None or baseline["config"] != results["config"]:
+        baseline, stages = results, list(results["stages"])
+    else:
+        #New stages take their place in run order
+        merged = {}
+        for stage, stats in results["stages"].items():
+            if stage in stages or stage in baseline["stages"]:
+                merged[stage] = stats if stage in stages else baseline["stages"][stage]
+        merged.update({stage: stats for stage, stats in baseline["stages"].items() if stage not in merged})
+        baseline = {"config": baseline["config"], "stages": merged}
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2)
+        f.write("\n")
+    return stages
+
+def print_report(results):
+    print(f"config: {results['config']}")
+    print(f"{'stage':<16}{'iterations':>11}{'items':>8}{'p50 ms':>11}{'p95 ms':>11}{'items/s':>11}{'peak KiB':>11}")
+    for stage, stats in results["stages"].items():
+        print(f"{stage:<16}{stats['iterations']:>11}{stats['items']:>8}{stats['p50_ms']:>11}{stats['p95_ms']:>11}"
+              f"{stats['throughput']:>11}{stats['peak_kib']:>11}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end offline benchmark")
+    parser.add_argument("--reports", type=int, default=8, help="PDF reports per company (the CSE page lists at most 12)")
+    parser.add_argument("--quarters", type=int, default=40, help="quarters per company in the csv corpus")
+    parser.add_argument("--repeat", type=int, default=5, help="timed iterations per stage")
+    parser.add_argument("--rounds", type=int, default=3, help="full runs; the best result per stage is reported")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds added to every fake LLM call")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed relative regression against the baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", nargs="*", metavar="STAGE",
+                        help="store these results as the baseline; with stage names only those stages are replaced")
+    parser.add_argument("--verbose", action="store_true", help="keep application logging at INFO")
+    args = parser.parse_args()
+    if not 1 <= args.reports <= 12:
+        parser.error("--reports must be between 1 and 12")
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    results = best_of([run(args.reports, args.quarters, args.repeat, args.llm_latency) for _ in range(args.rounds)])
+    print_report(results)
+
+    if args.update_baseline is not None:
+        print(f"Baseline written to {args.baseline}: {update_baseline(args.baseline, results, args.update_baseline)}")
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        sys.exit(0)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline["config"] != results["config"]:
+        print(f"Baseline config {baseline['config']} does not match this run; not comparing")
+        sys.exit(2)
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nPERFORMANCE REGRESSIONS against baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.tolerance:.0%} of the baseline")
@@ -0,0 +1,253 @@
+"""Deterministic local stand-ins for Gemini, embeddings, Pinecone and the CSE site.
+
+Install them with `install_fakes(...)`, which registers each one through
+`container.override` so the application code runs unchanged and offline.
+"""
+import re
+import json
+import math
+import time
+import hashlib
+import threading
+from types import SimpleNamespace
+from collections import Counter
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from functools import partial
+from langchain_core.documents import Document
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from src.backend.services import container
+from src.backend.services.context_budget import estimate_tokens
+from src.backend.services.hybrid_search import matches_filter, tokenize
+from src.backend.services.query_filters import parse_query_filters
+from src.backend.services.tracing import TracedEmbeddings
+
+#Hashed word and character-trigram embedding standing in for a dense model
+class HashingEmbeddings:
+    def __init__(self, dimensions=256):
+        self.dimensions = dimensions
+
+    def _features(self, text):
+        for word in tokenize(text):
+            yield word
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3]
+
+    def embed_query(self, text):
+        vector = [0.0] * self.dimensions
+        for feature in self._features(text):
+            digest = int(hashlib.md5(feature.encode()).hexdigest(), 16)
+            vector[digest % self.dimensions] += 1.0 if (digest >> 8) % 2 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+#Brute-force cosine vector store with the PineconeVectorStore search and upsert signatures
+class InMemoryVectorStore:
+    def __init__(self, documents=None, embeddings=None):
+        self.embeddings = embeddings or HashingEmbeddings()
+        self.documents, self.vectors, self._positions = [], [], {}
+        if documents:
+            self.add_documents(documents)
+
+    #Upsert: documents with a known id replace the stored one
+    def _store(self, doc_id, doc, vector):
+        if doc_id in self._positions:
+            self.documents[self._positions[doc_id]] = doc
+            self.vectors[self._positions[doc_id]] = vector
+        else:
+            self._positions[doc_id] = len(self.documents)
+            self.documents.append(doc)
+            self.vectors.append(vector)
+
+    def add_documents(self, documents, ids=None):
+        vectors = self.embeddings.embed_documents([doc.page_content for doc in documents])
+        for position, (doc, vector) in enumerate(zip(documents, vectors)):
+            self._store(ids[position] if ids else (doc.id or f"doc-{len(self.documents)}"), doc, vector)
+        return list(ids or [])
+
+    #Pinecone data plane: upserts of precomputed vectors with the text in the "text" metadata key
+    @property
+    def index(self):
+        return SimpleNamespace(upsert=self._upsert, list=self._list, delete=self._delete)
+
+    def _upsert(self, vectors, namespace=None):
+        for entry in vectors:
+            metadata = dict(entry["metadata"])
+            text = metadata.pop("text")
+            self._store(entry["id"], Document(id=entry["id"], page_content=text, metadata=metadata), entry["values"])
+        return {"upserted_count": len(vectors)}
+
+    #Pages of ids with a prefix, like Index.list on a serverless index
+    def _list(self, prefix="", namespace=None):
+        ids = [doc_id for doc_id in self._positions if doc_id.startswith(prefix)]
+        for start in range(0, len(ids), 100):
+            yield ids[start:start + 100]
+
+    def _delete(self, ids, namespace=None):
+        deleted = set(ids)
+        kept = [(doc_id, position) for doc_id, position in self._positions.items() if doc_id not in deleted]
+        self.documents = [self.documents[position] for _, position in kept]
+        self.vectors = [self.vectors[position] for _, position in kept]
+        self._positions = {doc_id: position for position, (doc_id, _) in enumerate(kept)}
+        return {}
+
+    def similarity_search_with_score(self, query, k=4, filter=None):
+        query_vector = self.embeddings.embed_query(query)
+        scored = [
+            (doc, sum(a * b for a, b in zip(query_vector, vector)))
+            for doc, vector in zip(self.documents, self.vectors)
+            if matches_filter(doc.metadata, filter)
+        ]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:k]
+
+    def similarity_search(self, query, k=4, filter=None):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+#Pinecone control plane: index listing and creation only
+class FakePineconeClient:
+    def __init__(self):
+        self.indexes = set()
+
+    def list_indexes(self):
+        names = sorted(self.indexes)
+        return SimpleNamespace(names=lambda: names)
+
+    def create_index(self, name, **kwargs):
+        self.indexes.add(name)
+
+    def Index(self, name):
+        return SimpleNamespace(name=name)
+
+#Chat model answering from the prompt itself: planner prompts get a plan, ReAct prompts a final answer,
+#QA and synthesis prompts the first retrieved facts
+class FakeChatModel(BaseChatModel):
+    latency: float = 0.0
+    model_name: str = "fake-gemini"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def respond(self, prompt: str) -> str:
+        if "You plan data retrieval" in prompt:
+            question = prompt.rsplit("QUESTION:", 1)[-1].strip()
+            filters = parse_query_filters(question)
+            detail = " ".join(filters["metrics"] + [f"{year}" for year in filters["years"]] + [f"Q{q}" for q in filters["quarters"]])
+            return json.dumps({"retrievals": [f"{symbol} {detail}".strip() for symbol in filters["symbols"]]})
+        #ReAct agent: one FinancialDataRetriever call for the question, then an answer from its observation
+        if "Action Input" in prompt:
+            question, _, scratchpad = prompt.rpartition("Question:")[2].partition("\n")
+            if "Observation:" not in scratchpad:
+                return f"Thought: I need the reported figures\nAction: FinancialDataRetriever\nAction Input: {question.strip()}"
+            observation = scratchpad.rsplit("Observation:", 1)[1].split("\nThought:", 1)[0].strip()
+            return f"Thought: I now know the final answer\nFinal Answer: {observation}"
+        #Earlier turns are not retrieved data
+        prompt = prompt.split("CONVERSATION SO FAR:", 1)[0]
+        facts = [line.strip("- ").strip() for line in prompt.splitlines() if re.match(r"^\s*-?\s*\S.*\(\w+\).*:\s*-?[\d,.]+", line)]
+        return "Based on the retrieved data: " + "; ".join(facts[:3]) if facts else "I could not find that specific information in the available financial data."
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = "\n".join(str(message.content) for message in messages)
+        if self.latency:
+            time.sleep(self.latency)
+        text = self.respond(prompt)
+        usage = {"input_tokens": estimate_tokens(prompt), "output_tokens": estimate_tokens(text)}
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=usage))])
+
+#google.genai client replaying recorded extraction responses keyed by the uploaded PDF's sha256
+class FakeGenaiClient:
+    def __init__(self, recordings, latency=0.0):
+        self.recordings = recordings
+        self.latency = latency
+        self.calls = Counter()
+        self.files = SimpleNamespace(upload=self._upload)
+        self.models = SimpleNamespace(generate_content=self._generate_content)
+
+    def _upload(self, file, config=None):
+        return SimpleNamespace(sha256=hashlib.sha256(file.read()).hexdigest())
+
+    def _generate_content(self, model, contents, config=None):
+        self.calls[model] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        uploaded = contents[0]
+        return SimpleNamespace(text=self.recordings.get(uploaded.sha256, '{"Period": "Unknown"}'))
+
+#Local HTTP server standing in for the CSE report downloads
+class FakeCSESite:
+    def __init__(self, root_dir, reports):
+        self.reports = reports
+        handler = partial(_QuietHandler, directory=root_dir)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    #Report urls for a symbol, newest first like the Financials tab
+    def report_urls(self, symbol):
+        host, port = self.server.server_address
+        return [f"http://{host}:{port}/{path}" for path in self.reports.get(symbol, [])]
+
+    def browser_factory(self):
+        return lambda: FakeCSEDriver(self)
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+#Selenium driver answering the locators web_scrape uses against the fake site
+class FakeCSEDriver:
+    def __init__(self, site):
+        self.site = site
+        self.links = []
+
+    def get(self, url):
+        match = re.search(r"symbol=([A-Z]+)\.N0000", url)
+        self.links = self.site.report_urls(match.group(1)) if match else []
+
+    def _row_link(self, xpath):
+        match = re.search(r"tr\[(\d+)\]", xpath)
+        index = int(match.group(1)) - 1 if match else -1
+        return self.links[index] if 0 <= index < len(self.links) else None
+
+    def find_element(self, by, value):
+        from selenium.common.exceptions import NoSuchElementException
+        if value == "21b":
+            return SimpleNamespace(get_attribute=lambda name: None)
+        href = self._row_link(value)
+        if href is None:
+            raise NoSuchElementException(value)
+        return SimpleNamespace(get_attribute=lambda name: href if name == "href" else None)
+
+    def find_elements(self, by, value):
+        return [SimpleNamespace(get_attribute=lambda name: None) for _ in self.links]
+
+    def quit(self):
+        pass
+
+#Register every fake in the service container
+def install_fakes(recordings=None, site=None, llm_latency=0.0, genai_latency=0.0):
+    embeddings = TracedEmbeddings(HashingEmbeddings())
+    container.override("llm", FakeChatModel(latency=llm_latency))
+    container.override("llm_strong", FakeChatModel(latency=llm_latency, model_name="fake-gemini-strong"))
+    container.override("embeddings", embeddings)
+    container.override("vector_store", InMemoryVectorStore(embeddings=embeddings))
+    container.override("pinecone_client", FakePineconeClient())
+    container.override("genai_client", FakeGenaiClient(recordings or {}, latency=genai_latency))
+    if site is not None:
+        container.override("browser_factory", site.browser_factory())
+    #Chains and agents built on the real LLM are rebuilt on the fake
+    container.reset("qa_chain", "agent_executor")
@@ -0,0 +1,43 @@
+"""Import-time profile of the backend app.
+
+Runs `python -X importtime` on the given module in a fresh interpreter and
+reports the wall time and the slowest imports by cumulative time.
+
+    python -m benchmarks.import_profile --top 15
+"""
+import sys
+import time
+import argparse
+import subprocess
+
+def profile_imports(module="src.backend.main", top=15):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    wall_seconds = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+
+    rows.sort(reverse=True)
+    return wall_seconds, rows[:top]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import-time profile report")
+    parser.add_argument("--module", default="src.backend.main")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    wall_seconds, rows = profile_imports(args.module, args.top)
+    print(f"import {args.module}: {wall_seconds:.3f}s wall (interpreter start included)")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative_us, self_us, name in rows:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
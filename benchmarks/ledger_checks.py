@@ -0,0 +1,74 @@
+"""Fact ledger checks.
+
+Runs conflict resolution and year-to-date differencing on small hand-built filings
+and exits with status 1 when a resolved quarter is wrong.
+
+    python -m benchmarks.ledger_checks
+"""
+import sys
+from src.backend.services.fact_ledger import build_ledger, quarterly_values
+
+def filing(filename, period, *columns, downloaded_at=None):
+    return {
+        "filename": filename,
+        "period": period,
+        "downloaded_at": downloaded_at,
+        "columns": [{"period": p, "months": months, "role": role, "data": {"Revenue": value}} for p, months, role, value in columns],
+    }
+
+def resolved(file_data):
+    ledger = build_ledger(file_data)
+    return {(quarter["period"], quarter["source"]): quarter["value"] for quarter in quarterly_values(ledger)}, ledger
+
+#The original filing's current column beats a later filing's restated comparative for the same quarter;
+#without the original, the latest comparative is used
+def restated_comparative():
+    original = filing("a.pdf", "03/2024", ("03/2024", 3, "current", "100"))
+    later = filing("b.pdf", "03/2025", ("03/2025", 3, "current", "130"), ("03/2024", 3, "comparative", "110"))
+    latest = filing("c.pdf", "06/2025", ("06/2025", 3, "current", "140"), ("03/2024", 3, "comparative", "115"))
+
+    quarters, ledger = resolved([later, original])
+    superseded = [row["filing"] for row in ledger if row["status"] == "superseded"]
+    yield quarters[("03/2024", "reported")] == 100, f"current column should win, got {quarters[('03/2024', 'reported')]}"
+    yield superseded == ["b.pdf"], f"restated comparative should be superseded, got {superseded}"
+
+    quarters, _ = resolved([later, latest])
+    yield quarters[("03/2024", "reported")] == 115, f"latest comparative should win, got {quarters[('03/2024', 'reported')]}"
+
+#YTD(6) - YTD(3) gives Q2; with Q1 missing, nothing is derived for Q2 and no Q1 is invented
+def missing_first_quarter():
+    quarters, _ = resolved([
+        filing("q1.pdf", "03/2024", ("03/2024", 3, "current", "100")),
+        filing("h1.pdf", "06/2024", ("06/2024", 6, "current", "250")),
+    ])
+    yield quarters.get(("06/2024", "derived")) == 150, f"Q2 should be 250 - 100, got {quarters}"
+
+    quarters, _ = resolved([
+        filing("h1.pdf", "06/2024", ("06/2024", 6, "current", "250")),
+        filing("9m.pdf", "09/2024", ("09/2024", 9, "current", "420")),
+    ])
+    yield set(quarters) == {("09/2024", "derived")}, f"only Q3 can be derived without Q1, got {quarters}"
+    yield quarters[("09/2024", "derived")] == 170, f"Q3 should be 420 - 250, got {quarters}"
+
+#Two filings for the same period disagree: the one downloaded later wins, whatever the content-hash filenames
+#or the parse order; without download times the filename keeps the result deterministic
+def tie_on_filing_date():
+    original = filing("financial_report_DIPD_0a.pdf", "03/2024", ("03/2024", 3, "current", "100"), downloaded_at=1000.0)
+    revised = filing("financial_report_DIPD_f0.pdf", "03/2024", ("03/2024", 3, "current", "105"), downloaded_at=2000.0)
+    for order in ([original, revised], [revised, original]):
+        quarters, _ = resolved(order)
+        yield quarters[("03/2024", "reported")] == 105, f"later download should win, got {quarters}"
+
+    undated = [dict(entry, downloaded_at=None) for entry in (original, revised)]
+    for order in (undated, undated[::-1]):
+        quarters, _ = resolved(order)
+        yield quarters[("03/2024", "reported")] == 100, f"first filename should win without download times, got {quarters}"
+
+CHECKS = [restated_comparative, missing_first_quarter, tie_on_filing_date]
+
+if __name__ == "__main__":
+    failures = [f"{check.__name__}: {message}" for check in CHECKS for passed, message in check() if not passed]
+    for failure in failures:
+        print(f"FAILED {failure}")
+    print(f"{len(CHECKS)} ledger checks, {len(failures)} failures")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,140 @@
+"""Local load generator.
+
+Drives the API with concurrent clients per route for a fixed duration and
+reports achieved RPS, status codes and p50/p95/p99 latency per route. Point it
+at a running server, or use --serve-fakes to start the app in-process on the
+offline fakes from benchmarks/fakes.py.
+
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --routes chat,dashboard --duration 20
+    python -m benchmarks.load_test --serve-fakes --llm-latency 0.2 --concurrency 64
+"""
+import os
+import time
+import shutil
+import socket
+import asyncio
+import logging
+import argparse
+import tempfile
+import threading
+from collections import Counter
+import httpx
+from benchmarks.e2e_benchmark import FAST_PATH_QUERIES, PLANNED_QUERIES, percentile
+
+#Route name -> (method, path, request arguments for the i-th request)
+ROUTES = {
+    "chat": ("POST", "/query/v1/query_data", lambda i: {"json": {"query": FAST_PATH_QUERIES[i % len(FAST_PATH_QUERIES)]}}),
+    "chat_planned": ("POST", "/query/v1/query_data", lambda i: {"json": {"query": PLANNED_QUERIES[i % len(PLANNED_QUERIES)]}}),
+    "batch": ("POST", "/query/v1/query_batch", lambda i: {"json": {"template": "What is the gross profit margin of {symbol} in Q2 2024?"}}),
+    "dashboard": ("GET", "/dashboard/v1/series", lambda i: {"params": {"symbols": ["DIPD", "REXP", "DIPD,REXP"][i % 3]}}),
+    "metrics": ("GET", "/metrics", lambda i: {}),
+}
+
+#One client: sends requests back to back until the deadline
+async def client_loop(client, route, deadline, samples, honor_retry_after):
+    method, path, arguments = ROUTES[route]
+    i = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, **arguments(i))
+            status, retry_after = response.status_code, response.headers.get("Retry-After")
+        except httpx.HTTPError as e:
+            status, retry_after = type(e).__name__, None
+        samples.append((status, time.perf_counter() - start))
+        i += 1
+        if honor_retry_after and retry_after:
+            await asyncio.sleep(min(float(retry_after), max(0.0, deadline - time.perf_counter())))
+
+async def run_load(base_url, routes, concurrency, duration, timeout=60.0, honor_retry_after=False):
+    limits = httpx.Limits(max_connections=concurrency * len(routes), max_keepalive_connections=concurrency * len(routes))
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        samples = {route: [] for route in routes}
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            client_loop(client, route, deadline, samples[route], honor_retry_after)
+            for route in routes for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    report = {}
+    for route, route_samples in samples.items():
+        statuses = Counter(status for status, _ in route_samples)
+        ok_latencies = [latency for status, latency in route_samples if status == 200]
+        report[route] = {
+            "requests": len(route_samples),
+            "ok_rps": round(len(ok_latencies) / elapsed, 1),
+            "statuses": dict(statuses),
+            "p50_ms": round(percentile(ok_latencies, 0.5) * 1000, 1) if ok_latencies else None,
+            "p95_ms": round(percentile(ok_latencies, 0.95) * 1000, 1) if ok_latencies else None,
+            "p99_ms": round(percentile(ok_latencies, 0.99) * 1000, 1) if ok_latencies else None,
+            "max_ms": round(max(latency for _, latency in route_samples) * 1000, 1) if route_samples else None,
+        }
+    return report
+
+#The app on the offline fakes, in a background thread, with a synthetic dataset already ingested
+def serve_fakes(workspace, quarters=40, llm_latency=0.0):
+    import uvicorn
+    from src.backend.core.config import PROCESSED_CSV_DATA_PATH
+    from src.backend.services.rag_vector_save import rag_pipeline
+    from src.backend.services.snapshot import publish_snapshot
+    from src.backend.main import app
+    from benchmarks.corpus import write_csv_corpus
+    from benchmarks.fakes import install_fakes
+
+    os.chdir(workspace)
+    write_csv_corpus(PROCESSED_CSV_DATA_PATH, quarters=quarters)
+    publish_snapshot()
+    install_fakes(llm_latency=llm_latency)
+    asyncio.run(rag_pipeline())
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+def print_report(report, duration, concurrency):
+    print(f"{concurrency} clients per route for {duration}s")
+    print(f"{'route':<14}{'requests':>10}{'ok rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}  statuses")
+    for route, stats in report.items():
+        print(f"{route:<14}{stats['requests']:>10}{stats['ok_rps']:>9}{str(stats['p50_ms']):>9}{str(stats['p95_ms']):>9}"
+              f"{str(stats['p99_ms']):>9}{str(stats['max_ms']):>9}  {stats['statuses']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local load generator")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--routes", default="chat,dashboard", help=f"comma separated, from {', '.join(ROUTES)}")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients per route")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--timeout", type=float, default=60.0, help="client timeout per request in seconds")
+    parser.add_argument("--honor-retry-after", action="store_true", help="back off for Retry-After after 429/503")
+    parser.add_argument("--serve-fakes", action="store_true", help="start the app in-process on the offline fakes")
+    parser.add_argument("--quarters", type=int, default=40, help="quarters per company in the --serve-fakes dataset")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds added to every fake LLM call")
+    args = parser.parse_args()
+
+    routes = [route.strip() for route in args.routes.split(",") if route.strip()]
+    unknown = [route for route in routes if route not in ROUTES]
+    if unknown:
+        parser.error(f"unknown routes {unknown}")
+
+    server, workspace, cwd = None, None, os.getcwd()
+    try:
+        if args.serve_fakes:
+            workspace = tempfile.mkdtemp(prefix="load-test-")
+            server, args.url = serve_fakes(workspace, args.quarters, args.llm_latency)
+            #The app configures INFO logging on import
+            logging.getLogger().setLevel(logging.WARNING)
+        report = asyncio.run(run_load(args.url, routes, args.concurrency, args.duration, args.timeout, args.honor_retry_after))
+        print_report(report, args.duration, args.concurrency)
+    finally:
+        if server is not None:
+            server.should_exit = True
+        if workspace:
+            os.chdir(cwd)
+            shutil.rmtree(workspace, ignore_errors=True)
@@ -0,0 +1,58 @@
+"""Offline retrieval benchmark.
+
+Indexes a synthetic per-fact corpus and reports precision@k, recall@k and MRR
+for vector-only, BM25-only and hybrid retrieval, with and without reranking.
+
+    python -m benchmarks.retrieval_benchmark --k 3
+"""
+import os
+import json
+import argparse
+from src.backend.services.rag_vector_save import build_fact_documents
+from src.backend.services.hybrid_search import BM25Index, hybrid_search
+from src.backend.services.query_filters import parse_query_filters, to_pinecone_filter
+from benchmarks.fakes import HashingEmbeddings, InMemoryVectorStore
+from benchmarks.corpus import synthetic_facts
+
+QUERIES_PATH = os.path.join(os.path.dirname(__file__), "data", "retrieval_queries.json")
+
+def evaluate(name, retrieve, queries, k):
+    precision, recall, reciprocal_rank = 0.0, 0.0, 0.0
+    for item in queries:
+        relevant = set(item["relevant"])
+        ranked = [doc.id for doc in retrieve(item["query"])][:k]
+        hits = [doc_id in relevant for doc_id in ranked]
+        precision += sum(hits) / k
+        recall += sum(hits) / len(relevant)
+        reciprocal_rank += next((1 / (rank + 1) for rank, hit in enumerate(hits) if hit), 0.0)
+
+    total = len(queries)
+    return {"strategy": name, f"precision@{k}": precision / total, f"recall@{k}": recall / total, "mrr": reciprocal_rank / total}
+
+def run(k=3, prefilter=False):
+    documents = build_fact_documents(synthetic_facts())
+    bm25_index = BM25Index(documents)
+    vector_store = InMemoryVectorStore(documents, HashingEmbeddings())
+    with open(QUERIES_PATH) as f:
+        queries = json.load(f)
+
+    def filter_for(query):
+        return to_pinecone_filter(parse_query_filters(query)) if prefilter else None
+
+    strategies = {
+        "vector": lambda q: vector_store.similarity_search(f"Financial information about {q}", k=k, filter=filter_for(q)),
+        "bm25": lambda q: [doc for doc, _ in bm25_index.search(" ".join([q] + parse_query_filters(q)["metrics"]), k=k, metadata_filter=filter_for(q))],
+        "hybrid": lambda q: hybrid_search(vector_store, bm25_index, q, k=k, metadata_filter=filter_for(q), use_rerank=False),
+        "hybrid+rerank": lambda q: hybrid_search(vector_store, bm25_index, q, k=k, metadata_filter=filter_for(q), use_rerank=True),
+    }
+    return [evaluate(name, retrieve, queries, k) for name, retrieve in strategies.items()]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline retrieval benchmark")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--prefilter", action="store_true", help="apply metadata pre-filters parsed from each query")
+    args = parser.parse_args()
+
+    print(f"{len(json.load(open(QUERIES_PATH)))} queries, k={args.k}, prefilter={args.prefilter}")
+    for result in run(args.k, args.prefilter):
+        print("  ".join(f"{key}={value:.3f}" if isinstance(value, float) else f"{value:<14}" for key, value in result.items()))
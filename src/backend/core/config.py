@@ -13,16 +13,20 @@ DIPPED_PLC_URL="https://www.cse.lk/pages/company-profile/company-profile.compone
 RICHARD_PLC_URL="https://www.cse.lk/pages/company-profile/company-profile.component.html?symbol=REXP.N0000"
 COMPANY_CONFIGS = {
     "REXP": {
+        "profile_url": RICHARD_PLC_URL,
         "input_dir": "data/unprocess_data/REXP",
         "output_dir": "data/extracted_data/REXP",
         "keyword_regex": r"consolidated\s+income\s+statements?",
-        "output_csv": "data/processed_csv/rexp_processed_financial_data.csv"
+        "output_csv": "data/processed_csv/rexp_processed_financial_data.csv",
+        "ledger_csv": "data/ledger/rexp_fact_ledger.csv"
     },
     "DIPD": {
+        "profile_url": DIPPED_PLC_URL,
         "input_dir": "data/unprocess_data/DIPD",
         "output_dir": "data/extracted_data/DIPD",
         "keyword_regex": r"STATEMENT OF PROFIT OR LOSS",
-        "output_csv": "data/processed_csv/dipd_processed_financial_data.csv"
+        "output_csv": "data/processed_csv/dipd_processed_financial_data.csv",
+        "ledger_csv": "data/ledger/dipd_fact_ledger.csv"
     }
 }
 FILES_METADATA = {
@@ -30,11 +34,118 @@ FILES_METADATA = {
     "rexp_processed_financial_data.csv": {"company": "Richard Pieris Exports PLC", "symbol": "REXP"}
 }
 PROCESSED_CSV_DATA_PATH = "data/processed_csv/"
+CHECKPOINT_DIR = "data/checkpoints/"
+#Versioned Arrow snapshots of the facts and analytics that the API workers memory-map
+SNAPSHOT_DIR = "data/snapshots/"
+SNAPSHOT_KEEP = max(1, int(os.getenv('SNAPSHOT_KEEP', '3')))
+#Fact rows converted and sent per chunk of a bulk export
+EXPORT_CHUNK_ROWS = max(1, int(os.getenv('EXPORT_CHUNK_ROWS', '50000')))
 
 EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'models/embedding-001')
 LLM_MODEL = os.getenv('LLM_MODEL', 'gemini-2.0-flash')
+#Stronger model a task escalates to when the fast model's answer fails its schema or consistency check
+LLM_STRONG_MODEL = os.getenv('LLM_STRONG_MODEL', 'gemini-2.5-pro')
+MODEL_ESCALATION = os.getenv('MODEL_ESCALATION', 'true').lower() == 'true'
+#Per-task model tier ("fast" or "strong"), timeout in seconds and output token limit, e.g. PLANNER_MODEL_TIER=strong
+MODEL_TASKS = {
+    task: {
+        "tier": os.getenv(f'{task.upper()}_MODEL_TIER', 'fast'),
+        "timeout": float(os.getenv(f'{task.upper()}_TIMEOUT', str(timeout))),
+        "max_tokens": int(os.getenv(f'{task.upper()}_MAX_TOKENS', str(max_tokens))),
+    }
+    for task, timeout, max_tokens in (
+        ("extraction", 120, 8192),
+        ("planner", 30, 512),
+        ("synthesis", 60, 2048),
+        ("qa", 60, 1024),
+        ("agent", 60, 2048),
+    )
+}
+#Relative tolerance of the Gross Profit = Revenue - COGS check on extracted statements
+EXTRACTION_TOLERANCE = float(os.getenv('EXTRACTION_TOLERANCE', '0.01'))
+
+#Extraction configurations
+#"multi" extracts every period column of a statement (current quarter, prior-year comparative, year-to-date), "latest" only the current quarter
+EXTRACTION_MODE = os.getenv('EXTRACTION_MODE', 'multi')
+#Quarters of history the scraper should cover; multi-period extraction needs about half as many reports
+HISTORY_QUARTERS = int(os.getenv('HISTORY_QUARTERS', '12'))
+#Downloaded reports stored once by content hash, and the per-company catalogue of source url -> report,
+#so later scrapes only fetch new filings
+RAW_STORE_DIR = "data/raw_reports/"
+CATALOGUE_DIR = "data/catalogue/"
+#Periodic checks of every company's CSE listing; only new filings are downloaded and ingested
+SCRAPE_SCHEDULE_ENABLED = os.getenv('SCRAPE_SCHEDULE_ENABLED', 'false').lower() == 'true'
+SCRAPE_INTERVAL = float(os.getenv('SCRAPE_INTERVAL', '21600'))
+SCRAPE_SYMBOL_CONCURRENCY = int(os.getenv('SCRAPE_SYMBOL_CONCURRENCY', '2'))
+SCRAPE_INGEST_NEW = os.getenv('SCRAPE_INGEST_NEW', 'true').lower() == 'true'
 
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "YOUR_API_KEY_HERE")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY", "YOUR_API_KEY_HERE")
-PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "YOUR_API_KEY_HERE")
\ No newline at end of file
+PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "YOUR_API_KEY_HERE")
+
+#Retrieval configurations
+#"fact" indexes one document per (company, metric, period), "row" one per csv row
+RAG_INDEX_MODE = os.getenv('RAG_INDEX_MODE', 'fact')
+ROW_RETRIEVER_TOP_K = int(os.getenv('ROW_RETRIEVER_TOP_K', '5'))
+FACT_RETRIEVER_TOP_K = int(os.getenv('FACT_RETRIEVER_TOP_K', '12'))
+#"hybrid" fuses a local BM25 index with vector scores, "vector" uses embeddings only
+RETRIEVER_STRATEGY = os.getenv('RETRIEVER_STRATEGY', 'hybrid')
+HYBRID_VECTOR_WEIGHT = float(os.getenv('HYBRID_VECTOR_WEIGHT', '0.5'))
+HYBRID_CANDIDATES = int(os.getenv('HYBRID_CANDIDATES', '20'))
+HYBRID_RERANK = os.getenv('HYBRID_RERANK', 'true').lower() == 'true'
+#Estimated prompt tokens allowed per retriever QA call
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '1500'))
+
+#Agent configurations
+#"plan" runs one planning call, concurrent retrievals and one synthesis call; "react" runs the ReAct agent
+AGENT_MODE = os.getenv('AGENT_MODE', 'plan')
+MAX_PLAN_STEPS = int(os.getenv('MAX_PLAN_STEPS', '6'))
+#Answer single ratio or metric lookups from the precomputed analytics without calling the LLM
+FAST_PATH_ENABLED = os.getenv('FAST_PATH_ENABLED', 'true').lower() == 'true'
+#Conversation sessions kept per worker (least recently used evicted), idle seconds before one expires,
+#and the turns and retrieved facts each session remembers
+SESSION_STORE_SIZE = int(os.getenv('SESSION_STORE_SIZE', '1000'))
+SESSION_TTL = float(os.getenv('SESSION_TTL', '1800'))
+SESSION_MAX_TURNS = int(os.getenv('SESSION_MAX_TURNS', '6'))
+SESSION_MAX_FACTS = int(os.getenv('SESSION_MAX_FACTS', '200'))
+#Batch questions answered at once across all batch requests of a worker, and questions allowed per batch
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '8'))
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '200'))
+
+#Tracing configurations
+TRACE_BUFFER_SIZE = int(os.getenv('TRACE_BUFFER_SIZE', '256'))
+
+#Startup configurations
+#Build the LLM, embedding, Pinecone and agent clients in the background at startup instead of on first request
+WARMUP_ON_STARTUP = os.getenv('WARMUP_ON_STARTUP', 'false').lower() == 'true'
+
+#Server configurations
+#Uvicorn worker processes; data files are written atomically and pipelines hold cross-process locks
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '1'))
+LOCK_DIR = "data/.locks/"
+#Chat sessions in worker memory, or in files shared by every worker so a follow-up can reach any of them;
+#"memory" only keeps follow-ups working with a single worker
+SESSION_STORE = os.getenv('SESSION_STORE', 'file' if WEB_CONCURRENCY > 1 else 'memory')
+SESSION_DIR = "data/sessions/"
+#Per-route admission: (requests running at once, requests allowed to wait) per worker
+ROUTE_LIMITS = {
+    "/company/": (int(os.getenv('SCRAPE_CONCURRENCY', '1')), int(os.getenv('SCRAPE_QUEUE_SIZE', '2'))),
+    "/visualize/": (int(os.getenv('VISUALIZE_CONCURRENCY', '1')), int(os.getenv('VISUALIZE_QUEUE_SIZE', '1'))),
+    "/query/": (int(os.getenv('CHAT_CONCURRENCY', '8')), int(os.getenv('CHAT_QUEUE_SIZE', '32'))),
+    "/dashboard/": (int(os.getenv('DASHBOARD_CONCURRENCY', '16')), int(os.getenv('DASHBOARD_QUEUE_SIZE', '64'))),
+    "/export/": (int(os.getenv('EXPORT_CONCURRENCY', '4')), int(os.getenv('EXPORT_QUEUE_SIZE', '8'))),
+}
+#Seconds a queued request waits for a slot before it is turned away with 503
+ADMISSION_TIMEOUT = float(os.getenv('ADMISSION_TIMEOUT', '30'))
+
+#Ingest pipeline configurations
+#Workers per stage and items allowed to wait between stages; facts run on one worker because they rewrite the csvs
+INGEST_WORKERS = {
+    "extract": int(os.getenv('EXTRACT_WORKERS', '2')),
+    "parse": int(os.getenv('PARSE_WORKERS', '4')),
+    "facts": 1,
+    "embed": int(os.getenv('EMBED_WORKERS', '2')),
+    "upsert": int(os.getenv('UPSERT_WORKERS', '1')),
+}
+INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', '4'))
@@ -1,11 +1,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
 import logging
-from src.backend.core.config import LOG_LEVEL
+from src.backend.core.config import LOG_LEVEL, WARMUP_ON_STARTUP, WEB_CONCURRENCY, SCRAPE_SCHEDULE_ENABLED, SESSION_STORE
+from src.backend.services import container
+from src.backend.services.admission import AdmissionMiddleware
+from src.backend.services.ingest_pipeline import latest_run
+from src.backend.services.scrape_scheduler import start_scheduler, stop_scheduler
 from src.backend.routes.get_company_route import company_process_router
 from src.backend.routes.visualize_data_route import visualize_data_router
 from src.backend.routes.chatbot_route import chatbot_router
+from src.backend.routes.metrics_route import metrics_router
+from src.backend.routes.dashboard_route import dashboard_router
+from src.backend.routes.export_route import export_router
 
 #Set up logging
 logging.basicConfig(
@@ -14,8 +23,31 @@ logging.basicConfig(
     datefmt='%Y-%m-%d %H:%M:%S'
 )
 
+#Optional warm-up and filing checks; both run in the background so an unreachable dependency never blocks startup
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    #Sessions kept in one worker's memory are not seen by the others
+    if WEB_CONCURRENCY > 1 and SESSION_STORE != "file":
+        logging.warning(f"SESSION_STORE={SESSION_STORE} with {WEB_CONCURRENCY} workers: follow-up questions only work on the worker that answered the first one, set SESSION_STORE=file")
+    warmup_task = None
+    if WARMUP_ON_STARTUP:
+        warmup_task = asyncio.create_task(asyncio.to_thread(container.warm_up))
+    if SCRAPE_SCHEDULE_ENABLED:
+        start_scheduler()
+    yield
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    stop_scheduler()
+    #Checkpoints let the next run resume an interrupted ingest
+    run = latest_run()
+    if run and not run.task.done():
+        run.task.cancel()
+
 #Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+#Per-route concurrency limits with a bounded queue; added before CORS so 429/503 responses keep CORS headers
+app.add_middleware(AdmissionMiddleware)
 
 #Define allowed CORS origins
 origins = ["http://localhost",
@@ -36,8 +68,14 @@ app.add_middleware(
 app.include_router(company_process_router)
 app.include_router(visualize_data_router)
 app.include_router(chatbot_router)
+app.include_router(metrics_router)
+app.include_router(dashboard_router)
+app.include_router(export_router)
 
 
-#Run app with uvicorn
+#Run app with uvicorn; several workers need the app as an import string
 if __name__ == '__main__':
-    uvicorn.run(app, host='0.0.0.0', port=8000)
\ No newline at end of file
+    if WEB_CONCURRENCY > 1:
+        uvicorn.run("src.backend.main:app", host='0.0.0.0', port=8000, workers=WEB_CONCURRENCY)
+    else:
+        uvicorn.run(app, host='0.0.0.0', port=8000)
\ No newline at end of file
@@ -1,3 +1,4 @@
+from typing import List, Optional
 from pydantic import BaseModel
 
 #Company name model
@@ -11,3 +12,10 @@ class VisualizeData(BaseModel):
 #model for chatbot
 class ChatData(BaseModel):
     query: str
+    session_id: Optional[str] = None
+
+#model for batch questions: a list of questions and/or a template with {symbol} or {company} asked for every symbol
+class BatchQueryData(BaseModel):
+    questions: Optional[List[str]] = None
+    template: Optional[str] = None
+    symbols: Optional[List[str]] = None
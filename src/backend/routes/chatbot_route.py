@@ -1,8 +1,16 @@
 import logging
-from fastapi import APIRouter, status, HTTPException
-from src.backend.core.config import API_VERSION
-from src.backend.models.all_models import ChatData
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, status, HTTPException, Response, Header
+from fastapi.responses import StreamingResponse
+from src.backend.core.config import API_VERSION, AGENT_MODE
+from src.backend.models.all_models import ChatData, BatchQueryData
 from src.backend.services.rag_retriver import query_process_agent
+from src.backend.services.agent_planner import plan_and_execute
+from src.backend.services.query_router import fast_path_answer
+from src.backend.services.conversation import get_session, session_turn
+from src.backend.services.batch_query import expand_batch, stream_batch
+from src.backend.services.tracing import start_trace, span
 
 #Define chatbot router
 chatbot_router = APIRouter(
@@ -11,15 +19,35 @@ chatbot_router = APIRouter(
     responses={404: {"description": "Not found"}}
 )
 
-#Chatbot Endpoint for POST requests
+#Chatbot Endpoint for POST requests; the session id comes from the body or the X-Session-Id header and is echoed back
 @chatbot_router.post("/query_data", status_code=status.HTTP_200_OK)
-async def query_data(request: ChatData):
+async def query_data(request: ChatData, response: Response, x_session_id: Optional[str] = Header(None)):
     try:
         user_query = request.query
         logging.info(f"Recieved Query: {user_query}")
+        session = get_session(request.session_id or x_session_id)
+        response.headers["X-Session-Id"] = session.session_id
 
-        #process the user query
-        answer = await query_process_agent(user_query)
+        #Turns of one session run in order, so a follow-up sees the answer it follows
+        async with session_turn(session):
+            #process the user query, traced end to end
+            with start_trace("query_data", agent_mode=AGENT_MODE, query=user_query[:500], session_id=session.session_id) as trace:
+                response.headers["X-Trace-Id"] = trace["trace_id"]
+
+                #Follow-ups inherit the companies, measures and period they leave out
+                standalone_query = await asyncio.to_thread(session.contextualize, user_query)
+                trace["attributes"]["follow_up"] = standalone_query != user_query
+
+                #Single ratio or metric lookups are answered from the analytics table without the LLM
+                with span("fast_path", "router") as router_span:
+                    answer = await asyncio.to_thread(fast_path_answer, standalone_query)
+                    router_span["attributes"]["hit"] = answer is not None
+
+                if answer is None and AGENT_MODE == "plan":
+                    answer = await plan_and_execute(standalone_query, session)
+                elif answer is None:
+                    answer = await query_process_agent(standalone_query, session)
+            session.add_turn(user_query, standalone_query, answer)
         logging.info(f"Answer: {answer}")
 
         return answer
@@ -28,4 +56,17 @@ async def query_data(request: ChatData):
         logging.error(f"Error in query data endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+#Batch of questions, e.g. a screening template asked for every company; results stream back as NDJSON as they finish
+@chatbot_router.post("/query_batch", status_code=status.HTTP_200_OK)
+async def query_batch(request: BatchQueryData):
+    try:
+        questions = expand_batch(request.questions, request.template, request.symbols)
+        logging.info(f"Recieved batch of {len(questions)} questions")
+        return StreamingResponse(stream_batch(questions), media_type="application/x-ndjson")
 
+    except ValueError as e:
+        logging.error(f"Invalid batch request: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error in query batch endpoint: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,42 @@
+import logging
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, status, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from src.backend.core.config import API_VERSION
+from src.backend.services.analytics import analytics_source
+from src.backend.services.dashboard_data import dashboard_etag, etag_matches, get_dashboard_series, parse_period_bound
+
+#Dashboard data router
+dashboard_router = APIRouter(
+    prefix="/dashboard/"+ API_VERSION +"",
+    tags=["dashboard"],
+    responses={404: {"description": "Not found"}}
+)
+
+#Pre-aggregated time series and ratios per company and date range
+@dashboard_router.get("/series", status_code=status.HTTP_200_OK)
+async def dashboard_series(request: Request, symbols: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None):
+    #Only malformed parameters are client errors
+    try:
+        parse_period_bound(start), parse_period_bound(end)
+    except ValueError as e:
+        logging.info(f"Invalid dashboard request: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        symbol_list = [s.strip().upper() for s in symbols.split(",") if s.strip()] if symbols else None
+        #The ETag and the payload come from the same version of the data
+        facts, analytics, version = await asyncio.to_thread(analytics_source)
+        etag = dashboard_etag(version, symbol_list, start, end)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        payload = await asyncio.to_thread(get_dashboard_series, etag, facts, analytics, symbol_list, start, end)
+        return JSONResponse(payload, headers=headers)
+
+    except Exception as e:
+        logging.error(f"Error in dashboard series endpoint: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
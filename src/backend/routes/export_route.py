@@ -0,0 +1,53 @@
+import logging
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, status, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from src.backend.core.config import API_VERSION
+from src.backend.services.fact_store import fact_source
+from src.backend.services.dashboard_data import etag_matches, parse_period_bound
+from src.backend.services.data_export import EXPORT_FORMATS, export_etag, export_stream
+
+#Bulk data export router
+export_router = APIRouter(
+    prefix="/export/"+ API_VERSION +"",
+    tags=["export"],
+    responses={404: {"description": "Not found"}}
+)
+
+def split_param(value: Optional[str]):
+    return [item.strip() for item in value.split(",") if item.strip()] if value else None
+
+#Typed fact table, whole or filtered by symbol, metric and MM/YYYY range, streamed as Arrow IPC or csv
+@export_router.get("/facts", status_code=status.HTTP_200_OK)
+async def export_facts(request: Request, format: str = "arrow", symbols: Optional[str] = None, metrics: Optional[str] = None,
+                       start: Optional[str] = None, end: Optional[str] = None):
+    #Only malformed parameters are client errors
+    try:
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Invalid format '{format}', expected one of {sorted(EXPORT_FORMATS)}")
+        parse_period_bound(start), parse_period_bound(end)
+    except ValueError as e:
+        logging.info(f"Invalid export request: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        symbol_list = [symbol.upper() for symbol in split_param(symbols) or []] or None
+        metric_list = split_param(metrics)
+        facts, version = await asyncio.to_thread(fact_source)
+        etag = export_etag(version, format, symbol_list, metric_list, start, end)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        headers["Content-Disposition"] = f'attachment; filename="facts.{format}"'
+        return StreamingResponse(
+            export_stream(facts, format, symbol_list, metric_list, start, end),
+            media_type=EXPORT_FORMATS[format],
+            headers=headers,
+        )
+
+    except Exception as e:
+        logging.error(f"Error in export endpoint: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -3,6 +3,8 @@ from fastapi import APIRouter, status, HTTPException
 from src.backend.core.config import API_VERSION, DIPPED_PLC_URL, RICHARD_PLC_URL
 from src.backend.models.all_models import CompanyData
 from src.backend.services.web_scrape import web_scrape
+from src.backend.services.file_io import FileLock
+from src.backend.services.scrape_scheduler import check_filings, last_check
 
 #Define company data scraping router
 company_process_router = APIRouter(
@@ -11,6 +13,17 @@ company_process_router = APIRouter(
     responses={404: {"description": "Not found"}}
 )
 
+#One scrape per company at a time across all workers
+async def scrape_company(url: str, symbol: str):
+    scrape_lock = FileLock(f"scrape_{symbol}")
+    if not scrape_lock.acquire(blocking=False):
+        logging.info(f"Scrape for {symbol} already running in another request")
+        raise HTTPException(status_code=503, detail=f"A scrape for {symbol} is already running", headers={"Retry-After": "30"})
+    try:
+        return await web_scrape(url)
+    finally:
+        scrape_lock.release()
+
 #Company data scraping Endpoint
 @company_process_router.post("/get_company_name", response_model=CompanyData, status_code=status.HTTP_200_OK)
 async def company_process(request: CompanyData):
@@ -21,7 +34,7 @@ async def company_process(request: CompanyData):
         #for Dipped Products PLC Selected
         if 'dipped' in company_name.lower():
             logging.info(f"Dipped Products PLC Selected")
-            result = await web_scrape(DIPPED_PLC_URL)
+            result = await scrape_company(DIPPED_PLC_URL, "DIPD")
             logging.info(f"result: {result}")
 
             return CompanyData(name='Scrape Completed: Dipped Products PLC')
@@ -29,7 +42,7 @@ async def company_process(request: CompanyData):
         #for Richard Pieris Exports PLC  Selected
         elif 'richard' in company_name.lower():
             logging.info(f"Richard Pieris Exports PLC  Selected")
-            result = await web_scrape(RICHARD_PLC_URL)
+            result = await scrape_company(RICHARD_PLC_URL, "REXP")
             logging.info(f"result: {result}")
             
             return CompanyData(name='Scrape Completed: Richard Pieris Exports PLC')
@@ -39,8 +52,27 @@ async def company_process(request: CompanyData):
             logging.info(f"Company is not in List")
             return CompanyData(name='Invalid Company name')
 
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error in get company name endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+#Check every company's listing now and download only new filings
+@company_process_router.post("/check_filings", status_code=status.HTTP_200_OK)
+async def check_new_filings():
+    try:
+        return await check_filings()
+
+    except Exception as e:
+        logging.error(f"Error in check filings endpoint: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
+#Result of the latest filing check in this worker
+@company_process_router.get("/filing_status", status_code=status.HTTP_200_OK)
+async def filing_status():
+    summary = last_check()
+    if summary is None:
+        logging.info("No filing check yet")
+        raise HTTPException(status_code=404, detail="No filing check yet")
+    return summary
@@ -0,0 +1,30 @@
+import logging
+from fastapi import APIRouter, status, HTTPException
+from fastapi.responses import PlainTextResponse
+from src.backend.services.tracing import render_prometheus, get_trace, latency_breakdown
+from src.backend.services.admission import render_admission_metrics
+
+#Metrics and trace inspection router
+metrics_router = APIRouter(
+    tags=["metrics"],
+    responses={404: {"description": "Not found"}}
+)
+
+#Prometheus scrape endpoint
+@metrics_router.get("/metrics", response_class=PlainTextResponse, status_code=status.HTTP_200_OK)
+async def metrics():
+    return PlainTextResponse(render_prometheus() + render_admission_metrics(), media_type="text/plain; version=0.0.4")
+
+#Recent traces with the p50/p95 latency of every stage
+@metrics_router.get("/debug/traces", status_code=status.HTTP_200_OK)
+async def list_traces():
+    return latency_breakdown()
+
+#Full span breakdown of one traced request
+@metrics_router.get("/debug/traces/{trace_id}", status_code=status.HTTP_200_OK)
+async def trace_detail(trace_id: str):
+    trace = get_trace(trace_id)
+    if trace is None:
+        logging.info(f"Trace {trace_id} not found")
+        raise HTTPException(status_code=404, detail=f"Trace {trace_id} not found")
+    return trace
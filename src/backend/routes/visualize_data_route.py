@@ -1,11 +1,9 @@
 import logging
-import asyncio
 from fastapi import APIRouter, status, HTTPException
 from src.backend.core.config import API_VERSION
 from src.backend.models.all_models import VisualizeData
-from src.backend.services.extract_data import data_extractor
-from src.backend.services.dataset_creation import create_dataset
-from src.backend.services.rag_vector_save import rag_pipeline
+from src.backend.services.ingest_pipeline import start_ingest, latest_run
+from src.backend.services.file_io import FileLock
 
 #data visualize router
 visualize_data_router = APIRouter(
@@ -17,36 +15,36 @@ visualize_data_router = APIRouter(
 #Data visualization endpoint
 @visualize_data_router.post("/visualize_data", status_code=status.HTTP_200_OK)
 async def visualize_data(request: VisualizeData):
-    try:
-        #Pdf data extraction
-        logging.info(f"Data Extraction started")
-        extract_result = await data_extractor()
-        logging.info(f"extract_result: {extract_result}")
-
-        #Dataset creation
-        logging.info(f"Dataset Creation started")
-        dataset_preperation_result = await create_dataset()
-        logging.info(f"dataset_preperation_result: {dataset_preperation_result}")
+    #One pipeline run at a time across all workers; the lock is held until the run finishes
+    pipeline_lock = FileLock("visualize_pipeline")
+    if not pipeline_lock.acquire(blocking=False):
+        logging.info("Visualize pipeline already running in another request")
+        raise HTTPException(status_code=503, detail="Data processing is already running", headers={"Retry-After": "30"})
 
-        #Save the data in vector db
-        asyncio.create_task(
-            handle_rag_ingestor(
-            )
-        )
-
-        return VisualizeData(name='done')
-        
+    try:
+        #Extraction, parsing, fact storage, embedding and upsert stream report by report
+        logging.info(f"Ingest pipeline started")
+        run = start_ingest(on_finish=pipeline_lock.release)
     except Exception as e:
+        pipeline_lock.release()
         logging.error(f"Error in visualize data endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-#Data save in VectorDB
-async def handle_rag_ingestor():
     try:
-        logging.info('Rag Ingestion Started')
-        result = await rag_pipeline()
-        logging.info(f"result: {result}")
+        #Respond once the dataset is complete; embedding and upsert carry on in the observed task
+        await run.wait_for_dataset()
+        logging.info(f"Dataset ready: {run.summary()}")
+        return VisualizeData(name='done')
 
     except Exception as e:
-        logging.error(f"Error in handle rag ingestor: {e}")
+        logging.error(f"Error in visualize data endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+#Progress of the latest ingest run in this worker
+@visualize_data_router.get("/ingest_status", status_code=status.HTTP_200_OK)
+async def ingest_status():
+    run = latest_run()
+    if run is None:
+        logging.info("No ingest run yet")
+        raise HTTPException(status_code=404, detail="No ingest run yet")
+    return run.summary()
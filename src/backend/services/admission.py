@@ -0,0 +1,107 @@
+import math
+import time
+import asyncio
+import logging
+import weakref
+from fastapi.responses import JSONResponse
+from src.backend.core.config import ROUTE_LIMITS, ADMISSION_TIMEOUT
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+#Concurrency limit with a bounded wait queue for one route group
+class RouteLimiter:
+    def __init__(self, prefix: str, limit: int, queue_size: int, timeout: float = ADMISSION_TIMEOUT):
+        self.prefix = prefix
+        self.limit = max(1, limit)
+        self.queue_size = max(0, queue_size)
+        self.timeout = timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = {429: 0, 503: 0}
+        #Moving average of service time, used for Retry-After
+        self.service_seconds = 1.0
+        #One semaphore per event loop, created on first use, as in batch_query: a semaphore that has made
+        #a task wait is bound to its loop, and the limiters are built at import time before any loop runs
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def semaphore(self):
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.limit)
+        return self._semaphores[loop]
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.service_seconds * (self.waiting + 1) / self.limit))
+
+    async def acquire(self):
+        #Full queue: reject at once instead of piling up
+        if self.in_flight >= self.limit and self.waiting >= self.queue_size:
+            self.rejected[429] += 1
+            raise AdmissionRejected(429, f"Too many requests for {self.prefix}", self.retry_after())
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore().acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.rejected[503] += 1
+            raise AdmissionRejected(503, f"Timed out waiting for capacity on {self.prefix}", self.retry_after())
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        self.admitted += 1
+
+    def release(self, elapsed: float):
+        self.in_flight -= 1
+        self.service_seconds = 0.8 * self.service_seconds + 0.2 * elapsed
+        self.semaphore().release()
+
+#Limiters by path prefix
+_limiters = {prefix: RouteLimiter(prefix, limit, queue_size) for prefix, (limit, queue_size) in ROUTE_LIMITS.items()}
+
+def limiter_for(path: str):
+    return next((limiter for prefix, limiter in _limiters.items() if path.startswith(prefix)), None)
+
+#ASGI middleware applying the per-route limits; other paths pass straight through
+class AdmissionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        limiter = limiter_for(scope["path"]) if scope["type"] == "http" else None
+        if limiter is None:
+            return await self.app(scope, receive, send)
+
+        try:
+            await limiter.acquire()
+        except AdmissionRejected as e:
+            logging.info(f"Rejected {scope['path']} with {e.status_code}: {e.detail}")
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code, headers={"Retry-After": str(e.retry_after)})
+            return await response(scope, receive, send)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - start)
+
+#Admission gauges and counters in Prometheus text format
+def render_admission_metrics() -> str:
+    lines = [
+        "# HELP admission_in_flight Requests currently running per route group.",
+        "# TYPE admission_in_flight gauge",
+    ]
+    lines += [f'admission_in_flight{{route="{prefix}"}} {limiter.in_flight}' for prefix, limiter in _limiters.items()]
+    lines += ["# HELP admission_waiting Requests queued for a slot per route group.", "# TYPE admission_waiting gauge"]
+    lines += [f'admission_waiting{{route="{prefix}"}} {limiter.waiting}' for prefix, limiter in _limiters.items()]
+    lines += ["# HELP admission_rejected_total Requests turned away per route group and status.", "# TYPE admission_rejected_total counter"]
+    lines += [
+        f'admission_rejected_total{{route="{prefix}",status="{status}"}} {count}'
+        for prefix, limiter in _limiters.items() for status, count in limiter.rejected.items()
+    ]
+    return "\n".join(lines) + "\n"
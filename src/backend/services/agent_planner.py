@@ -0,0 +1,177 @@
+import re
+import json
+import bisect
+import asyncio
+import logging
+from src.backend.core.config import MAX_PLAN_STEPS, CONTEXT_TOKEN_BUDGET
+from src.backend.services.llm_model import get_llm
+from src.backend.services.rag_retriver import retrieve_documents, query_process_agent
+from src.backend.services.query_router import analytics_lines
+from src.backend.services.context_budget import estimate_tokens, fit_lines
+from src.backend.services.query_filters import parse_query_filters
+from src.backend.services.model_router import run_task
+from src.backend.services.tracing import span, TracingCallbackHandler
+
+#Planner prompt: one call that lists every retrieval the answer needs
+PLANNER_PROMPT = """You plan data retrieval for a financial analyst answering questions about companies listed on the Colombo Stock Exchange.
+Available companies: Dipped Products PLC (DIPD) and Richard Pieris Exports PLC (REXP).
+Available metrics per quarter: Revenue, COGS, Gross Profit, Operating Expenses, Operating Income, Net Income.
+Financial quarters end in March (Q1), June (Q2), September (Q3), and December (Q4).
+
+Break the question into independent retrieval queries. Each query must name exactly one company, the metric(s) and the period(s) it needs, so that it can run on its own.
+Use at most {max_steps} queries. If the question is a greeting or not about financial data, return an empty list.
+
+Return only a JSON object, no commentary:
+{{"retrievals": ["<retrieval query>", ...]}}
+
+QUESTION: {question}
+"""
+
+#Synthesis prompt: one call that answers from all retrieved facts
+SYNTHESIS_PROMPT = """You are a professional financial analyst with expertise in interpreting corporate financial data.
+
+RETRIEVED FINANCIAL DATA:
+{context}
+{history}
+USER QUESTION:
+{question}
+
+INSTRUCTIONS:
+1. Answer only from the retrieved data above
+2. Financial quarters end in March (Q1), June (Q2), September (Q3), and December (Q4)
+3. When calculating growth rates, use (New Value - Old Value) / Old Value * 100% and show the calculation
+4. Present monetary values with appropriate currency symbols and formatting
+5. For comparisons, state the values for every company and period involved
+6. If data needed for the answer is missing, say which data is missing
+7. Earlier turns of the conversation are for reference only; answer the current question
+8. If the question is a greeting, respond briefly; for non-financial questions say you are not aware
+
+ANSWER:
+"""
+
+#Extract the first JSON object from an LLM response
+def parse_json_object(raw_text: str) -> dict:
+    raw_text = raw_text.strip()
+    if raw_text.startswith("```json"):
+        raw_text = raw_text[7:]
+    if raw_text.endswith("```"):
+        raw_text = raw_text[:-3]
+
+    json_match = re.search(r'\{.*\}', raw_text, re.DOTALL)
+    if not json_match:
+        raise ValueError("No valid JSON object found in planner output.")
+    return json.loads(json_match.group(0))
+
+def parse_plan(response) -> list:
+    plan = parse_json_object(response.content)
+    retrievals = plan.get("retrievals", [])
+    if not isinstance(retrievals, list):
+        raise ValueError(f"Planner returned an invalid retrieval list: {retrievals}")
+    steps = list(dict.fromkeys(str(step).strip() for step in retrievals if str(step).strip()))
+    return steps[:MAX_PLAN_STEPS]
+
+#LLM call 1: emit the retrieval plan; an empty plan for a question naming a company goes to the strong model
+def plan_query(query: str) -> list:
+    prompt = PLANNER_PROMPT.format(question=query, max_steps=MAX_PLAN_STEPS)
+    call = lambda tier: get_llm("planner", tier).invoke(prompt, config={"callbacks": [TracingCallbackHandler()]})
+    check = lambda steps: "empty plan for a question about a company" if not steps and parse_query_filters(query)["symbols"] else None
+    return run_task("planner", call, parse=parse_plan, check=check)
+
+#Amounts in an answer or its data, scaled to units; "Rs. 4.52 million" and "4,520,000" are the same figure.
+#Percentages are rates, not amounts, and are left out like years
+NUMBER_PATTERN = re.compile(r"(-?\d[\d,]*(?:\.\d+)?)(\s*%|\s*(?:thousand|million|billion|mn|bn|k|m)\b)?", re.IGNORECASE)
+SCALES = {"thousand": 1e3, "k": 1e3, "million": 1e6, "mn": 1e6, "m": 1e6, "billion": 1e9, "bn": 1e9}
+
+#(value, tolerance) of every amount of at least 1,000, where a misread or invented number matters.
+#The tolerance is the larger of 0.1% and the rounding the figure was written with
+def figures(text: str) -> list:
+    amounts = []
+    for number, suffix in NUMBER_PATTERN.findall(text):
+        suffix = suffix.strip().lower()
+        if suffix == "%":
+            continue
+        value = float(number.replace(",", ""))
+        scale = SCALES.get(suffix, 1)
+        if scale == 1 and "," not in number and value.is_integer() and 1900 <= abs(value) <= 2100:
+            continue
+        decimals = len(number.split(".")[1]) if "." in number else 0
+        value *= scale
+        if abs(value) < 1000:
+            continue
+        amounts.append((value, max(0.001 * abs(value), 0.5 * scale * 10 ** -decimals)))
+    return amounts
+
+#Self-consistency of an answer: every large amount must be a retrieved value, or the sum, difference,
+#product or quotient of two. Ratios, growth rates and CAGRs are rates below the threshold and are not checked
+def unsupported_figures(answer: str, context: str) -> list:
+    known = {value for value, _ in figures(context)}
+    derived = set(known)
+    for a in known:
+        for b in known:
+            derived.update((a + b, a - b, a * b))
+            if b:
+                derived.add(a / b)
+    derived = sorted(derived)
+    unsupported = []
+    for number, tolerance in figures(answer):
+        position = bisect.bisect_left(derived, number - tolerance)
+        if position == len(derived) or derived[position] > number + tolerance:
+            unsupported.append(number)
+    return unsupported
+
+#Retrieval step without an LLM call: the raw facts go straight to synthesis.
+#memory is a conversation session or a batch's shared retrievals, which reuse documents already retrieved
+def run_retrieval_step(step_query: str, memory=None) -> str:
+    try:
+        with span("retrieval_step", "tool", query=step_query) as step_span:
+            if memory is not None:
+                docs, reused = memory.retrieve(step_query)
+                step_span["attributes"]["reused"] = reused
+            else:
+                docs = retrieve_documents(step_query)
+            #Precomputed ratios and trends for the same companies and periods, in what is left of the step's token budget
+            ratio_lines = analytics_lines(step_query)
+            doc_tokens = sum(estimate_tokens(doc.page_content) for doc in docs)
+            ratio_lines, available = fit_lines(ratio_lines, CONTEXT_TOKEN_BUDGET - doc_tokens), len(ratio_lines)
+            step_span["attributes"].update({"documents": len(docs), "ratio_lines": len(ratio_lines), "ratio_lines_dropped": available - len(ratio_lines)})
+        if not docs and not ratio_lines:
+            return "No relevant financial information found."
+        return "\n".join([f"- {doc.page_content}" for doc in docs] + [f"- {line}" for line in ratio_lines])
+    except Exception as e:
+        logging.error(f"Error in retrieval step '{step_query}': {e}")
+        return f"Retrieval failed: {str(e)}"
+
+#LLM call 2: answer from every retrieved fact
+def synthesize_answer(query: str, steps: list, contexts: list, history: str = "") -> str:
+    context = "\n\n".join(f"[{i}] {step}\n{result}" for i, (step, result) in enumerate(zip(steps, contexts), start=1))
+    history = f"\nCONVERSATION SO FAR:\n{history}\n" if history else ""
+    prompt = SYNTHESIS_PROMPT.format(context=context or "None", history=history, question=query)
+    call = lambda tier: get_llm("synthesis", tier).invoke(prompt, config={"callbacks": [TracingCallbackHandler()]})
+
+    #Figures the retrieved data cannot account for send the answer to the strong model
+    def check(answer):
+        if not answer.strip():
+            return "empty answer"
+        unsupported = unsupported_figures(answer, context + history)
+        return f"figures not in the retrieved data: {unsupported[:5]}" if unsupported else None
+
+    return run_task("synthesis", call, parse=lambda response: response.content, check=check)
+
+#Plan, run independent retrievals concurrently, then synthesize
+async def plan_and_execute(query: str, memory=None) -> str:
+    logging.info(f"\nFinancial Analyst Assistant (planned)")
+    logging.info(f"Question: {query}")
+    try:
+        steps = await asyncio.to_thread(plan_query, query)
+        logging.info(f"Retrieval plan: {steps}")
+
+        contexts = await asyncio.gather(*(asyncio.to_thread(run_retrieval_step, step, memory) for step in steps))
+        history = memory.history() if memory is not None else ""
+        final_answer = await asyncio.to_thread(synthesize_answer, query, steps, list(contexts), history)
+        logging.info(f"\nFinancial Analysis Result: {final_answer}")
+        return final_answer
+
+    except Exception as e:
+        #Fall back to the step-by-step agent when planning fails
+        logging.error(f"Error in planned execution, falling back to ReAct agent: {e}")
+        return await query_process_agent(query, memory)
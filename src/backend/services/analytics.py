@@ -0,0 +1,210 @@
+import logging
+import threading
+from src.backend.services.fact_store import fact_source
+from src.backend.services.snapshot import get_snapshot, publish_snapshot
+
+#Metrics extracted from every report
+ANALYTICS_METRICS = ["Revenue", "COGS", "Gross Profit", "Operating Expenses", "Operating Income", "Net Income"]
+
+#Ratio name -> (numerator metric, denominator metric), in percent
+RATIO_DEFINITIONS = {
+    "gross_margin": ("Gross Profit", "Revenue"),
+    "operating_margin": ("Operating Income", "Revenue"),
+    "net_margin": ("Net Income", "Revenue"),
+    "opex_ratio": ("Operating Expenses", "Revenue"),
+}
+
+#Derived measure suffixes and their labels
+TRANSFORM_LABELS = {
+    "qoq": "QoQ growth",
+    "yoy": "YoY growth",
+    "ttm": "TTM",
+    "zscore": "z-score",
+    "cagr": "CAGR",
+}
+
+RATIO_LABELS = {
+    "gross_margin": "Gross profit margin",
+    "operating_margin": "Operating margin",
+    "net_margin": "Net profit margin",
+    "opex_ratio": "Operating expense ratio",
+}
+
+#Column key of a metric, e.g. "Net Income" -> "net_income"
+def metric_key(metric: str) -> str:
+    return metric.lower().replace(" ", "_")
+
+METRIC_BY_KEY = {metric_key(metric): metric for metric in ANALYTICS_METRICS}
+
+#Human readable name of a measure column
+def measure_label(measure: str) -> str:
+    if measure in RATIO_LABELS:
+        return RATIO_LABELS[measure]
+    key, _, transform = measure.rpartition("_")
+    if transform in TRANSFORM_LABELS and key in METRIC_BY_KEY:
+        return f"{METRIC_BY_KEY[key]} {TRANSFORM_LABELS[transform]}"
+    return measure
+
+#Render a measure value with its unit
+def format_measure(measure: str, value) -> str:
+    transform = measure.rpartition("_")[2]
+    if measure in RATIO_DEFINITIONS or transform in ("qoq", "yoy", "cagr"):
+        return f"{value:,.2f} %"
+    if transform == "zscore":
+        return f"{value:.2f}"
+    return f"Rs. {value:,.2f}"
+
+def _empty_analytics():
+    import pandas as pd
+    table = pd.DataFrame(index=pd.MultiIndex.from_arrays([[], []], names=["symbol", "date"]))
+    cagr = pd.DataFrame(columns=["start", "end", "years", "start_value", "end_value", "cagr"],
+                        index=pd.MultiIndex.from_arrays([[], []], names=["symbol", "measure"]))
+    return {"table": table, "cagr": cagr}
+
+#Ratios, growth, TTM sums, z-scores and CAGR for every company and quarter in one pass
+def compute_analytics(facts) -> dict:
+    import numpy as np
+    import pandas as pd
+    facts = facts.dropna(subset=["date"])
+    if facts.empty:
+        return _empty_analytics()
+
+    #One row per (symbol, quarter) on a gap-free quarterly grid, so shift(n) is always n quarters back
+    facts = facts.assign(quarter_period=facts["date"].dt.to_period("Q"))
+    wide = facts.pivot_table(index=["symbol", "quarter_period"], columns="metric", values="value", aggfunc="first")
+    wide = wide.reindex(columns=[metric for metric in ANALYTICS_METRICS if metric in wide.columns])
+    spans = wide.reset_index().groupby("symbol")["quarter_period"].agg(["min", "max"])
+    grid = pd.MultiIndex.from_tuples(
+        [(symbol, quarter) for symbol, row in spans.iterrows() for quarter in pd.period_range(row["min"], row["max"], freq="Q")],
+        names=["symbol", "quarter_period"]
+    )
+    wide = wide.reindex(grid)
+    by_symbol = wide.groupby(level="symbol")
+
+    #Margins and opex ratio
+    revenue = wide["Revenue"].where(wide["Revenue"] != 0) if "Revenue" in wide else pd.Series(np.nan, index=wide.index)
+    ratios = pd.DataFrame(index=wide.index)
+    for name, (numerator, _) in RATIO_DEFINITIONS.items():
+        values = wide[numerator] if numerator in wide else pd.Series(np.nan, index=wide.index)
+        ratios[name] = (values.abs() if name == "opex_ratio" else values) / revenue * 100
+
+    #Growth against the previous quarter and the same quarter a year earlier
+    previous, year_ago = by_symbol.shift(1), by_symbol.shift(4)
+    qoq = (wide - previous) / previous.abs().where(previous != 0) * 100
+    yoy = (wide - year_ago) / year_ago.abs().where(year_ago != 0) * 100
+
+    #Trailing twelve months: the last four quarters, all of them reported
+    ttm = wide + previous + by_symbol.shift(2) + by_symbol.shift(3)
+
+    #Position of each quarter within the company's own history
+    zscore = (wide - by_symbol.transform("mean")) / by_symbol.transform("std").where(lambda std: std != 0)
+
+    derived = [ratios]
+    for suffix, frame in (("qoq", qoq), ("yoy", yoy), ("ttm", ttm), ("zscore", zscore)):
+        derived.append(frame.rename(columns=lambda metric: f"{metric_key(metric)}_{suffix}"))
+    table = pd.concat([wide] + derived, axis=1).round(4)
+
+    #Keep reported quarters only and index them by the quarter-end month, like the fact table
+    table = table[wide.notna().any(axis=1)].reset_index()
+    table["date"] = table["quarter_period"].dt.asfreq("M", "end").dt.to_timestamp()
+    table = table.drop(columns="quarter_period").set_index(["symbol", "date"]).sort_index()
+
+    #Compound annual growth between the first and last reported quarter of each metric
+    long = wide.stack().rename("value").reset_index().sort_values("quarter_period")
+    long["ordinal"] = long["quarter_period"].dt.year * 4 + long["quarter_period"].dt.quarter
+    endpoints = long.groupby(["symbol", "metric"]).agg(
+        start=("quarter_period", "first"), end=("quarter_period", "last"),
+        start_ordinal=("ordinal", "first"), end_ordinal=("ordinal", "last"),
+        start_value=("value", "first"), end_value=("value", "last")
+    )
+    years = (endpoints["end_ordinal"] - endpoints["start_ordinal"]) / 4
+    #Costs are stored as negatives; growth is defined while the sign does not flip
+    valid = (years >= 1) & (endpoints["start_value"] * endpoints["end_value"] > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = ((endpoints["end_value"] / endpoints["start_value"]) ** (1 / years.where(valid)) - 1) * 100
+    cagr = pd.DataFrame({
+        "start": endpoints["start"].dt.strftime("%m/%Y"),
+        "end": endpoints["end"].dt.strftime("%m/%Y"),
+        "years": years,
+        "start_value": endpoints["start_value"],
+        "end_value": endpoints["end_value"],
+        "cagr": growth.where(valid).round(4),
+    })
+    cagr.index = pd.MultiIndex.from_arrays(
+        [cagr.index.get_level_values("symbol"), [f"{metric_key(metric)}_cagr" for metric in cagr.index.get_level_values("metric")]],
+        names=["symbol", "measure"]
+    )
+    return {"table": table, "cagr": cagr.sort_index()}
+
+#Analytics materialized once per dataset version; the published snapshot already holds them
+_analytics_lock = threading.Lock()
+_analytics_cache = {"signature": None, "analytics": None}
+
+def get_analytics() -> dict:
+    return analytics_source()[1]
+
+#Facts, their analytics and the version both belong to, from one read
+def analytics_source():
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot["facts"], snapshot["analytics"], snapshot["version"]
+    facts, version = fact_source()
+    with _analytics_lock:
+        if _analytics_cache["signature"] != version:
+            _analytics_cache["analytics"] = with_lookups(compute_analytics(facts))
+            _analytics_cache["signature"] = version
+            logging.info(f"Materialized analytics for {len(_analytics_cache['analytics']['table'])} company quarters")
+        return facts, _analytics_cache["analytics"], version
+
+#Publish a snapshot right after an ingest and map it, so the first reader does not pay for it
+def materialize_analytics() -> str:
+    version = publish_snapshot()
+    analytics = get_analytics()
+    return f"Materialized {len(analytics['table'])} company quarters in snapshot {version}"
+
+#Plain lookups over a set of analytics, built once before the frames are shared. Request threads only read
+#these dicts and arrays, never the shared frames' indexes, whose lazily built lookup caches are not thread safe
+def with_lookups(analytics) -> dict:
+    import numpy as np
+    import pandas as pd
+    table, cagr = analytics["table"], analytics["cagr"]
+    #The table is sorted by (symbol, date), so each measure's periods come out in date order
+    symbols = table.index.get_level_values("symbol").tolist()
+    periods = table.index.get_level_values("date").strftime("%m/%Y").tolist()
+    values = table.to_numpy(dtype=float)
+    measures = {}
+    for position, measure in enumerate(table.columns):
+        column = values[:, position]
+        for row in np.flatnonzero(~np.isnan(column)):
+            measures.setdefault((symbols[row], measure), {})[periods[row]] = column[row]
+    growth = {key: (f"{row['start']}-{row['end']}", row["cagr"]) for key, row in cagr.iterrows() if pd.notna(row["cagr"])}
+    lookups = {
+        "rows": dict(zip(zip(symbols, table.index.get_level_values("date")), range(len(table)))),
+        #Row values by (symbol, date), with a trailing all-NaN row for keys the table does not have
+        "values": np.vstack([values, np.full((1, len(table.columns)), np.nan)]),
+        "columns": list(table.columns),
+        "measures": measures,
+        "cagr": growth,
+    }
+    return {**analytics, "lookups": lookups}
+
+#Rows of the analytics table for a (symbol, date) index, as a frame the caller owns
+def analytics_rows(index, analytics=None):
+    import pandas as pd
+    lookups = (analytics if analytics is not None else get_analytics())["lookups"]
+    positions = [lookups["rows"].get(key, -1) for key in index]
+    return pd.DataFrame(lookups["values"][positions], index=index, columns=lookups["columns"])
+
+#Lookup of one measure; the latest reported value when no period is given
+def lookup_measure(symbol: str, measure: str, period: str = None):
+    import pandas as pd
+    lookups = get_analytics()["lookups"]
+    if measure.endswith("_cagr"):
+        return lookups["cagr"].get((symbol, measure))
+    values = lookups["measures"].get((symbol, measure))
+    if not values:
+        return None
+    if period:
+        key = pd.to_datetime(period, format="%m/%Y").strftime("%m/%Y")
+        return (period, values[key]) if key in values else None
+    return next(reversed(values.items()))
@@ -0,0 +1,132 @@
+import json
+import time
+import asyncio
+import logging
+import threading
+import weakref
+from concurrent.futures import Future
+from src.backend.core.config import AGENT_MODE, BATCH_CONCURRENCY, BATCH_MAX_ITEMS, FILES_METADATA
+from src.backend.services.query_filters import parse_query_filters
+from src.backend.services.query_router import fast_path_answer
+from src.backend.services.rag_retriver import retrieve_documents, query_process_agent
+from src.backend.services.agent_planner import plan_and_execute
+from src.backend.services.conversation import filter_key
+from src.backend.services.tracing import start_trace, span
+
+#Batch questions running at once across every batch request of this worker; one semaphore per event loop,
+#since a semaphore that has made a task wait is bound to its loop
+_batch_semaphores = weakref.WeakKeyDictionary()
+
+def batch_semaphore():
+    loop = asyncio.get_running_loop()
+    if loop not in _batch_semaphores:
+        _batch_semaphores[loop] = asyncio.Semaphore(max(1, BATCH_CONCURRENCY))
+    return _batch_semaphores[loop]
+
+COMPANIES = {metadata["symbol"]: metadata["company"] for metadata in FILES_METADATA.values()}
+
+#Questions of a batch request: the listed ones, then the template asked for every symbol
+def expand_batch(questions=None, template=None, symbols=None) -> list:
+    expanded = [question.strip() for question in questions or [] if question and question.strip()]
+    if template:
+        if "{symbol}" not in template and "{company}" not in template:
+            raise ValueError("template must contain {symbol} or {company}")
+        symbols = symbols or sorted(COMPANIES)
+        unknown = [symbol for symbol in symbols if symbol not in COMPANIES]
+        if unknown:
+            raise ValueError(f"Unknown symbols {unknown}, expected some of {sorted(COMPANIES)}")
+        expanded += [template.replace("{symbol}", symbol).replace("{company}", COMPANIES[symbol]) for symbol in symbols]
+    if not expanded:
+        raise ValueError("Provide questions or a template")
+    if len(expanded) > BATCH_MAX_ITEMS:
+        raise ValueError(f"Batch has {len(expanded)} questions, at most {BATCH_MAX_ITEMS} are allowed")
+    return expanded
+
+#Retrievals shared by every question of a batch; concurrent steps with the same filters search and embed once
+class BatchRetrievals:
+    def __init__(self):
+        self._results = {}
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.reused = 0
+
+    def retrieve(self, step_query: str):
+        filters = parse_query_filters(step_query)
+        key = filter_key(filters) if filters["symbols"] else ("query", " ".join(step_query.lower().split()))
+        with self._lock:
+            future = self._results.get(key)
+            owner = future is None
+            if owner:
+                future = self._results[key] = Future()
+                self.searches += 1
+            else:
+                self.reused += 1
+        if not owner:
+            return future.result(), True
+
+        try:
+            docs = retrieve_documents(step_query)
+        except BaseException as e:
+            #Steps waiting now share the failure; later ones search again
+            with self._lock:
+                self._results.pop(key, None)
+            future.set_exception(e)
+            raise
+        future.set_result(docs)
+        return docs, False
+
+    #Batch questions are independent, so there is no conversation to add to the prompt
+    def history(self):
+        return ""
+
+#One question under the global cap, traced like a chat request
+async def answer_question(question: str, shared: BatchRetrievals) -> dict:
+    async with batch_semaphore():
+        started = time.perf_counter()
+        with start_trace("query_batch_item", agent_mode=AGENT_MODE, query=question[:500]) as trace:
+            with span("fast_path", "router") as router_span:
+                answer = await asyncio.to_thread(fast_path_answer, question)
+                router_span["attributes"]["hit"] = answer is not None
+            route = "fast_path"
+            if answer is None and AGENT_MODE == "plan":
+                answer, route = await plan_and_execute(question, shared), "planned"
+            elif answer is None:
+                answer, route = await query_process_agent(question, shared), "agent"
+        return {"answer": answer, "route": route, "trace_id": trace["trace_id"],
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+#NDJSON lines in completion order, one per question; repeated questions are answered once
+async def stream_batch(questions: list):
+    shared = BatchRetrievals()
+    positions = {}
+    for index, question in enumerate(questions):
+        positions.setdefault(question, []).append(index)
+
+    async def run(question):
+        try:
+            return question, await answer_question(question, shared)
+        except Exception as e:
+            logging.error(f"Error in batch question '{question}': {e}")
+            return question, {"error": str(e)}
+
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(run(question)) for question in positions]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            question, result = await next_done
+            for index in positions[question]:
+                yield json.dumps({"index": index, "question": question, **result}) + "\n"
+        summary = {
+            "summary": True,
+            "questions": len(questions),
+            "unique_questions": len(positions),
+            "searches": shared.searches,
+            "reused_searches": shared.reused,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        logging.info(f"Batch finished: {summary}")
+        yield json.dumps(summary) + "\n"
+    finally:
+        #A client that disconnects cancels the questions still waiting
+        for task in tasks:
+            task.cancel()
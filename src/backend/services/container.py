@@ -0,0 +1,57 @@
+import time
+import logging
+import threading
+
+#Factories for heavy singletons, built on first use
+_factories = {}
+_instances = {}
+_build_seconds = {}
+_lock = threading.RLock()
+
+#Register a factory under a name, usable as a decorator
+def register(name: str, factory=None):
+    def decorator(func):
+        _factories[name] = func
+        return func
+    return decorator(factory) if factory is not None else decorator
+
+#Return the singleton, constructing it on first use
+def get(name: str):
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+
+    with _lock:
+        if name not in _instances:
+            if name not in _factories:
+                raise KeyError(f"No service registered under '{name}'")
+            start = time.perf_counter()
+            _instances[name] = _factories[name]()
+            _build_seconds[name] = time.perf_counter() - start
+            logging.info(f"Initialized {name} in {_build_seconds[name]:.3f}s")
+        return _instances[name]
+
+#Replace a service, e.g. with a local fake in benchmarks
+def override(name: str, instance):
+    with _lock:
+        _instances[name] = instance
+
+#Drop constructed singletons so the next get() rebuilds them
+def reset(*names):
+    with _lock:
+        for name in names or list(_instances):
+            _instances.pop(name, None)
+            _build_seconds.pop(name, None)
+
+#Construct services ahead of the first request; failures are logged, not raised
+def warm_up(names=None) -> dict:
+    report = {}
+    for name in names or list(_factories):
+        try:
+            get(name)
+            report[name] = round(_build_seconds.get(name, 0.0), 3)
+        except Exception as e:
+            logging.error(f"Warm-up of {name} failed: {e}")
+            report[name] = f"failed: {e}"
+    logging.info(f"Warm-up report: {report}")
+    return report
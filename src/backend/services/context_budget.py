@@ -0,0 +1,136 @@
+import re
+import math
+import logging
+from langchain_core.documents import Document
+from src.backend.core.config import CONTEXT_TOKEN_BUDGET
+from src.backend.services.query_filters import parse_query_filters
+
+#Word pieces, numbers and punctuation, roughly as a sentencepiece tokenizer splits them
+TOKEN_ESTIMATE_PATTERN = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+ROW_VALUE_PATTERN = re.compile(r"(\d{2}/\d{4}): ([^,]+)")
+
+#Fast local token estimate, no tokenizer download or API call
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return max(len(TOKEN_ESTIMATE_PATTERN.findall(text)), math.ceil(len(text) / 4))
+
+#Longest prefix of a text, cut at a word boundary, whose estimate fits max_tokens
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    cut = text[:low]
+    return cut[:cut.rfind(" ")] if " " in cut else cut
+
+#Leading lines that fit a token budget
+def fit_lines(lines, token_budget: int) -> list:
+    kept = []
+    for line in lines:
+        tokens = estimate_tokens(line)
+        if tokens > token_budget:
+            break
+        kept.append(line)
+        token_budget -= tokens
+    return kept
+
+#Whether a MM/YYYY period matches the parsed year and quarter constraints
+def period_is_relevant(period: str, filters: dict) -> bool:
+    month, year = int(period[:2]), int(period[-4:])
+    if filters["years"] and year not in filters["years"]:
+        return False
+    if filters["quarters"] and (month - 1) // 3 + 1 not in filters["quarters"]:
+        return False
+    return True
+
+#MM/YYYY period a number of months later
+def shift_period(period: str, months: int) -> str:
+    index = int(period[-4:]) * 12 + int(period[:2]) - 1 + months
+    return f"{index % 12 + 1:02d}/{index // 12}"
+
+#Periods asked about, and the previous quarter and the same quarter a year earlier they are compared against
+def period_is_kept(period: str, filters: dict) -> bool:
+    return any(period_is_relevant(shift_period(period, months), filters) for months in (0, 3, 12))
+
+#Drop exact duplicates, repeated facts and chunks contained in another chunk
+def dedupe_documents(docs):
+    unique = []
+    seen_keys = set()
+    for doc in docs:
+        metadata = doc.metadata or {}
+        if metadata.get("doc_type") == "fact":
+            key = ("fact", metadata.get("symbol"), metadata.get("metric"), metadata.get("period"))
+        else:
+            key = ("text", doc.page_content.strip())
+        if key in seen_keys:
+            continue
+        if any(doc.page_content in kept.page_content for kept in unique):
+            continue
+        seen_keys.add(key)
+        unique.append(doc)
+    return unique
+
+#Keep only the metrics and periods the question asks about, with their QoQ and YoY comparison periods
+def trim_document(doc, filters: dict):
+    metadata = doc.metadata or {}
+    if filters["symbols"] and metadata.get("symbol") and metadata["symbol"] not in filters["symbols"]:
+        return None
+    metric = metadata.get("metric") or metadata.get("data_point_name")
+    if filters["metrics"] and metric and metric not in filters["metrics"]:
+        return None
+
+    if metadata.get("doc_type") == "fact":
+        period = metadata.get("period")
+        return doc if not period or period_is_kept(period, filters) else None
+
+    #Row documents carry every period as "MM/YYYY: value" pairs
+    if not (filters["years"] or filters["quarters"]):
+        return doc
+    values = ROW_VALUE_PATTERN.findall(doc.page_content)
+    if not values:
+        return doc
+    kept = [f"{period}: {value}" for period, value in values if period_is_kept(period, filters)]
+    if not kept:
+        return None
+    prefix = doc.page_content.split("Values:")[0]
+    return Document(page_content=f"{prefix}Values: {', '.join(kept)}", metadata=metadata)
+
+#Deduplicate, trim and fit the retrieved documents into the token budget
+def assemble_context(docs, query: str, token_budget: int = CONTEXT_TOKEN_BUDGET, fixed_prompt: str = ""):
+    filters = parse_query_filters(query)
+    unique = dedupe_documents(docs)
+    trimmed = [doc for doc in (trim_document(doc, filters) for doc in unique) if doc is not None]
+
+    #Trimming is heuristic; never hand the QA chain an empty context because of it
+    if not trimmed:
+        trimmed = unique
+
+    prompt_tokens = estimate_tokens(fixed_prompt) + estimate_tokens(query)
+    used_tokens = prompt_tokens
+    selected = []
+    for doc in trimmed:
+        doc_tokens = estimate_tokens(doc.page_content)
+        if used_tokens + doc_tokens > token_budget:
+            #A first document larger than the whole budget is cut down instead of passed through whole
+            if not selected and token_budget > used_tokens:
+                text = truncate_to_tokens(doc.page_content, token_budget - used_tokens)
+                if text:
+                    selected.append(Document(id=doc.id, page_content=text, metadata=doc.metadata))
+                    used_tokens += estimate_tokens(text)
+            break
+        selected.append(doc)
+        used_tokens += doc_tokens
+
+    raw_tokens = sum(estimate_tokens(doc.page_content) for doc in docs)
+    logging.info(
+        f"Context assembled: {len(docs)} -> {len(selected)} docs, "
+        f"context tokens {raw_tokens} -> {used_tokens - prompt_tokens}, "
+        f"tokens in ~{used_tokens} (budget {token_budget})"
+    )
+    return selected, used_tokens
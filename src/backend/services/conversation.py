@@ -0,0 +1,307 @@
+import os
+import re
+import json
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from collections import OrderedDict, deque
+from langchain_core.documents import Document
+from src.backend.core.config import SESSION_STORE_SIZE, SESSION_TTL, SESSION_MAX_TURNS, SESSION_MAX_FACTS, SESSION_STORE, SESSION_DIR
+from src.backend.services.file_io import atomic_write, FileLock
+from src.backend.services.query_filters import parse_query_filters, parse_measures
+from src.backend.services.analytics import measure_label
+from src.backend.services.fact_store import get_fact_frame, data_signature
+
+#Relative periods of a follow-up, as quarters from the previous question's period
+RELATIVE_PERIODS = {
+    "previous quarter": -1, "prior quarter": -1, "last quarter": -1, "quarter before": -1,
+    "next quarter": 1, "following quarter": 1,
+    "previous year": -4, "prior year": -4, "last year": -4, "a year earlier": -4, "year before": -4, "a year ago": -4,
+    "next year": 4, "following year": 4,
+}
+
+#Words that tie a question to the previous one, e.g. "and for REXP?" or "why did it change?"
+FOLLOW_UP_PATTERN = re.compile(r"\b(and|also|what about|how about|same|that|it|its|them|those|then|instead|again)\b")
+
+#Questions about every company on purpose, which must not inherit the previous question's company
+ALL_COMPANIES_PATTERN = re.compile(r"\b(both|all|each|every)\s+compan")
+
+#Steps a session remembers by their filters, besides the individual facts
+MAX_SESSION_STEPS = 32
+
+#Client supplied session ids are opaque tokens
+SESSION_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+def relative_shift(text: str):
+    for phrase, shift in RELATIVE_PERIODS.items():
+        if re.search(rf"\b{re.escape(phrase)}\b", text):
+            return shift
+    return None
+
+def shift_period(period, quarters):
+    year, quarter = period
+    ordinal = year * 4 + quarter - 1 + quarters
+    return ordinal // 4, ordinal % 4 + 1
+
+#Latest reported quarter of the companies, for "last quarter" after a question about the latest figures
+def latest_period(symbols):
+    facts = get_fact_frame()
+    dates = facts[facts["symbol"].isin(symbols)]["date"].dropna() if symbols else facts["date"].dropna()
+    if dates.empty:
+        return None
+    latest = dates.max()
+    return latest.year, latest.quarter
+
+#Filters of a retrieval step as a hashable key
+def filter_key(filters: dict):
+    return tuple(tuple(sorted(filters[key])) for key in ("symbols", "metrics", "years", "quarters"))
+
+#Prior turns, the entities the conversation is about, and the facts already retrieved for it
+class Session:
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.turns = deque(maxlen=SESSION_MAX_TURNS)
+        self.context = None
+        self.facts = OrderedDict()
+        self.steps = OrderedDict()
+        self.data_version = None
+        self.last_used = time.monotonic()
+        #Saves of the shared session file this copy has seen
+        self.revision = 0
+        self.stored_mtime = None
+        self.lock = asyncio.Lock()
+        self._facts_lock = threading.Lock()
+
+    #Standalone form of a question: companies, measures and period the question leaves out are taken from the previous one
+    def contextualize(self, query: str) -> str:
+        text = query.lower()
+        filters = parse_query_filters(query)
+        own_measures = parse_measures(query, filters)
+        shift = relative_shift(text)
+        explicit_period = bool(filters["years"] or filters["quarters"])
+        single_period = (filters["years"][0], filters["quarters"][0]) if len(filters["years"]) == 1 and len(filters["quarters"]) == 1 else None
+
+        all_companies = bool(ALL_COMPANIES_PATTERN.search(text))
+        elliptical = not (filters["symbols"] or all_companies) or not own_measures
+        mentions = filters["symbols"] or own_measures or explicit_period or shift is not None
+        follow_up = self.context is not None and (
+            shift is not None or (elliptical and (mentions or FOLLOW_UP_PATTERN.search(text)))
+        )
+        if not follow_up:
+            self.context = {"symbols": filters["symbols"], "measures": own_measures, "period": single_period}
+            return query
+
+        previous = self.context
+        symbols = filters["symbols"] or ([] if all_companies else previous["symbols"])
+        measures = own_measures or previous["measures"]
+        if explicit_period:
+            period = single_period
+        elif shift is not None:
+            base = previous["period"] or latest_period(symbols)
+            period = shift_period(base, shift) if base else None
+        else:
+            period = previous["period"]
+        self.context = {"symbols": symbols, "measures": measures, "period": period}
+
+        additions = []
+        if not filters["symbols"] and symbols:
+            additions.append(" and ".join(symbols))
+        if not own_measures and measures:
+            additions.append(", ".join(measure_label(measure) for measure in measures))
+        if not explicit_period and period:
+            additions.append(f"Q{period[1]} {period[0]}")
+        if not additions:
+            return query
+        standalone = f"{query} ({'; '.join(additions)})"
+        logging.info(f"Follow-up in session {self.session_id}: {standalone}")
+        return standalone
+
+    def add_turn(self, query: str, standalone: str, answer: str):
+        self.turns.append({"query": query, "standalone": standalone, "answer": answer})
+
+    #Earlier turns for the synthesis prompt
+    def history(self, max_chars=300):
+        return "\n".join(f"Q: {turn['standalone']}\nA: {str(turn['answer'])[:max_chars]}" for turn in self.turns)
+
+    #Facts retrieved earlier in the session are only reused while the data is unchanged
+    def _check_version(self):
+        version = json.dumps(data_signature())
+        if version != self.data_version:
+            self.facts.clear()
+            self.steps.clear()
+            self.data_version = version
+
+    #Documents of an earlier step with the same filters, or the individual facts when every one the step names is known
+    def cached_documents(self, step_query: str):
+        filters = parse_query_filters(step_query)
+        if not filters["symbols"]:
+            return None
+        with self._facts_lock:
+            self._check_version()
+            key = filter_key(filters)
+            if key in self.steps:
+                self.steps.move_to_end(key)
+                return self.steps[key]
+            if not (filters["metrics"] and filters["years"]):
+                return None
+            wanted = [
+                (symbol, metric, year, quarter)
+                for symbol in filters["symbols"] for metric in filters["metrics"]
+                for year in filters["years"] for quarter in (filters["quarters"] or [1, 2, 3, 4])
+            ]
+            if not all(fact in self.facts for fact in wanted):
+                return None
+            return [self.facts[fact] for fact in wanted]
+
+    #Documents for a plan step and whether they came from the session
+    def retrieve(self, step_query: str):
+        from src.backend.services.rag_retriver import retrieve_documents
+        docs = self.cached_documents(step_query)
+        if docs is not None:
+            return docs, True
+        docs = retrieve_documents(step_query)
+        self.remember(step_query, docs)
+        return docs, False
+
+    def remember(self, step_query: str, docs):
+        filters = parse_query_filters(step_query)
+        with self._facts_lock:
+            self._check_version()
+            if filters["symbols"]:
+                self.steps[filter_key(filters)] = docs
+            while len(self.steps) > MAX_SESSION_STEPS:
+                self.steps.popitem(last=False)
+            for doc in docs:
+                metadata = doc.metadata
+                if metadata.get("doc_type") == "fact":
+                    fact = (metadata["symbol"], metadata["metric"], metadata["year"], metadata["quarter"])
+                    self.facts[fact] = doc
+                    self.facts.move_to_end(fact)
+            while len(self.facts) > SESSION_MAX_FACTS:
+                self.facts.popitem(last=False)
+
+    #JSON form of the session for the shared store
+    def state(self) -> dict:
+        with self._facts_lock:
+            return {
+                "session_id": self.session_id,
+                "revision": self.revision,
+                "turns": list(self.turns),
+                "context": self.context,
+                "facts": [[list(fact), document_state(doc)] for fact, doc in self.facts.items()],
+                "steps": [[[list(part) for part in key], [document_state(doc) for doc in docs]] for key, docs in self.steps.items()],
+                "data_version": self.data_version,
+            }
+
+    def load_state(self, state: dict):
+        context = state["context"]
+        if context and context.get("period"):
+            context["period"] = tuple(context["period"])
+        with self._facts_lock:
+            self.turns = deque(state["turns"], maxlen=SESSION_MAX_TURNS)
+            self.context = context
+            self.facts = OrderedDict((tuple(fact), state_document(doc)) for fact, doc in state["facts"])
+            self.steps = OrderedDict(
+                (tuple(tuple(part) for part in key), [state_document(doc) for doc in docs]) for key, docs in state["steps"]
+            )
+            self.data_version = state["data_version"]
+            self.revision = state["revision"]
+
+def document_state(doc) -> dict:
+    return {"id": doc.id, "page_content": doc.page_content, "metadata": doc.metadata}
+
+def state_document(state: dict):
+    return Document(id=state["id"], page_content=state["page_content"], metadata=state["metadata"])
+
+#Shared session store: one JSON file per session, written after every turn
+def session_path(session_id: str) -> str:
+    return os.path.join(SESSION_DIR, f"{session_id}.json")
+
+#Take over turns another worker saved since this copy last saw the file; an expired file starts over
+def load_shared(session):
+    path = session_path(session.session_id)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return
+    if stat.st_mtime_ns == session.stored_mtime or time.time() - stat.st_mtime > SESSION_TTL:
+        return
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.info(f"Ignoring unreadable session file {path}: {e}")
+        return
+    if state["revision"] > session.revision:
+        session.load_state(state)
+    session.stored_mtime = stat.st_mtime_ns
+
+def save_shared(session):
+    session.revision += 1
+    path = session_path(session.session_id)
+    with atomic_write(path, durable=False) as f:
+        json.dump(session.state(), f, default=lambda value: value.item() if hasattr(value, "item") else str(value))
+    session.stored_mtime = os.stat(path).st_mtime_ns
+    #A new session file is a good moment to drop the expired ones
+    if session.revision == 1:
+        prune_shared()
+
+def prune_shared():
+    cutoff = time.time() - SESSION_TTL
+    for entry in os.scandir(SESSION_DIR):
+        try:
+            if entry.name.endswith(".json") and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            continue
+
+#One turn of a session: turns run in order, across workers too when sessions are shared
+@asynccontextmanager
+async def session_turn(session):
+    async with session.lock:
+        if SESSION_STORE != "file":
+            yield session
+            return
+        turn_lock = FileLock(f"session_{session.session_id}")
+        await asyncio.to_thread(turn_lock.acquire)
+        try:
+            await asyncio.to_thread(load_shared, session)
+            yield session
+            await asyncio.to_thread(save_shared, session)
+        finally:
+            turn_lock.release()
+
+#Sessions of this worker, least recently used first
+_sessions = OrderedDict()
+_sessions_lock = threading.Lock()
+
+#Session for an id, or a new one when the id is missing, unknown or expired
+def get_session(session_id: str = None) -> Session:
+    now = time.monotonic()
+    with _sessions_lock:
+        #Drop expired sessions from the old end
+        while _sessions:
+            oldest = next(iter(_sessions.values()))
+            if now - oldest.last_used <= SESSION_TTL:
+                break
+            _sessions.popitem(last=False)
+
+        if session_id and not SESSION_ID_PATTERN.fullmatch(session_id):
+            session_id = None
+        session = _sessions.get(session_id) if session_id else None
+        if session is None:
+            session = Session(session_id or uuid.uuid4().hex)
+            _sessions[session.session_id] = session
+            while len(_sessions) > SESSION_STORE_SIZE:
+                evicted, _ = _sessions.popitem(last=False)
+                logging.info(f"Evicted conversation session {evicted}")
+        session.last_used = now
+        _sessions.move_to_end(session.session_id)
+        return session
+
+def session_count():
+    with _sessions_lock:
+        return len(_sessions)
@@ -0,0 +1,113 @@
+import json
+import math
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from src.backend.services.analytics import RATIO_DEFINITIONS, analytics_rows
+
+#Growth and trailing figures shown next to the latest KPIs
+LATEST_TRENDS = ["revenue_yoy", "net_income_yoy", "revenue_ttm", "net_income_ttm"]
+
+#Recently built payloads keyed by ETag
+PAYLOAD_CACHE_SIZE = 64
+_payload_cache = OrderedDict()
+_payload_lock = threading.Lock()
+
+#Parse an MM/YYYY range bound
+def parse_period_bound(value):
+    import pandas as pd
+    if not value:
+        return None
+    try:
+        return pd.to_datetime(value, format="%m/%Y")
+    except ValueError:
+        raise ValueError(f"Invalid period '{value}', expected MM/YYYY")
+
+#ETag for a query: changes when the data version or the parameters change
+def dashboard_etag(version, symbols=None, start=None, end=None) -> str:
+    key = json.dumps([version, sorted(symbols or []), start or "", end or ""])
+    return '"' + hashlib.sha1(key.encode()).hexdigest() + '"'
+
+#Client already has this version; If-None-Match may list several tags, weak or "*"
+def etag_matches(if_none_match, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+def _clean(values):
+    return [None if value is None or (isinstance(value, float) and math.isnan(value)) else float(value) for value in values]
+
+#Typed per-company series and ratios for the dashboard, from one version's facts and analytics
+def build_dashboard_series(facts, analytics, symbols=None, start=None, end=None) -> dict:
+    import pandas as pd
+    if symbols:
+        facts = facts[facts["symbol"].isin(symbols)]
+
+    available = sorted(facts["date"].dropna().unique())
+    start_date, end_date = parse_period_bound(start), parse_period_bound(end)
+    if start_date is not None:
+        facts = facts[facts["date"] >= start_date]
+    if end_date is not None:
+        facts = facts[facts["date"] <= end_date]
+
+    dates = sorted(facts["date"].unique())
+    periods = [date.strftime("%m/%Y") for date in dates]
+    companies = dict(facts[["symbol", "company"]].drop_duplicates().itertuples(index=False))
+    if facts.empty:
+        return {"symbols": [], "companies": {}, "available_range": {"start": None, "end": None},
+                "periods": [], "series": {}, "ratios": {}, "latest": {}}
+
+    #One row per (symbol, date), including periods a company did not report
+    wide = facts.pivot_table(index=["symbol", "date"], columns="metric", values="value", aggfunc="first")
+    wide = wide.reindex(pd.MultiIndex.from_product([sorted(companies), dates], names=["symbol", "date"]))
+    #Ratios and trends come from the materialized analytics table
+    rows = analytics_rows(wide.index, analytics)
+    ratios = rows.reindex(columns=list(RATIO_DEFINITIONS)).round(2)
+    trends = rows.reindex(columns=LATEST_TRENDS).round(2)
+
+    series, ratio_series, latest = {}, {}, {}
+    for symbol in sorted(companies):
+        company_wide = wide.loc[symbol]
+        company_ratios = ratios.loc[symbol]
+        company_trends = trends.loc[symbol]
+        series[symbol] = {metric: _clean(company_wide[metric].tolist()) for metric in company_wide.columns}
+        ratio_series[symbol] = {name: _clean(company_ratios[name].tolist()) for name in company_ratios.columns}
+
+        #Most recent period with any metric reported
+        reported = company_wide.dropna(how="all")
+        if not reported.empty:
+            last_date = reported.index.max()
+            latest[symbol] = {"period": last_date.strftime("%m/%Y")}
+            latest[symbol].update(zip(company_wide.columns, _clean(company_wide.loc[last_date].tolist())))
+            latest[symbol].update(zip(company_ratios.columns, _clean(company_ratios.loc[last_date].tolist())))
+            latest[symbol].update(zip(company_trends.columns, _clean(company_trends.loc[last_date].tolist())))
+
+    return {
+        "symbols": sorted(companies),
+        "companies": companies,
+        "available_range": {
+            "start": available[0].strftime("%m/%Y") if available else None,
+            "end": available[-1].strftime("%m/%Y") if available else None,
+        },
+        "periods": periods,
+        "series": series,
+        "ratios": ratio_series,
+        "latest": latest,
+    }
+
+#Cached payload for an ETag, built on a miss
+def get_dashboard_series(etag: str, facts, analytics, symbols=None, start=None, end=None) -> dict:
+    with _payload_lock:
+        if etag in _payload_cache:
+            _payload_cache.move_to_end(etag)
+            return _payload_cache[etag]
+
+    payload = build_dashboard_series(facts, analytics, symbols, start, end)
+    with _payload_lock:
+        _payload_cache[etag] = payload
+        while len(_payload_cache) > PAYLOAD_CACHE_SIZE:
+            _payload_cache.popitem(last=False)
+    logging.info(f"Built dashboard series for {payload['symbols']} ({len(payload['periods'])} periods)")
+    return payload
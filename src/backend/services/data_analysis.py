@@ -1,23 +1,47 @@
-import pandas as pd
+import os
+from src.backend.core.config import FILES_METADATA, PROCESSED_CSV_DATA_PATH
 
-#TO validitity check the dataset
-df1 = pd.read_csv("data/processed_csv/dipd_processed_financial_data.csv")
-df2 = pd.read_csv("data/processed_csv/rexp_processed_financial_data.csv")
+#To validity check the dataset
+def check_datasets(data_path=PROCESSED_CSV_DATA_PATH) -> dict:
+    import pandas as pd
+    report = {}
+    for filename in FILES_METADATA:
+        file_path = os.path.join(data_path, filename)
+        if not os.path.exists(file_path):
+            report[filename] = {"missing": True}
+            continue
 
-#Printing Dataframes
-print(f"df1: {df1}")
-print(f"df2: {df2}")
+        df = pd.read_csv(file_path)
+        report[filename] = {
+            "missing": False,
+            "rows": len(df),
+            "periods": len([col for col in df.columns if col != "Data Point Name"]),
+            #Null Values
+            "nulls": int(df.isnull().sum().sum()),
+            #Duplicates
+            "duplicates": int(df.duplicated().sum()),
+        }
+    return report
 
-#Info Check
-print(f"df1 Info: {df1.info()}")
-print(f"df2 Info: {df2.info()}")
+if __name__ == "__main__":
+    import pandas as pd
+    for filename in FILES_METADATA:
+        file_path = os.path.join(PROCESSED_CSV_DATA_PATH, filename)
+        if not os.path.exists(file_path):
+            print(f"{filename}: not found")
+            continue
+        df = pd.read_csv(file_path)
 
-# Check for Null Values
-print("DF1 Nulls:\n", df1.isnull().sum())
-print("DF2 Nulls:\n", df2.isnull().sum())
+        #Printing Dataframes
+        print(f"{filename}: {df}")
 
+        #Info Check
+        df.info()
 
-#Check Duplicates
-print("DF1 Duplicates:", df1.duplicated().sum())
-print("DF2 Duplicates:", df2.duplicated().sum())
+        #Check for Null Values
+        print(f"{filename} Nulls:\n", df.isnull().sum())
 
+        #Check Duplicates
+        print(f"{filename} Duplicates:", df.duplicated().sum())
+
+    print(check_datasets())
@@ -0,0 +1,76 @@
+import io
+import json
+import hashlib
+from src.backend.core.config import EXPORT_CHUNK_ROWS
+from src.backend.services.fact_store import FACT_COLUMNS
+from src.backend.services.dashboard_data import parse_period_bound
+
+#Media types of the export formats: an Arrow IPC stream, or csv with one header row
+EXPORT_FORMATS = {"arrow": "application/vnd.apache.arrow.stream", "csv": "text/csv"}
+
+#Typed columns of the exported fact table
+def export_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("symbol", pa.string()), ("company", pa.string()), ("metric", pa.string()), ("period", pa.string()),
+        ("date", pa.date32()), ("year", pa.int32()), ("quarter", pa.int32()), ("value", pa.float64()),
+        ("source_file", pa.string()),
+    ])
+
+#ETag for an export: changes when the data, the filters or the format change
+def export_etag(version, export_format, symbols=None, metrics=None, start=None, end=None) -> str:
+    key = json.dumps([version, export_format, sorted(symbols or []), sorted(metrics or []), start or "", end or ""])
+    return '"' + hashlib.sha1(key.encode()).hexdigest() + '"'
+
+#Rows of one chunk that pass the filters; metric names match case-insensitively
+def filter_chunk(chunk, symbols=None, metrics=None, start_date=None, end_date=None):
+    conditions = []
+    if symbols:
+        conditions.append(chunk["symbol"].isin(symbols))
+    if metrics:
+        conditions.append(chunk["metric"].str.casefold().isin([metric.casefold() for metric in metrics]))
+    if start_date is not None:
+        conditions.append(chunk["date"] >= start_date)
+    if end_date is not None:
+        conditions.append(chunk["date"] <= end_date)
+    if not conditions:
+        return chunk
+    mask = conditions[0]
+    for condition in conditions[1:]:
+        mask = mask & condition
+    return chunk[mask]
+
+#Filtered slices of the fact table, EXPORT_CHUNK_ROWS rows of the source at a time
+def export_chunks(facts, symbols=None, metrics=None, start=None, end=None):
+    start_date, end_date = parse_period_bound(start), parse_period_bound(end)
+    for offset in range(0, len(facts), EXPORT_CHUNK_ROWS):
+        chunk = filter_chunk(facts.iloc[offset:offset + EXPORT_CHUNK_ROWS], symbols, metrics, start_date, end_date)
+        if not chunk.empty:
+            yield chunk[FACT_COLUMNS]
+
+#Arrow IPC stream: the schema, then one record batch per chunk. Only one chunk is held in memory at a time
+def arrow_stream(chunks):
+    import pyarrow as pa
+    schema = export_schema()
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    #End-of-stream marker
+    yield sink.getvalue()
+
+def csv_stream(chunks):
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header, float_format="%.15g", date_format="%Y-%m-%d")
+        header = False
+    if header:
+        yield ",".join(FACT_COLUMNS) + "\n"
+
+#Body of an export response; StreamingResponse iterates it in a worker thread
+def export_stream(facts, export_format, symbols=None, metrics=None, start=None, end=None):
+    chunks = export_chunks(facts, symbols, metrics, start, end)
+    return arrow_stream(chunks) if export_format == "arrow" else csv_stream(chunks)
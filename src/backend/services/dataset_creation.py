@@ -1,12 +1,17 @@
 import os
 import io
+import asyncio
 import re
 import json
 import logging
-import pandas as pd
-from collections import Counter
-from google import genai
-from src.backend.core.config import COMPANY_CONFIGS, GOOGLE_API_KEY
+from src.backend.core.config import COMPANY_CONFIGS, PROCESSED_CSV_DATA_PATH, EXTRACTION_MODE, MODEL_TASKS, EXTRACTION_TOLERANCE
+from src.backend.services.llm_model import get_genai_client, MODEL_TIERS
+from src.backend.services.model_router import run_task
+from src.backend.services.file_io import atomic_write
+from src.backend.services.report_store import download_times
+from src.backend.services.fact_ledger import build_ledger, quarterly_values, ledger_frame, period_key
+from src.backend.services.fact_store import parse_values
+from src.backend.services.analytics import materialize_analytics
 
 #Financial metrics to extract
 target_metrics = [
@@ -37,41 +42,15 @@ def standardize_metric(metric):
 
 #Extract datetime for sorting periods
 def extract_date(period_str):
+    import pandas as pd
     try:
         return pd.to_datetime(period_str, format="%m/%Y")
     except Exception as e:
         logging.error(f"Error in extract date: {e}")
         return pd.NaT
 
-#Output directory
-os.makedirs("data/processed_csv", exist_ok=True)
-
-async def create_dataset():
-    try:
-        #Loop through both companies
-        client = genai.Client(api_key=GOOGLE_API_KEY)
-        for company, config in COMPANY_CONFIGS.items():
-            input_dir = config["input_dir"]
-            output_csv = config["output_csv"]
-
-            logging.info(f"\nProcessing {company} reports in {input_dir}")
-            file_data = []
-
-            for filename in os.listdir(input_dir):
-                if filename.lower().endswith(".pdf"):
-                    logging.info(f"Processing {filename}...")
-                    file_path = os.path.join(input_dir, filename)
-
-                    try:
-                        #Upload PDF
-                        with open(file_path, "rb") as f:
-                            uploaded_file = client.files.upload(
-                                file=io.BytesIO(f.read()),
-                                config=dict(mime_type='application/pdf')
-                            )
-
-                        #System prompt
-                        prompt = """
+#System prompt for report extraction
+EXTRACTION_PROMPT = """
                         You are a senior financial data extraction assistant specializing in extracting accurate financial data from PDF statements.
 
                         Instructions:
@@ -111,61 +90,207 @@ async def create_dataset():
                         }
                         """
 
+#System prompt for multi-period extraction: every column of the statement, tagged by period type
+MULTI_PERIOD_PROMPT = """
+                        You are a senior financial data extraction assistant specializing in extracting accurate financial data from PDF statements.
+
+                        Instructions:
+                        1. Extract every period column of the income statement: the current quarter ("3 months ended"), the comparative quarter of the previous year, and any cumulative year-to-date columns ("6 months ended", "9 months ended", "12 months ended").
+                        2. Focus solely on the "Group" or "Consolidated" results, excluding any "Company" or standalone parent company columns.
+                        3. For every column report:
+                            Period: the end date of the column formatted as MM/YYYY.
+                            Months: the number of months the column covers (3, 6, 9 or 12).
+                            Role: "current" for columns of the period the report is published for, "comparative" for prior-year columns.
+                        4. Handle Negative Numbers:
+                            Any numbers enclosed in parentheses MUST be converted into negative value.
+                            Example: (3000) = -3000
+                        5. Handling Currency Scales:
+                            If values are labeled as Rs. '000 (thousands), multiply each value by 1,000.
+                            If labeled as Rs. Mn or Rs. Millions, multiply each value by 1,000,000.
+                            If labeled as Rs. Bn or Rs. Billions, multiply each value by 1,000,000,000.
+                            If no currency unit is specified, assume values are in full rupees unless context suggests otherwise.
+                        6. Key Metrics to Extract and Compute for every column:
+                            Revenue: Total revenue for the period of the column.
+                            Cost of Goods Sold (COGS) or Cost of Sales: The direct costs attributable to goods produced or sold (Negative).
+                            Gross Profit: Calculated as Revenue minus COGS.
+                            Operating Expenses: The (negative) sum of "Distribution Costs" and "Administrative Expenses" only (ignore other expenses like marketing, interest, etc.).
+                            Operating Income (or Profit from Operations): Gross Profit plus Other Operating Income minus Operating Expenses (excluding finance costs, taxes, and non-operating income).
+                            Net Income (or Profit for the Period): The final profit or loss after tax, including discontinued operations if reported.
+                        7. Output Requirements:
+                            Your output must be a valid JSON object with a "Columns" list holding one object per column.
+                            Ensure no commentary, extra symbols, or explanations are included.
+                            Use null for any missing values.
+
+                        Output format example:
+                        {
+                        "Columns": [
+                            {"Period": "MM/YYYY", "Months": 3, "Role": "current", "Revenue": "1000000", "COGS": "400000", "Gross Profit": "600000", "Operating Expenses": "150000", "Operating Income": "450000", "Net Income": "350000"},
+                            {"Period": "MM/YYYY", "Months": 3, "Role": "comparative", "Revenue": "900000", "COGS": "380000", "Gross Profit": "520000", "Operating Expenses": "140000", "Operating Income": "380000", "Net Income": "290000"},
+                            {"Period": "MM/YYYY", "Months": 9, "Role": "current", "Revenue": "2800000", "COGS": "1150000", "Gross Profit": "1650000", "Operating Expenses": "430000", "Operating Income": "1220000", "Net Income": "950000"}
+                        ]
+                        }
+                        """
+
+#Statement columns from either response layout; a single-period response is one current quarter
+def parse_columns(data):
+    raw_columns = data.get("Columns") if isinstance(data.get("Columns"), list) else [dict(data, Months=3, Role="current")]
+    columns = []
+    for column in raw_columns:
+        try:
+            months = int(column.get("Months") or 3)
+        except (TypeError, ValueError):
+            logging.info(f"Skipping column with months {column.get('Months')}")
+            continue
+        columns.append({
+            "period": str(column.get("Period") or "Unknown"),
+            "months": months,
+            "role": str(column.get("Role") or "current").lower(),
+            "data": {standardize_metric(k): v for k, v in column.items() if k not in ("Period", "Months", "Role")},
+        })
+    return columns
 
-                        response = client.models.generate_content(
-                            model="gemini-2.0-flash",
-                            contents=[uploaded_file, prompt]
-                        )
+#The latest current 3-month column is the period the report is filed for
+def primary_column(columns):
+    import pandas as pd
+    candidates = [column for column in columns if column["role"] == "current" and column["months"] == 3] or columns
+    dated = [(pd.to_datetime(column["period"], format="%m/%Y", errors="coerce"), column) for column in candidates]
+    dated = [(date, column) for date, column in dated if not pd.isna(date)]
+    if dated:
+        return max(dated, key=lambda item: item[0])[1]
+    return candidates[0] if candidates else None
 
-                        raw_text = response.text.strip()
+#Schema and consistency problems of a parsed report, which send the extraction to the strong model
+def statement_problem(parsed):
+    import pandas as pd
+    if period_key(parsed["period"]) is None:
+        return f"no valid period ({parsed['period']})"
+    for column in parsed["columns"]:
+        raw = {metric: column["data"].get(metric) for metric in target_metrics}
+        present = {metric: value for metric, value in raw.items() if value is not None}
+        if not present:
+            return f"no metrics in column {column['period']}"
+        numbers = dict(zip(present, parse_values(pd.Series(list(present.values()), dtype=object)).tolist()))
+        invalid = [metric for metric, number in numbers.items() if number != number]
+        if invalid:
+            return f"non-numeric {invalid} in column {column['period']}"
+        if all(metric in numbers for metric in ("Revenue", "COGS", "Gross Profit")):
+            expected = numbers["Revenue"] - abs(numbers["COGS"])
+            if abs(numbers["Gross Profit"] - expected) > EXTRACTION_TOLERANCE * max(abs(numbers["Revenue"]), 1):
+                return f"Gross Profit {numbers['Gross Profit']:.0f} does not match Revenue - COGS {expected:.0f} in column {column['period']}"
+    return None
 
-                        #Clean code block formatting if any
-                        if raw_text.startswith("```json"):
-                            raw_text = raw_text[7:]
-                        if raw_text.endswith("```"):
-                            raw_text = raw_text[:-3]
+#Upload one report PDF and parse the extraction JSON returned by Gemini; the fast model's output is
+#checked and the strong model retries reports it got wrong
+def parse_report(client, file_path, mode=EXTRACTION_MODE):
+    with open(file_path, "rb") as f:
+        uploaded_file = client.files.upload(
+            file=io.BytesIO(f.read()),
+            config=dict(mime_type='application/pdf')
+        )
 
-                        json_match = re.search(r'\{.*\}', raw_text, re.DOTALL)
-                        if not json_match:
-                            raise ValueError("No valid JSON object found in Gemini output.")
+    def call(tier):
+        from google.genai import types
+        settings = MODEL_TASKS["extraction"]
+        return client.models.generate_content(
+            model=MODEL_TIERS[tier],
+            contents=[uploaded_file, MULTI_PERIOD_PROMPT if mode == "multi" else EXTRACTION_PROMPT],
+            config=types.GenerateContentConfig(
+                temperature=0,
+                max_output_tokens=settings["max_tokens"],
+                http_options=types.HttpOptions(timeout=int(settings["timeout"] * 1000)),
+            ),
+        )
 
-                        data = json.loads(json_match.group(0))
-                        period = data.get("Period", "Unknown")
-                        metrics = {standardize_metric(k): v for k, v in data.items() if k != "Period"}
+    return run_task("extraction", call, parse=lambda response: parse_extraction(response, mode), check=statement_problem)
 
-                        logging.info(f"Extracted data for Period {period}: {metrics}")
-                        file_data.append({
-                            "filename": filename,
-                            "period": period,
-                            "data": metrics
-                        })
+def parse_extraction(response, mode=EXTRACTION_MODE):
+    raw_text = response.text.strip()
 
-                    except Exception as e:
-                        logging.error(f"Skipping {filename} due to error: {e}")
-                        continue
+    #Clean code block formatting if any
+    if raw_text.startswith("```json"):
+        raw_text = raw_text[7:]
+    if raw_text.endswith("```"):
+        raw_text = raw_text[:-3]
+
+    json_match = re.search(r'\{.*\}', raw_text, re.DOTALL)
+    if not json_match:
+        raise ValueError("No valid JSON object found in Gemini output.")
+
+    columns = parse_columns(json.loads(json_match.group(0)))
+    primary = primary_column(columns)
+    if mode != "multi":
+        columns = [primary] if primary else []
+    return {
+        "period": primary["period"] if primary else "Unknown",
+        "data": primary["data"] if primary else {},
+        "columns": columns,
+    }
+
+#Wide csv layout from the resolved quarters: one row per metric, one column per period
+def build_company_frame(quarters):
+    import pandas as pd
+    by_period = {}
+    for quarter in quarters:
+        by_period.setdefault(quarter["period"], {})[quarter["metric"]] = quarter["value"]
+    return pd.DataFrame({
+        "Data Point Name": target_metrics,
+        **{period: [values.get(metric) for metric in target_metrics] for period, values in by_period.items()},
+    })
+
+#Processed csv and fact ledger of one company from its parsed reports
+def write_company_csv(output_csv, file_data, ledger_csv=None):
+    unknown = [entry["filename"] for entry in file_data if entry["period"] == "Unknown"]
+    if unknown:
+        logging.info(f"Files returned 'Unknown' period: {unknown}")
+
+    ledger = build_ledger(file_data)
+    quarters = quarterly_values(ledger)
+    with atomic_write(output_csv, newline="") as f:
+        build_company_frame(quarters).to_csv(f, index=False, float_format="%.15g")
+    logging.info(f"Saved to {output_csv}")
+
+    if ledger_csv:
+        with atomic_write(ledger_csv, newline="") as f:
+            ledger_frame(ledger, quarters).to_csv(f, index=False, float_format="%.15g")
+    return quarters
+
+#Gemini calls and csv writes block, so dataset creation runs in a worker thread
+async def create_dataset():
+    return await asyncio.to_thread(build_datasets)
 
-            #Analyze periods
-            period_counts = Counter(entry["period"] for entry in file_data)
-            for period, count in period_counts.items():
-                if count > 1:
-                    logging.info(f"Duplicate period '{period}' detected in {count} files.")
-                if period == "Unknown":
-                    logging.info("Some files returned 'Unknown' period.")
+def build_datasets():
+    try:
+        #Output directory
+        os.makedirs(PROCESSED_CSV_DATA_PATH, exist_ok=True)
+
+        #Loop through both companies
+        client = get_genai_client()
+        for company, config in COMPANY_CONFIGS.items():
+            input_dir = config["input_dir"]
+            output_csv = config["output_csv"]
+
+            logging.info(f"\nProcessing {company} reports in {input_dir}")
+            file_data = []
+            times = download_times(company)
 
-            #Get unique sorted periods
-            all_periods = sorted({entry['period'] for entry in file_data if entry['period'] != "Unknown"}, key=extract_date)
+            for filename in os.listdir(input_dir):
+                if filename.lower().endswith(".pdf"):
+                    logging.info(f"Processing {filename}...")
+                    file_path = os.path.join(input_dir, filename)
 
-            #Build final DataFrame
-            final_df = pd.DataFrame({"Data Point Name": target_metrics})
-            for period in all_periods:
-                #Get first matching file entry for this period
-                matching_entry = next((entry for entry in file_data if entry["period"] == period), None)
-                period_values = [matching_entry["data"].get(metric, "") if matching_entry else "" for metric in target_metrics]
-                final_df[period] = period_values
+                    try:
+                        parsed = parse_report(client, file_path)
+                        logging.info(f"Extracted {len(parsed['columns'])} columns, latest period {parsed['period']}: {parsed['data']}")
+                        file_data.append({"filename": filename, "downloaded_at": times.get(filename), **parsed})
+
+                    except Exception as e:
+                        logging.error(f"Skipping {filename} due to error: {e}")
+                        continue
 
-            final_df.to_csv(output_csv, index=False)
-            logging.info(f"Saved to {output_csv}")
+            write_company_csv(output_csv, sorted(file_data, key=lambda entry: entry["filename"]), config.get("ledger_csv"))
 
+        #Workers serve the new data once every company is written
+        logging.info(materialize_analytics())
         return f"Succesful"
 
     except Exception as e:
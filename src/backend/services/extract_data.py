@@ -1,12 +1,39 @@
 import os
 import re
 import shutil
-import fitz
+import asyncio
 import logging
 from src.backend.core.config import COMPANY_CONFIGS
+from src.backend.services.file_io import atomic_path
 
-#Extracts specific pages from PDFs
+#Extracts specific pages from PDFs; PyMuPDF blocks, so it runs in a worker thread
 async def data_extractor():
+    return await asyncio.to_thread(extract_pages)
+
+#Save the first page matching the statement heading; copy the whole report when no page matches
+def extract_report(input_path, output_path, keyword_regex):
+    import fitz
+    doc = fitz.open(input_path)
+    try:
+        for i in range(len(doc)):
+            page = doc.load_page(i)
+            text = page.get_text()
+            if re.search(keyword_regex, text, re.IGNORECASE):
+                #Save matched page to new PDF
+                new_doc = fitz.open()
+                new_doc.insert_pdf(doc, from_page=i, to_page=i)
+                with atomic_path(output_path) as temp_path:
+                    new_doc.save(temp_path)
+                new_doc.close()
+                return True
+    finally:
+        doc.close()
+
+    with atomic_path(output_path) as temp_path:
+        shutil.copy(input_path, temp_path)
+    return False
+
+def extract_pages():
     try:
         all_success = []
         all_failed = []
@@ -28,25 +55,7 @@ async def data_extractor():
                         input_path = os.path.join(input_dir, filename)
                         output_path = os.path.join(output_dir, filename)
 
-                        #open pdf
-                        doc = fitz.open(input_path)
-                        found = False
-                        for i in range(len(doc)):
-                            page = doc.load_page(i)
-                            text = page.get_text()
-                            if re.search(keyword_regex, text, re.IGNORECASE):
-                                #Save matched page to new PDF
-                                new_doc = fitz.open()
-                                new_doc.insert_pdf(doc, from_page=i, to_page=i)
-                                new_doc.save(output_path)
-                                new_doc.close()
-                                found = True
-                                break
-                        doc.close()
-
-                        #If not found, copy entire file to output
-                        if not found:
-                            shutil.copy(input_path, output_path)
+                        found = extract_report(input_path, output_path, keyword_regex)
 
                         #Log result
                         (success_pdfs if found else failed_pdfs).append(filename)
@@ -0,0 +1,118 @@
+import re
+import logging
+from src.backend.services.fact_store import parse_values
+
+#Months covered by a statement column: the quarter itself or a cumulative year-to-date figure
+PERIOD_MONTHS = (3, 6, 9, 12)
+
+#Columns of the fact ledger; status is "chosen", "superseded" or "derived"
+LEDGER_COLUMNS = ["metric", "period", "months", "role", "value", "filing", "filing_period", "status"]
+
+#MM/YYYY as a month count, so period arithmetic is integer arithmetic; None when unparseable
+def period_key(period):
+    match = re.fullmatch(r"(\d{2})/(\d{4})", str(period).strip())
+    if not match or not 1 <= int(match.group(1)) <= 12:
+        return None
+    return int(match.group(2)) * 12 + int(match.group(1)) - 1
+
+def period_label(key):
+    return f"{key % 12 + 1:02d}/{key // 12}"
+
+def _months(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+#One row per (filing, statement column, metric); reports parsed before multi-period extraction count as one current quarter
+def build_ledger(file_data):
+    import pandas as pd
+    rows = []
+    for entry in file_data:
+        columns = entry.get("columns") or [{"period": entry["period"], "months": 3, "role": "current", "data": entry["data"]}]
+        for column in columns:
+            for metric, value in column["data"].items():
+                rows.append({
+                    "metric": metric,
+                    "period": column["period"],
+                    "months": _months(column["months"]),
+                    "role": column["role"],
+                    "value": value,
+                    "filing": entry["filename"],
+                    "filing_period": entry["period"],
+                    "downloaded_at": entry.get("downloaded_at") or 0,
+                })
+
+    values = parse_values(pd.Series([row["value"] for row in rows], dtype=object)).tolist() if rows else []
+    ledger = []
+    for row, value in zip(rows, values):
+        key = period_key(row["period"])
+        if key is None or row["months"] not in PERIOD_MONTHS or value != value:
+            continue
+        filing_key = period_key(row["filing_period"])
+        ledger.append(dict(row, value=value, key=key, filing_key=-1 if filing_key is None else filing_key))
+    if len(ledger) < len(rows):
+        logging.info(f"Ledger dropped {len(rows) - len(ledger)} values without a period, months or number")
+    return resolve_ledger(ledger)
+
+#Deterministic conflict resolution per (metric, period, months): primary columns beat comparatives,
+#later filings beat earlier ones, and of two filings for the same period the one published later, i.e. first
+#downloaded later, wins. Filenames are content hashes, so they only order reports without a download time
+def resolve_ledger(ledger):
+    chosen, conflicts = {}, set()
+    order = lambda row: (row["role"] != "current", -row["filing_key"], -row["downloaded_at"], row["filing"])
+    for row in sorted(ledger, key=order):
+        slot = (row["metric"], row["key"], row["months"])
+        if slot in chosen:
+            row["status"] = "superseded"
+            winner = chosen[slot]
+            if row["value"] != winner["value"]:
+                conflicts.add(slot)
+                if order(row)[:2] == order(winner)[:2]:
+                    logging.warning(
+                        f"Filings for {row['filing_period']} disagree on {row['metric']} {row['period']} ({row['months']} months): "
+                        f"{winner['filing']} reports {winner['value']}, {row['filing']} reports {row['value']}; keeping {winner['filing']}"
+                    )
+        else:
+            row["status"] = "chosen"
+            chosen[slot] = row
+    if conflicts:
+        logging.info(f"Ledger resolved {len(conflicts)} conflicting values across filings")
+    return ledger
+
+#Quarterly values in period order: reported 3-month figures, then quarters derived from year-to-date figures
+def quarterly_values(ledger):
+    chosen = {(row["metric"], row["key"], row["months"]): row for row in ledger if row["status"] == "chosen"}
+    quarters = {
+        (metric, key): {"metric": metric, "period": row["period"], "value": row["value"], "filing": row["filing"], "source": "reported"}
+        for (metric, key, months), row in chosen.items() if months == 3
+    }
+
+    #YTD(n months to P) - YTD(n-3 months to P-3) is the quarter ending at P; a 3-month figure counts as YTD(3).
+    #A reported quarter always wins, and shorter year-to-date spans win over longer ones
+    derived = 0
+    for (metric, key, months), row in sorted(chosen.items(), key=lambda item: item[0][2]):
+        previous = chosen.get((metric, key - 3, months - 3))
+        if months == 3 or previous is None or (metric, key) in quarters:
+            continue
+        quarters[(metric, key)] = {
+            "metric": metric,
+            "period": period_label(key),
+            "value": row["value"] - previous["value"],
+            "filing": f"{row['filing']} - {previous['filing']}",
+            "source": "derived",
+        }
+        derived += 1
+    if derived:
+        logging.info(f"Derived {derived} quarterly values from year-to-date figures")
+    return [quarters[slot] for slot in sorted(quarters, key=lambda slot: (slot[1], slot[0]))]
+
+#Ledger with the derived quarters appended, as written next to the processed csv
+def ledger_frame(ledger, quarters):
+    import pandas as pd
+    rows = ledger + [
+        dict(quarter, months=3, role="derived", filing_period="", status="derived", key=period_key(quarter["period"]))
+        for quarter in quarters if quarter["source"] == "derived"
+    ]
+    rows.sort(key=lambda row: (row["key"], row["metric"], row["months"], row["status"]))
+    return pd.DataFrame(rows, columns=LEDGER_COLUMNS)
@@ -0,0 +1,122 @@
+import os
+import json
+import logging
+import threading
+from src.backend.core.config import FILES_METADATA, PROCESSED_CSV_DATA_PATH
+from src.backend.services.snapshot import current_version, get_snapshot
+
+#Month abbreviations used in period headers
+MONTH_MAP = {
+    "Jan": "01", "Feb": "02", "Mar": "03", "Apr": "04",
+    "May": "05", "Jun": "06", "Jul": "07", "Aug": "08",
+    "Sep": "09", "Oct": "10", "Nov": "11", "Dec": "12"
+}
+
+#Columns of the long-format fact table
+FACT_COLUMNS = ["symbol", "company", "metric", "period", "date", "year", "quarter", "value", "source_file"]
+
+#Normalize a period header ("Mar2022", "03/2022", "032022") to MM/YYYY
+def normalize_period(column):
+    clean_col = ''.join(filter(str.isalnum, str(column)))
+    month_abbr = clean_col[:3].title()
+    year = clean_col[-4:]
+
+    if month_abbr in MONTH_MAP:
+        return f"{MONTH_MAP[month_abbr]}/{year}"
+    if len(clean_col) == 6 and clean_col.isdigit():
+        return f"{clean_col[:2]}/{clean_col[-4:]}"
+    return str(column)
+
+#Calendar quarter of a MM/YYYY period (Q1 ends in March)
+def period_quarter(period):
+    return (int(period[:2]) - 1) // 3 + 1
+
+#Values may be stored as text like "1,000" or "(300)"
+def parse_values(values):
+    import pandas as pd
+    values = values.astype(str).str.replace(",", "", regex=False).str.strip()
+    values = values.str.replace(r"^\((.*)\)$", r"-\1", regex=True)
+    return pd.to_numeric(values, errors="coerce")
+
+#Convert a wide processed csv (one row per metric) into long-format facts
+def facts_from_frame(df, metadata, source_file=""):
+    import pandas as pd
+    try:
+        value_columns = [col for col in df.columns if col != "Data Point Name"]
+        if not value_columns:
+            return pd.DataFrame(columns=FACT_COLUMNS)
+
+        facts = df.melt(id_vars=["Data Point Name"], value_vars=value_columns, var_name="period", value_name="value")
+        facts = facts.rename(columns={"Data Point Name": "metric"})
+        facts["period"] = facts["period"].map(normalize_period)
+        facts["date"] = pd.to_datetime(facts["period"], format="%m/%Y", errors="coerce")
+        facts = facts.dropna(subset=["date"])
+
+        facts["value"] = parse_values(facts["value"])
+
+        facts["year"] = facts["date"].dt.year.astype(int)
+        facts["quarter"] = facts["date"].dt.quarter.astype(int)
+        facts["symbol"] = metadata["symbol"]
+        facts["company"] = metadata["company"]
+        facts["source_file"] = source_file
+        return facts[FACT_COLUMNS].reset_index(drop=True)
+
+    except Exception as e:
+        logging.error(f"Error in converting frame to facts: {e}")
+        raise ValueError(f"Error in facts_from_frame: {e}")
+
+#Load every processed csv as one typed long-format fact table
+def load_fact_frame():
+    import pandas as pd
+    frames = []
+    for filename, metadata in FILES_METADATA.items():
+        file_path = os.path.join(PROCESSED_CSV_DATA_PATH, filename)
+        #Skip missing files
+        if not os.path.exists(file_path):
+            logging.info(f"Warning: File {file_path} not found. Skipping.")
+            continue
+
+        try:
+            df = pd.read_csv(file_path)
+            frames.append(facts_from_frame(df, metadata, filename))
+        except Exception as e:
+            logging.info(f"Error loading {filename}: {e}")
+            continue
+
+    if not frames:
+        return pd.DataFrame(columns=FACT_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+#Published snapshot version, or the size and modification time of every processed csv before the first snapshot;
+#changes whenever the served dataset changes
+def data_signature():
+    version = current_version()
+    if version:
+        return (("snapshot", version),)
+    signature = []
+    for filename in FILES_METADATA:
+        file_path = os.path.join(PROCESSED_CSV_DATA_PATH, filename)
+        if os.path.exists(file_path):
+            stat = os.stat(file_path)
+            signature.append((filename, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+#Fact table parsed once per dataset version; served from the memory-mapped snapshot once one is published
+_facts_lock = threading.Lock()
+_facts_cache = {"signature": None, "facts": None}
+
+def get_fact_frame():
+    return fact_source()[0]
+
+#Fact table and the version it belongs to, taken in one read so an ETag always matches the rows served with it
+def fact_source():
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot["facts"], snapshot["version"]
+    signature = data_signature()
+    with _facts_lock:
+        if _facts_cache["signature"] != signature:
+            _facts_cache["facts"] = load_fact_frame()
+            _facts_cache["signature"] = signature
+            logging.info(f"Loaded fact table with {len(_facts_cache['facts'])} facts")
+        return _facts_cache["facts"], json.dumps(_facts_cache["signature"])
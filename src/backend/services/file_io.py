@@ -0,0 +1,79 @@
+import os
+import uuid
+from contextlib import contextmanager
+from src.backend.core.config import LOCK_DIR
+
+#Temporary path next to the target, moved into place only when the block succeeds
+@contextmanager
+def atomic_path(path: str):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    temp_path = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+#Readers in other workers see the old file or the new one, never a partial write;
+#durable=False skips the fsync for files that are cheap to lose on a crash
+@contextmanager
+def atomic_write(path: str, mode: str = "w", durable: bool = True, **kwargs):
+    with atomic_path(path) as temp_path:
+        with open(temp_path, mode, **kwargs) as f:
+            yield f
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+
+#Cross-process lock on a file under LOCK_DIR, shared by all uvicorn workers
+class FileLock:
+    def __init__(self, name: str):
+        self.path = os.path.join(LOCK_DIR, f"{name}.lock")
+        self._file = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        os.makedirs(LOCK_DIR, exist_ok=True)
+        lock_file = open(self.path, "a+b")
+        try:
+            if os.name == "nt":
+                import msvcrt
+                import time
+                lock_file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        if not blocking:
+                            raise
+                        time.sleep(0.1)
+            else:
+                import fcntl
+                fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        if os.name == "nt":
+            import msvcrt
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -0,0 +1,157 @@
+import re
+import math
+import logging
+import threading
+from collections import Counter, defaultdict
+from src.backend.core.config import RAG_INDEX_MODE
+from src.backend.core.config import HYBRID_VECTOR_WEIGHT, HYBRID_CANDIDATES, HYBRID_RERANK
+from src.backend.services.query_filters import parse_query_filters
+from src.backend.services.fact_store import data_signature
+from src.backend.services.tracing import span
+
+#Tokens keep periods such as 06/2024 and symbols such as REXP intact
+TOKEN_PATTERN = re.compile(r"\d{1,2}/\d{4}|[a-z0-9]+")
+STOPWORDS = {"the", "of", "for", "in", "and", "a", "an", "what", "was", "is", "about", "to", "me", "show",
+             "give", "how", "much", "did", "does", "company", "financial", "information", "plc", "over"}
+
+def tokenize(text: str) -> list:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+#Evaluate a Pinecone-style {"field": {"$eq"/"$in": ...}} filter against document metadata
+def matches_filter(metadata: dict, metadata_filter: dict = None) -> bool:
+    for field, condition in (metadata_filter or {}).items():
+        value = metadata.get(field)
+        if "$eq" in condition and value != condition["$eq"]:
+            return False
+        if "$in" in condition and value not in condition["$in"]:
+            return False
+    return True
+
+#Okapi BM25 over an in-memory inverted index
+class BM25Index:
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)
+        self.doc_lengths = []
+
+        for doc_id, doc in enumerate(documents):
+            term_counts = Counter(tokenize(doc.page_content))
+            self.doc_lengths.append(sum(term_counts.values()))
+            for term, count in term_counts.items():
+                self.postings[term].append((doc_id, count))
+
+        total_docs = len(documents)
+        self.avg_length = (sum(self.doc_lengths) / total_docs) if total_docs else 0.0
+        self.idf = {
+            term: math.log(1 + (total_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for term, posting in self.postings.items()
+        }
+
+    def search(self, query: str, k: int = 10, metadata_filter: dict = None):
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, count in self.postings[term]:
+                length_norm = 1 - self.b + self.b * self.doc_lengths[doc_id] / (self.avg_length or 1)
+                scores[doc_id] += idf * count * (self.k1 + 1) / (count + self.k1 * length_norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        results = []
+        for doc_id, score in ranked:
+            doc = self.documents[doc_id]
+            if matches_filter(doc.metadata, metadata_filter):
+                results.append((doc, score))
+            if len(results) == k:
+                break
+        return results
+
+#Cached index, rebuilt when the processed csv files change
+_bm25_lock = threading.Lock()
+_bm25_cache = {"signature": None, "index": None}
+
+def get_bm25_index() -> BM25Index:
+    from src.backend.services.rag_vector_save import build_documents
+
+    signature = data_signature() + (RAG_INDEX_MODE,)
+    with _bm25_lock:
+        if _bm25_cache["signature"] != signature:
+            documents = build_documents(RAG_INDEX_MODE)
+            _bm25_cache["index"] = BM25Index(documents)
+            _bm25_cache["signature"] = signature
+            logging.info(f"Built BM25 index over {len(documents)} documents")
+        return _bm25_cache["index"]
+
+#Scale scores to 0..1 so vector and BM25 scores can be combined
+def _normalize(scored):
+    if not scored:
+        return {}
+    values = [score for _, score in scored]
+    low, high = min(values), max(values)
+    spread = (high - low) or 1.0
+    return {doc.page_content: (score - low) / spread if high > low else 1.0 for doc, score in scored}
+
+#Lightweight local reranker: rewards exact matches of the parsed company, metric and period
+def rerank(query: str, scored_docs, filters: dict = None):
+    filters = filters if filters is not None else parse_query_filters(query)
+    query_tokens = set(tokenize(query))
+    reranked = []
+    for doc, score in scored_docs:
+        metadata = doc.metadata
+        content = doc.page_content.lower()
+        bonus = 0.0
+        if filters["symbols"]:
+            bonus += 0.3 if metadata.get("symbol") in filters["symbols"] else -0.3
+        if filters["metrics"]:
+            doc_metric = metadata.get("metric") or metadata.get("data_point_name")
+            bonus += 0.3 if doc_metric in filters["metrics"] else -0.2
+        if filters["years"]:
+            if "year" in metadata and metadata.get("doc_type") == "fact":
+                bonus += 0.2 if metadata["year"] in filters["years"] else -0.2
+            elif any(str(year) in content for year in filters["years"]):
+                bonus += 0.1
+        if filters["quarters"] and metadata.get("quarter") is not None:
+            bonus += 0.2 if metadata["quarter"] in filters["quarters"] else -0.1
+
+        #Share of query terms present in the document
+        doc_tokens = set(tokenize(doc.page_content))
+        overlap = len(query_tokens & doc_tokens) / len(query_tokens) if query_tokens else 0.0
+        reranked.append((doc, score + bonus + 0.2 * overlap))
+
+    return sorted(reranked, key=lambda item: item[1], reverse=True)
+
+#Hybrid retrieval: vector and BM25 candidates fused by normalized score, optionally reranked
+def hybrid_search(vector_store, bm25_index, query: str, search_query: str = None, k: int = 5,
+                  metadata_filter: dict = None, vector_weight: float = HYBRID_VECTOR_WEIGHT,
+                  use_rerank: bool = HYBRID_RERANK):
+    candidates = max(k, HYBRID_CANDIDATES)
+    filters = parse_query_filters(query)
+
+    #Canonical metric names and symbols help BM25 match "cost of sales" to "COGS"
+    lexical_query = " ".join([query] + filters["metrics"] + filters["symbols"])
+    with span("bm25_search", "retrieval", candidates=candidates) as bm25_span:
+        lexical = bm25_index.search(lexical_query, k=candidates, metadata_filter=metadata_filter) if bm25_index else []
+        bm25_span["attributes"]["results"] = len(lexical)
+
+    vector = []
+    if vector_store is not None and vector_weight > 0:
+        kwargs = {"filter": metadata_filter} if metadata_filter else {}
+        with span("vector_search", "vector_search", candidates=candidates) as vector_span:
+            vector = vector_store.similarity_search_with_score(search_query or query, k=candidates, **kwargs)
+            vector_span["attributes"]["results"] = len(vector)
+
+    vector_scores = _normalize(vector)
+    lexical_scores = _normalize(lexical)
+    documents = {doc.page_content: doc for doc, _ in lexical + vector}
+    fused = [
+        (doc, vector_weight * vector_scores.get(key, 0.0) + (1 - vector_weight) * lexical_scores.get(key, 0.0))
+        for key, doc in documents.items()
+    ]
+    fused.sort(key=lambda item: item[1], reverse=True)
+
+    if use_rerank:
+        fused = rerank(query, fused, filters)
+    return [doc for doc, _ in fused[:k]]
@@ -0,0 +1,302 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+from src.backend.core.config import COMPANY_CONFIGS, FILES_METADATA, CHECKPOINT_DIR, INGEST_WORKERS, INGEST_QUEUE_SIZE, RAG_INDEX_MODE
+from src.backend.services.file_io import atomic_write
+from src.backend.services.report_store import record_period, download_times
+from src.backend.services.extract_data import extract_report
+from src.backend.services.dataset_creation import parse_report, write_company_csv, build_company_frame
+from src.backend.services.fact_ledger import build_ledger, quarterly_values, period_key, period_label
+from src.backend.services.fact_store import facts_from_frame
+from src.backend.services.rag_vector_save import build_fact_documents, rag_pipeline
+from src.backend.services.vector_db import ensure_index, upsert_embedded, delete_stale_facts
+from src.backend.services.analytics import materialize_analytics
+from src.backend.services.llm_model import get_genai_client, get_embeddings
+from src.backend.services.tracing import start_trace, span
+
+#Stages every report passes through, checkpointed after each one; row mode re-ingests the csv rows at the end instead
+STAGES = ["extract", "parse", "facts", "embed", "upsert"] if RAG_INDEX_MODE == "fact" else ["extract", "parse", "facts"]
+
+#Per-report checkpoint: the source hash and the result of every completed stage
+def checkpoint_path(symbol, filename):
+    return os.path.join(CHECKPOINT_DIR, symbol, f"{filename}.json")
+
+def load_checkpoint(symbol, filename, source_sha256):
+    path = checkpoint_path(symbol, filename)
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                checkpoint = json.load(f)
+            #A changed report starts over
+            if checkpoint.get("source_sha256") == source_sha256:
+                return checkpoint
+        except (OSError, ValueError) as e:
+            logging.info(f"Ignoring unreadable checkpoint {path}: {e}")
+    return {"symbol": symbol, "filename": filename, "source_sha256": source_sha256, "stages": {}}
+
+#No fsync: a checkpoint lost in a crash only repeats one stage, and unreadable ones are ignored
+def save_checkpoint(checkpoint):
+    with atomic_write(checkpoint_path(checkpoint["symbol"], checkpoint["filename"]), durable=False) as f:
+        json.dump(checkpoint, f)
+
+def source_path(item):
+    return os.path.join(COMPANY_CONFIGS[item["symbol"]]["input_dir"], item["filename"])
+
+#Parsed reports of one company, in filename order
+def company_reports(run, symbol):
+    times = download_times(symbol)
+    return [
+        {"filename": checkpoint["filename"], "downloaded_at": times.get(checkpoint["filename"]), **checkpoint["stages"]["parse"]}
+        for (item_symbol, _), checkpoint in sorted(run.checkpoints.items())
+        if item_symbol == symbol and "parse" in checkpoint["stages"]
+    ]
+
+#Quarters a report contributes to: its 3-month columns and the quarters derived from its year-to-date columns
+def touched_periods(parsed):
+    periods = set()
+    for column in parsed.get("columns") or [{"period": parsed["period"], "months": 3}]:
+        key = period_key(column["period"])
+        if key is None:
+            continue
+        periods.add(period_label(key))
+        if column["months"] < 12:
+            periods.add(period_label(key + 3))
+    return periods
+
+#Fact documents for the resolved quarters a report touches, with the same ids a full re-ingest uses
+def item_documents(run, item):
+    quarters = quarterly_values(build_ledger(company_reports(run, item["symbol"])))
+    touched = touched_periods(item["stages"]["parse"])
+    return quarter_documents(item["symbol"], [quarter for quarter in quarters if quarter["period"] in touched])
+
+def quarter_documents(symbol, quarters):
+    csv_name = os.path.basename(COMPANY_CONFIGS[symbol]["output_csv"])
+    derived = {(symbol, quarter["metric"], quarter["period"]) for quarter in quarters if quarter["source"] == "derived"}
+    return build_fact_documents(facts_from_frame(build_company_frame(quarters), FILES_METADATA[csv_name], csv_name), derived)
+
+#Stage functions run in worker threads and return the result stored in the checkpoint
+def extract_stage(run, item):
+    config = COMPANY_CONFIGS[item["symbol"]]
+    os.makedirs(config["output_dir"], exist_ok=True)
+    found = extract_report(source_path(item), os.path.join(config["output_dir"], item["filename"]), config["keyword_regex"])
+    return {"found": found}
+
+#The parsed period also identifies the filing in the report catalogue
+def parse_stage(run, item):
+    parsed = parse_report(get_genai_client(), source_path(item))
+    record_period(item["symbol"], item["filename"], parsed.get("period"))
+    return parsed
+
+#Rewrites the company csv and ledger from every parsed report, so the dataset grows one report at a time
+def facts_stage(run, item):
+    config = COMPANY_CONFIGS[item["symbol"]]
+    quarters = write_company_csv(config["output_csv"], company_reports(run, item["symbol"]), config.get("ledger_csv"))
+    return {"periods": len({quarter["period"] for quarter in quarters})}
+
+#Resolved values can change as other reports arrive; the last report touching a quarter embeds its final value
+def embed_stage(run, item):
+    documents = item_documents(run, item)
+    vectors = get_embeddings().embed_documents([doc.page_content for doc in documents]) if documents else []
+    return {
+        "ids": [doc.id for doc in documents],
+        "documents": [{"text": doc.page_content, "metadata": doc.metadata} for doc in documents],
+        "vectors": vectors,
+    }
+
+def upsert_stage(run, item):
+    from langchain_core.documents import Document
+    embedded = item["stages"]["embed"]
+    documents = [
+        Document(id=doc_id, page_content=doc["text"], metadata=doc["metadata"])
+        for doc_id, doc in zip(embedded["ids"], embedded["documents"])
+    ]
+    count = upsert_embedded(documents, embedded["vectors"]) if documents else 0
+    run.upserted.update({doc.id: doc.page_content for doc in documents})
+    #Documents and vectors are only needed until they are stored
+    embedded.pop("documents", None)
+    embedded.pop("vectors", None)
+    return {"count": count}
+
+#Reports embedded concurrently can upsert a quarter before a later report changed its resolved value;
+#re-embed whatever this run stored that no longer matches the final ledger, and delete the vectors of
+#quarters the final ledger no longer has
+def reconcile_vectors(run):
+    stale, current = [], set()
+    for symbol in sorted({symbol for symbol, _ in run.checkpoints}):
+        documents = quarter_documents(symbol, quarterly_values(build_ledger(company_reports(run, symbol))))
+        current.update(doc.id for doc in documents)
+        stale += [doc for doc in documents if doc.id in run.upserted and run.upserted[doc.id] != doc.page_content]
+    if stale:
+        logging.info(f"Re-embedding {len(stale)} facts whose resolved value changed during the run")
+        upsert_embedded(stale, get_embeddings().embed_documents([doc.page_content for doc in stale]))
+    delete_stale_facts(sorted({symbol for symbol, _ in run.checkpoints}), current)
+    return len(stale)
+
+STAGE_FUNCTIONS = {"extract": extract_stage, "parse": parse_stage, "facts": facts_stage, "embed": embed_stage, "upsert": upsert_stage}
+
+#Progress of one pipeline run, observed by the visualize route and the status endpoint
+class IngestRun:
+    def __init__(self):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.state = "running"
+        self.started_at = time.time()
+        self.finished_at = None
+        self.error = None
+        self.checkpoints = {}
+        self.resumed = 0
+        self.skipped = 0
+        self.counts = {stage: {"done": 0, "failed": 0} for stage in STAGES}
+        self.errors = {}
+        self.upserted = {}
+        self.dataset_ready = asyncio.Event()
+        self.task = None
+
+    def record(self, stage, item, error=None):
+        self.counts[stage]["failed" if error else "done"] += 1
+        if error:
+            self.errors[f"{item['symbol']}/{item['filename']}"] = {"stage": stage, "message": str(error)}
+
+    #Returns once the csvs and analytics hold every parsed report; embedding may still be running
+    async def wait_for_dataset(self):
+        await self.dataset_ready.wait()
+        if self.state in ("failed", "cancelled"):
+            raise RuntimeError(f"Ingest run {self.run_id} {self.state}: {self.error}")
+
+    def summary(self):
+        return {
+            "run_id": self.run_id,
+            "state": self.state,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "reports": len(self.checkpoints),
+            "resumed": self.resumed,
+            "skipped": self.skipped,
+            "stages": self.counts,
+            "errors": self.errors,
+            "error": self.error,
+        }
+
+#Hash every report and load its checkpoint
+def plan_items(run):
+    items = []
+    for symbol, config in COMPANY_CONFIGS.items():
+        input_dir = config["input_dir"]
+        if not os.path.isdir(input_dir):
+            logging.info(f"Warning: Directory {input_dir} not found. Skipping.")
+            continue
+        for filename in sorted(os.listdir(input_dir)):
+            if filename.lower().endswith(".pdf"):
+                with open(os.path.join(input_dir, filename), "rb") as f:
+                    digest = hashlib.sha256(f.read()).hexdigest()
+                checkpoint = load_checkpoint(symbol, filename, digest)
+                run.checkpoints[(symbol, filename)] = checkpoint
+                items.append(checkpoint)
+    return items
+
+#Takes reports from the inbox until a None sentinel; failed reports are logged and left for the next run
+async def stage_worker(run, stage, inbox, outbox):
+    while True:
+        item = await inbox.get()
+        if item is None:
+            return
+        try:
+            with span(stage, "ingest", symbol=item["symbol"], file=item["filename"]):
+                item["stages"][stage] = await asyncio.to_thread(STAGE_FUNCTIONS[stage], run, item)
+                await asyncio.to_thread(save_checkpoint, item)
+        except Exception as e:
+            logging.error(f"Error in ingest {stage} for {item['symbol']}/{item['filename']}: {e}")
+            item["stages"].pop(stage, None)
+            run.record(stage, item, e)
+            continue
+        run.record(stage, item)
+        if outbox is not None:
+            await outbox.put(item)
+
+async def finish_dataset(run):
+    try:
+        if run.counts["facts"]["done"]:
+            analytics_result = await asyncio.to_thread(materialize_analytics)
+            logging.info(f"analytics_result: {analytics_result}")
+    finally:
+        run.dataset_ready.set()
+
+#Reports stream through bounded queues; each stage has its own workers, so stages overlap
+async def run_ingest(run):
+    with start_trace("ingest_pipeline", run_id=run.run_id):
+        items = await asyncio.to_thread(plan_items, run)
+        stages = list(STAGES)
+        if "upsert" in stages:
+            try:
+                await asyncio.to_thread(ensure_index)
+            except Exception as e:
+                #Facts are still stored; the next run resumes these reports at the embed stage
+                logging.error(f"Error creating Pinecone index, embedding deferred to the next run: {e}")
+                stages = stages[:stages.index("embed")]
+        queues = {stage: asyncio.Queue(maxsize=INGEST_QUEUE_SIZE) for stage in stages}
+
+        #Checkpointed reports enter at their first unfinished stage
+        async def feed():
+            for item in items:
+                next_stage = next((stage for stage in stages if stage not in item["stages"]), None)
+                if next_stage is None:
+                    run.skipped += 1
+                    continue
+                if next_stage != stages[0]:
+                    run.resumed += 1
+                await queues[next_stage].put(item)
+            for _ in range(INGEST_WORKERS[stages[0]]):
+                await queues[stages[0]].put(None)
+
+        #A stage shuts down its successor once its own workers have drained
+        async def drive(position, stage):
+            following = stages[position + 1] if position + 1 < len(stages) else None
+            outbox = queues[following] if following else None
+            await asyncio.gather(*(stage_worker(run, stage, queues[stage], outbox) for _ in range(INGEST_WORKERS[stage])))
+            if stage == "facts":
+                await finish_dataset(run)
+            if outbox is not None:
+                for _ in range(INGEST_WORKERS[following]):
+                    await outbox.put(None)
+
+        logging.info(f"Ingest run {run.run_id}: {len(items)} reports through {stages}")
+        await asyncio.gather(feed(), *(drive(position, stage) for position, stage in enumerate(stages)))
+        if "upsert" in stages and (run.upserted or run.counts["facts"]["done"]):
+            with span("reconcile", "ingest"):
+                await asyncio.to_thread(reconcile_vectors, run)
+
+        if RAG_INDEX_MODE != "fact" and run.counts["facts"]["done"]:
+            result = await rag_pipeline()
+            logging.info(f"result: {result}")
+
+#Latest run, for the status endpoint and shutdown
+_runs = {"latest": None}
+
+def _finish_run(run, task, on_finish=None):
+    run.finished_at = time.time()
+    if task.cancelled():
+        run.state = "cancelled"
+    elif task.exception() is not None:
+        run.state = "failed"
+        run.error = str(task.exception())
+        logging.error(f"Error in ingest run {run.run_id}: {run.error}")
+    else:
+        run.state = "done"
+    run.dataset_ready.set()
+    logging.info(f"Ingest run {run.run_id} finished: {run.summary()}")
+    if on_finish:
+        on_finish()
+
+#Start a run as an observed task; on_finish runs however the task ends
+def start_ingest(on_finish=None):
+    run = IngestRun()
+    run.task = asyncio.create_task(run_ingest(run))
+    run.task.add_done_callback(lambda task: _finish_run(run, task, on_finish))
+    _runs["latest"] = run
+    return run
+
+def latest_run():
+    return _runs["latest"]
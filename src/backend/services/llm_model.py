@@ -1,7 +1,68 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from src.backend.core.config import GOOGLE_API_KEY
+from src.backend.core.config import GOOGLE_API_KEY, LLM_MODEL, LLM_STRONG_MODEL, EMBEDDING_MODEL, MODEL_TASKS
+from src.backend.services import container
+
+#system message to enhance the agent behavior
+SYSTEM_MESSAGE = """You are a professional financial analyst assistant with expertise in corporate finance, financial reporting, and investment analysis.
+
+Your primary goal is to provide accurate, detailed financial insights based on available company data.
+
+Important financial guidelines:
+- Financial quarters end in March (Q1), June (Q2), September (Q3), and December (Q4)
+- When calculating growth rates, use (New Value - Old Value) / Old Value * 100%
+- Distinguish between absolute values and percentages
+- Provide context when sharing financial metrics (industry averages, historical trends)
+- Be precise with financial terminology and transparent about data limitations
+
+When analyzing financial data:
+1. First retrieve the necessary raw financial information
+2. Perform any required calculations to derive meaningful insights
+3. Interpret the results in business context
+4. Present findings clearly with appropriate financial terminology
+5. Note any important caveats or limitations in the data
+
+Remember to approach all financial questions methodically and precisely.
+Provide answers ONLY for financial problems and greetings. For Other cases say you are not aware."""
+
+#Model tiers: every task starts on its configured tier and escalates to the strong one
+MODEL_TIERS = {"fast": LLM_MODEL, "strong": LLM_STRONG_MODEL}
+TIER_SERVICES = {"fast": "llm", "strong": "llm_strong"}
 
 #LLMs
-embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=GOOGLE_API_KEY)
-llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash")
\ No newline at end of file
+def build_chat_model(model):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    llm = ChatGoogleGenerativeAI(model=model, google_api_key=GOOGLE_API_KEY, temperature=0)
+    #Set the system message for the LLM
+    llm.client.system = SYSTEM_MESSAGE
+    return llm
+
+@container.register("llm")
+def build_llm():
+    return build_chat_model(LLM_MODEL)
+
+@container.register("llm_strong")
+def build_strong_llm():
+    return build_chat_model(LLM_STRONG_MODEL)
+
+@container.register("embeddings")
+def build_embeddings():
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    from src.backend.services.tracing import TracedEmbeddings
+    return TracedEmbeddings(GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=GOOGLE_API_KEY))
+
+#Gemini client for PDF extraction
+@container.register("genai_client")
+def build_genai_client():
+    from google import genai
+    return genai.Client(api_key=GOOGLE_API_KEY)
+
+#Chat model of a task on a tier (the task's own by default), bound to the task's timeout and output token limit
+def get_llm(task="agent", tier=None):
+    settings = MODEL_TASKS[task]
+    llm = container.get(TIER_SERVICES[tier or settings["tier"]])
+    return llm.bind(generation_config={"max_output_tokens": settings["max_tokens"]}, timeout=settings["timeout"])
+
+def get_embeddings():
+    return container.get("embeddings")
+
+def get_genai_client():
+    return container.get("genai_client")
@@ -0,0 +1,48 @@
+import logging
+from src.backend.core.config import MODEL_TASKS, MODEL_ESCALATION
+from src.backend.services.llm_model import MODEL_TIERS
+from src.backend.services.tracing import span
+
+#Tiers a task tries in order: its own, then the strong tier when escalation is on
+def task_tiers(task):
+    tier = MODEL_TASKS[task]["tier"]
+    return [tier] + (["strong"] if MODEL_ESCALATION and tier != "strong" else [])
+
+#Token usage of a LangChain message or a google.genai response
+def response_usage(response):
+    usage = getattr(response, "usage_metadata", None)
+    if isinstance(usage, dict):
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    if usage is not None:
+        return getattr(usage, "prompt_token_count", 0) or 0, getattr(usage, "candidates_token_count", 0) or 0
+    return 0, 0
+
+#Run a task on its tier, escalating when the call or parse raises or check reports a problem.
+#call(tier) returns the model response, parse turns it into the result and check(result) returns a problem or None.
+#The last tier's result is kept even if its check fails, as before tiering
+def run_task(task, call, parse=None, check=None):
+    tiers = task_tiers(task)
+    for position, tier in enumerate(tiers):
+        last = position == len(tiers) - 1
+        with span(f"{task}.{tier}", "model", task=task, tier=tier, model=MODEL_TIERS[tier], escalated=position > 0) as tier_span:
+            try:
+                response = call(tier)
+                tokens_in, tokens_out = response_usage(response)
+                tier_span["attributes"].update({"tokens_in": tokens_in, "tokens_out": tokens_out})
+                result = parse(response) if parse else response
+            except Exception as e:
+                if last:
+                    raise
+                result, problem = None, f"{type(e).__name__}: {e}"
+            else:
+                problem = check(result) if check else None
+            tier_span["attributes"]["accepted"] = problem is None
+            if problem:
+                tier_span["attributes"]["problem"] = problem[:300]
+
+        if problem is None:
+            return result
+        if last:
+            logging.info(f"{task} on the {tier} model: {problem}; keeping the answer")
+            return result
+        logging.info(f"{task} on the {tier} model: {problem}; escalating to {tiers[position + 1]}")
@@ -0,0 +1,120 @@
+import re
+import logging
+from src.backend.core.config import FILES_METADATA
+from src.backend.services.fact_store import MONTH_MAP, period_quarter
+
+#Phrases that identify each metric in a question (longest phrases first)
+METRIC_SYNONYMS = {
+    "Gross Profit": ["gross profit", "gross margin"],
+    "COGS": ["cogs", "cost of goods sold", "cost of sales", "cost of revenue"],
+    "Operating Expenses": ["operating expenses", "operating expense", "opex", "distribution costs", "administrative expenses"],
+    "Operating Income": ["operating income", "operating profit", "profit from operations", "operating margin", "ebit"],
+    "Net Income": ["net income", "net profit", "profit for the period", "net margin", "net earnings", "profit after tax"],
+    "Revenue": ["revenue", "sales", "turnover", "top line"]
+}
+
+#Phrases that identify each company besides its symbol
+COMPANY_ALIASES = {
+    "DIPD": ["dipped products", "dipped", "dipd"],
+    "REXP": ["richard pieris", "richard", "rexp"]
+}
+
+#Phrases that ask for a ratio to revenue (longest phrases first)
+RATIO_PHRASES = {
+    "gross_margin": ["gross profit margin", "gross margin"],
+    "operating_margin": ["operating profit margin", "operating margin", "ebit margin"],
+    "net_margin": ["net profit margin", "net margin", "profit margin"],
+    "opex_ratio": ["operating expense ratio", "opex ratio", "expense ratio"]
+}
+
+#Phrases that ask for a derived view of a metric, checked in order so plain "growth" means YoY last
+TRANSFORM_PHRASES = {
+    "qoq": ["qoq", "quarter over quarter", "quarter-over-quarter", "quarter on quarter", "quarter-on-quarter", "sequential"],
+    "cagr": ["cagr", "compound annual growth"],
+    "ttm": ["ttm", "trailing twelve months", "trailing 12 months", "last twelve months", "last 12 months"],
+    "zscore": ["z-score", "z score", "zscore"],
+    "yoy": ["yoy", "year over year", "year-over-year", "year on year", "year-on-year", "annual growth", "growth"]
+}
+
+QUARTER_WORDS = {"first": 1, "second": 2, "third": 3, "fourth": 4, "1st": 1, "2nd": 2, "3rd": 3, "4th": 4}
+
+#Extract symbols, metrics, years and quarters mentioned in a question
+def parse_query_filters(query: str) -> dict:
+    text = query.lower()
+    filters = {"symbols": [], "metrics": [], "years": [], "quarters": []}
+
+    #Companies
+    for symbol, metadata in ((m["symbol"], m) for m in FILES_METADATA.values()):
+        aliases = COMPANY_ALIASES.get(symbol, []) + [symbol.lower(), metadata["company"].lower()]
+        if any(re.search(rf"\b{re.escape(alias)}\b", text) for alias in aliases):
+            filters["symbols"].append(symbol)
+
+    #Metrics, consuming matched phrases so "gross profit" does not also match "profit"
+    remaining = text
+    for metric, phrases in METRIC_SYNONYMS.items():
+        for phrase in phrases:
+            pattern = rf"\b{re.escape(phrase)}\b"
+            if re.search(pattern, remaining):
+                filters["metrics"].append(metric)
+                remaining = re.sub(pattern, " ", remaining)
+                break
+
+    #Margins are ratios to revenue, so revenue is needed as well
+    if "margin" in text and filters["metrics"] and "Revenue" not in filters["metrics"]:
+        filters["metrics"].append("Revenue")
+
+    #Explicit periods such as 06/2024
+    for month, year in re.findall(r"\b(0?[1-9]|1[0-2])/(20\d{2})\b", text):
+        filters["years"].append(int(year))
+        filters["quarters"].append(period_quarter(f"{int(month):02d}/{year}"))
+    text_without_periods = re.sub(r"\b\d{1,2}/20\d{2}\b", " ", text)
+
+    #Month names followed by a year, e.g. "June 2024" (full names or abbreviations, so "margin 2024" is not March)
+    month_pattern = r"\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)(?:uary|ruary|ch|il|e|y|ust|t|tember|ober|ember)?\.?\s+(20\d{2})\b"
+    for month_name, year in re.findall(month_pattern, text_without_periods):
+        filters["quarters"].append(period_quarter(f"{MONTH_MAP[month_name.title()]}/{year}"))
+
+    #Bare years
+    filters["years"].extend(int(year) for year in re.findall(r"\b(20\d{2})\b", text_without_periods))
+
+    #Quarters written as Q2 or "second quarter"
+    filters["quarters"].extend(int(q) for q in re.findall(r"\bq([1-4])\b", text))
+    for word, number in QUARTER_WORDS.items():
+        if re.search(rf"\b{word}\s+quarter\b", text):
+            filters["quarters"].append(number)
+
+    #Deduplicate while keeping order
+    filters = {key: list(dict.fromkeys(values)) for key, values in filters.items()}
+    logging.info(f"Parsed query filters: {filters}")
+    return filters
+
+#Convert parsed filters to a Pinecone metadata filter for per-fact documents
+def to_pinecone_filter(filters: dict) -> dict:
+    field_map = {"symbols": "symbol", "metrics": "metric", "years": "year", "quarters": "quarter"}
+    pinecone_filter = {"doc_type": {"$eq": "fact"}}
+    for key, field in field_map.items():
+        values = filters.get(key) or []
+        if values:
+            pinecone_filter[field] = {"$in": values}
+    return pinecone_filter
+
+#Analytics measures a question asks for: a ratio, or a metric with an optional transform
+def parse_measures(query: str, filters: dict) -> list:
+    text = query.lower()
+
+    #Ratios, consuming matched phrases so "gross profit margin" does not also match "profit margin"
+    ratios, remaining = [], text
+    for name, phrases in RATIO_PHRASES.items():
+        for phrase in phrases:
+            pattern = rf"\b{re.escape(phrase)}\b"
+            if re.search(pattern, remaining):
+                ratios.append(name)
+                remaining = re.sub(pattern, " ", remaining)
+                break
+    if ratios:
+        return ratios
+
+    transform = next((name for name, phrases in TRANSFORM_PHRASES.items() if any(re.search(rf"\b{re.escape(phrase)}\b", text) for phrase in phrases)), None)
+    if not transform:
+        return list(filters["metrics"])
+    return [f"{metric.lower().replace(' ', '_')}_{transform}" for metric in filters["metrics"]]
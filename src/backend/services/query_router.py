@@ -0,0 +1,102 @@
+import re
+import logging
+from src.backend.core.config import FAST_PATH_ENABLED, FILES_METADATA
+from src.backend.services.query_filters import parse_query_filters, parse_measures
+from src.backend.services.analytics import lookup_measure, measure_label, format_measure, RATIO_DEFINITIONS
+
+#Questions that need reasoning or prose go to the agent even when they name a single measure
+DEFER_PATTERN = re.compile(r"\b(why|explain|reason|reasons|forecast|predict|should|recommend|compare|comparison|analy[sz]e|insight|insights|impact|cause)\b")
+
+#Measures summarised for a company when a question names none
+DEFAULT_MEASURES = list(RATIO_DEFINITIONS) + ["revenue_yoy", "net_income_yoy", "revenue_ttm", "net_income_ttm"]
+
+#Single MM/YYYY period of a question; (True, None) means "latest", (False, None) means ambiguous
+def resolve_period(filters: dict):
+    years, quarters = filters["years"], filters["quarters"]
+    if not years and not quarters:
+        return True, None
+    if len(years) == 1 and len(quarters) == 1:
+        return True, f"{quarters[0] * 3:02d}/{years[0]}"
+    return False, None
+
+#Every MM/YYYY period a question refers to; [None] means "latest"
+def candidate_periods(filters: dict) -> list:
+    years, quarters = filters["years"], filters["quarters"] or [1, 2, 3, 4]
+    if not years:
+        return [None] if not filters["quarters"] else []
+    return [f"{quarter * 3:02d}/{year}" for year in years for quarter in quarters]
+
+#Company names by symbol
+COMPANY_NAMES = {metadata["symbol"]: metadata["company"] for metadata in FILES_METADATA.values()}
+
+def company_name(symbol: str) -> str:
+    return f"{COMPANY_NAMES[symbol]} ({symbol})" if symbol in COMPANY_NAMES else symbol
+
+def describe_measure(symbol: str, measure: str, period: str = None):
+    result = lookup_measure(symbol, measure, period)
+    if result is None:
+        return None
+    found_period, value = result
+    return f"{company_name(symbol)} {measure_label(measure)} for {found_period}: {format_measure(measure, value)}"
+
+#Precomputed analytics lines for the companies, measures and period in a question
+def analytics_lines(query: str) -> list:
+    filters = parse_query_filters(query)
+    symbols = filters["symbols"] or sorted(COMPANY_NAMES)
+    measures = parse_measures(query, filters) or DEFAULT_MEASURES
+    periods = candidate_periods(filters)
+
+    lines = []
+    for symbol in symbols:
+        for measure in measures:
+            #CAGR spans the whole history
+            for period in ([None] if measure.endswith("_cagr") else periods):
+                line = describe_measure(symbol, measure, period)
+                if line:
+                    lines.append(line)
+    return lines
+
+#Tool: precomputed ratios and trends for the agent
+def get_financial_ratios(query: str) -> str:
+    logging.info(f"FinancialRatios tool called with query: {query}")
+    try:
+        lines = analytics_lines(query)
+        result = "\n".join(lines) if lines else "No precomputed ratios found for your query."
+        logging.info(f"FinancialRatios tool output: {result}")
+        return result
+
+    except Exception as e:
+        logging.error(f"Error in FinancialRatios tool: {e}")
+        return f"An error occurred while trying to look up financial ratios: {str(e)}"
+
+#Answer single-measure lookups straight from the analytics table; None sends the question to the agent
+def fast_path_answer(query: str):
+    try:
+        if not FAST_PATH_ENABLED or DEFER_PATTERN.search(query.lower()):
+            return None
+
+        filters = parse_query_filters(query)
+        measures = parse_measures(query, filters)
+        if not filters["symbols"] or len(measures) != 1:
+            return None
+
+        measure = measures[0]
+        resolved, period = resolve_period(filters)
+        if not resolved or (measure.endswith("_cagr") and period):
+            return None
+
+        lines = []
+        for symbol in filters["symbols"]:
+            line = describe_measure(symbol, measure, period)
+            #Missing values are left to the agent, which can explain what is available
+            if line is None:
+                return None
+            lines.append(line)
+
+        logging.info(f"Fast path answered {measure} for {filters['symbols']} ({period or 'latest'})")
+        return "\n".join(lines)
+
+    except Exception as e:
+        #Any failure here leaves the question to the agent
+        logging.error(f"Error in fast path router: {e}")
+        return None
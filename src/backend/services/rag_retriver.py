@@ -1,145 +1,181 @@
 import os
+import asyncio
 import logging
-from langchain_pinecone import PineconeVectorStore
-from langchain.chains.question_answering import load_qa_chain
-from langchain.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from pinecone import Pinecone
-from langchain.agents import Tool, initialize_agent, AgentType
-from langchain.chains import LLMMathChain
-from src.backend.core.config import GOOGLE_API_KEY, LLM_MODEL, EMBEDDING_MODEL, PINECONE_API_KEY, PINECONE_INDEX_NAME
-
-
-llm = ChatGoogleGenerativeAI(model=LLM_MODEL, google_api_key=GOOGLE_API_KEY, temperature=0)
-embeddings = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=GOOGLE_API_KEY)
-
-#Pinecone Setup
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(PINECONE_INDEX_NAME)
+import contextvars
+from src.backend.core.config import RAG_INDEX_MODE, ROW_RETRIEVER_TOP_K, FACT_RETRIEVER_TOP_K, RETRIEVER_STRATEGY
+from src.backend.services import container
+from src.backend.services.llm_model import get_llm
+from src.backend.services.vector_db import get_vector_store
+from src.backend.services.query_filters import parse_query_filters, to_pinecone_filter
+from src.backend.services.hybrid_search import hybrid_search, get_bm25_index
+from src.backend.services.context_budget import assemble_context
+from src.backend.services.query_router import get_financial_ratios
+from src.backend.services.tracing import span, TracingCallbackHandler
+
+
+#prompt template for formatting guidance
+QA_PROMPT_TEMPLATE = """You are a professional financial analyst with expertise in interpreting corporate financial data.
+
+CONTEXT INFORMATION:
+{context}
+
+USER QUESTION:
+{question}
+
+INSTRUCTIONS:
+1. Analyze the context carefully to find the exact information requested
+2. When discussing financial quarters, remember that Q1 ends in March, Q2 in June, Q3 in September, and Q4 in December
+3. Present monetary values with appropriate currency symbols and formatting
+4. Include year-over-year or quarter-over-quarter comparisons when that data is available
+5. If precise information isn't available in the context, acknowledge this and provide the closest relevant information
+6. For ratios and percentages, explain what they indicate about the company's performance
+7. If absolutely no relevant information is found, state: "I could not find that specific information in the available financial data."
+
+ANSWER:
+"""
+
+#Vector-only or hybrid search depending on the configured strategy
+def _retrieve(vector_store, query: str, search_query: str, k: int, metadata_filter: dict = None):
+    if RETRIEVER_STRATEGY == "hybrid":
+        return hybrid_search(vector_store, get_bm25_index(), query, search_query=search_query, k=k, metadata_filter=metadata_filter)
+    kwargs = {"filter": metadata_filter} if metadata_filter else {}
+    with span("vector_search", "vector_search", k=k) as vector_span:
+        docs = vector_store.similarity_search(search_query, k=k, **kwargs)
+        vector_span["attributes"]["results"] = len(docs)
+    return docs
+
+#Similarity search, pre-filtered by the companies, metrics and periods in the query
+def search_documents(vector_store, query: str):
+    search_query = f"Financial information about {query}"
+    if RAG_INDEX_MODE != "fact":
+        return _retrieve(vector_store, query, search_query, ROW_RETRIEVER_TOP_K)
+
+    metadata_filter = to_pinecone_filter(parse_query_filters(query))
+    docs = _retrieve(vector_store, query, search_query, FACT_RETRIEVER_TOP_K, metadata_filter)
+
+    #Relax the filter if the parsed constraints matched nothing
+    if not docs and len(metadata_filter) > 1:
+        logging.info(f"No documents matched filter {metadata_filter}, retrying without constraints")
+        docs = _retrieve(vector_store, query, search_query, FACT_RETRIEVER_TOP_K, {"doc_type": {"$eq": "fact"}})
+    return docs
+
+#Retrieve and assemble the context documents for a query
+def retrieve_documents(query: str):
+    vector_store = get_vector_store()
+
+    #Enhanced retrieval prompt to get more relevant context
+    docs = search_documents(vector_store, query)
+    if not docs:
+        return []
+
+    #Deduplicate, trim and fit the documents into the token budget
+    with span("assemble_context", "context") as context_span:
+        docs, tokens_in = assemble_context(docs, query, fixed_prompt=QA_PROMPT_TEMPLATE)
+        context_span["attributes"].update({"documents": len(docs), "prompt_tokens_estimate": tokens_in})
+    return docs
+
+#Conversation session or batch retrievals of the agent run in progress; the tools run in its thread,
+#which asyncio.to_thread starts with a copy of this context
+_retrieval_memory = contextvars.ContextVar("retrieval_memory", default=None)
 
 #Tool 1: Financial Data Retriever
 def get_financial_data(query: str) -> str:
-    print(f"\n---> FinancialDataRetriever Tool called with query: {query}")
+    logging.info(f"FinancialDataRetriever tool called with query: {query}")
     try:
-        vector_store = PineconeVectorStore(
-            index_name=PINECONE_INDEX_NAME,
-            embedding=embeddings,
-        )
-
-        #Enhanced retrieval prompt to get more relevant context
-        search_query = f"Financial information about {query}"
-        docs = vector_store.similarity_search(search_query, k=5)
+        memory = _retrieval_memory.get()
+        if memory is not None:
+            docs, reused = memory.retrieve(query)
+            logging.info(f"FinancialDataRetriever reused earlier documents: {reused}")
+        else:
+            docs = retrieve_documents(query)
         if not docs:
             return "No relevant financial information found for your query."
-        
-        #prompt template for formatting guidance
-        qa_prompt_template = """
-        You are a professional financial analyst with expertise in interpreting corporate financial data. 
-        
-        CONTEXT INFORMATION:
-        {context}
-        
-        USER QUESTION: 
-        {question}
-        
-        INSTRUCTIONS:
-        1. Analyze the context carefully to find the exact information requested
-        2. When discussing financial quarters, remember that Q1 ends in March, Q2 in June, Q3 in September, and Q4 in December
-        3. Present monetary values with appropriate currency symbols and formatting
-        4. Include year-over-year or quarter-over-quarter comparisons when that data is available
-        5. If precise information isn't available in the context, acknowledge this and provide the closest relevant information
-        6. For ratios and percentages, explain what they indicate about the company's performance
-        7. If absolutely no relevant information is found, state: "I could not find that specific information in the available financial data."
-        
-        ANSWER:
-        """
-        
-        prompt = PromptTemplate(
-            input_variables=["context", "question"],
-            template=qa_prompt_template
-        )
 
         #Run chain
-        chain = load_qa_chain(llm, chain_type="stuff", prompt=prompt)
-        response = chain.invoke({"input_documents": docs, "question": query})
+        chain = container.get("qa_chain")
+        response = chain.invoke({"input_documents": docs, "question": query}, config={"callbacks": [TracingCallbackHandler()]})
         result = response.get("output_text", "Could not process the financial data.")
-        print(f"---> FinancialDataRetriever Tool output: {result}")
+        logging.info(f"FinancialDataRetriever tool output: {result}")
         return result
 
     except Exception as e:
         logging.error(f"Error in FinancialDataRetriever tool: {e}")
         return f"An error occurred while trying to retrieve financial data: {str(e)}"
 
-#Tool register
-financial_data_retriever_tool = Tool(
-    name="FinancialDataRetriever",
-    func=get_financial_data,
-    description="""Use this tool to find specific financial information such as revenue, profit margins, EBITDA, operating income, 
-    expenses, debt, cash flow, balance sheet items, or other financial metrics for a company at a specific date or period. 
-    The tool works best when you provide the company name, specific financial metric, and time period in your query. 
-    Remember that financial quarters end in March (Q1), June (Q2), September (Q3), and December (Q4)."""
-)
-
-#Tool 2: Calculator
-calculator_chain = LLMMathChain.from_llm(llm=llm, verbose=True)
-calculator_tool = Tool(
-    name="Calculator",
-    func=calculator_chain.run,
-    description="""Use this tool for financial calculations including:
-    - Basic arithmetic (addition, subtraction, multiplication, division)
-    - Percentage calculations (growth rates, profit margins, etc.)
-    - Financial ratios (P/E, debt-to-equity, current ratio, etc.)
-    - Time value of money calculations (NPV, IRR, compound interest)
-    - Weighted averages and other financial metrics
-    Provide the complete mathematical expression to evaluate."""
-)
-
-
-#Tools
-tools = [financial_data_retriever_tool, calculator_tool]
-
-# Standard ZERO_SHOT_REACT_DESCRIPTION agent without custom prompt
-agent_executor = initialize_agent(
-    tools=tools,
-    llm=llm,
-    agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-    verbose=True,
-    handle_parsing_errors=True,
-    max_iterations=10,
-    early_stopping_method="generate"
-)
-
-#system message to enhance the agent behavior
-system_message = """You are a professional financial analyst assistant with expertise in corporate finance, financial reporting, and investment analysis.
-
-Your primary goal is to provide accurate, detailed financial insights based on available company data.
-
-Important financial guidelines:
-- Financial quarters end in March (Q1), June (Q2), September (Q3), and December (Q4)
-- When calculating growth rates, use (New Value - Old Value) / Old Value * 100%
-- Distinguish between absolute values and percentages
-- Provide context when sharing financial metrics (industry averages, historical trends)
-- Be precise with financial terminology and transparent about data limitations
-
-When analyzing financial data:
-1. First retrieve the necessary raw financial information
-2. Perform any required calculations to derive meaningful insights
-3. Interpret the results in business context
-4. Present findings clearly with appropriate financial terminology
-5. Note any important caveats or limitations in the data
-
-Remember to approach all financial questions methodically and precisely.
-Provide answers ONLY for financial problems and greetings. For Other cases say you are not aware."""
-
-#Set the system message for the LLM
-llm.client.system = system_message
-
-#Query handler
-async def query_process_agent(query: str)-> str:
+#Stuff QA chain over the retrieved documents
+@container.register("qa_chain")
+def build_qa_chain():
+    from langchain.chains.question_answering import load_qa_chain
+    from langchain.prompts import PromptTemplate
+    prompt = PromptTemplate(
+        input_variables=["context", "question"],
+        template=QA_PROMPT_TEMPLATE
+    )
+    return load_qa_chain(get_llm("qa"), chain_type="stuff", prompt=prompt)
+
+#Standard ZERO_SHOT_REACT_DESCRIPTION agent without custom prompt
+@container.register("agent_executor")
+def build_agent_executor():
+    from langchain.agents import Tool, initialize_agent, AgentType
+    from langchain.chains import LLMMathChain
+    llm = get_llm("agent")
+
+    #Tool register
+    financial_data_retriever_tool = Tool(
+        name="FinancialDataRetriever",
+        func=get_financial_data,
+        description="""Use this tool to find specific financial information such as revenue, profit margins, EBITDA, operating income, 
+        expenses, debt, cash flow, balance sheet items, or other financial metrics for a company at a specific date or period. 
+        The tool works best when you provide the company name, specific financial metric, and time period in your query. 
+        Remember that financial quarters end in March (Q1), June (Q2), September (Q3), and December (Q4)."""
+    )
+
+    #Tool 2: Calculator
+    calculator_chain = LLMMathChain.from_llm(llm=llm, verbose=True)
+    calculator_tool = Tool(
+        name="Calculator",
+        func=calculator_chain.run,
+        description="""Use this tool for financial calculations including:
+        - Basic arithmetic (addition, subtraction, multiplication, division)
+        - Percentage calculations (growth rates, profit margins, etc.)
+        - Financial ratios (P/E, debt-to-equity, current ratio, etc.)
+        - Time value of money calculations (NPV, IRR, compound interest)
+        - Weighted averages and other financial metrics
+        Provide the complete mathematical expression to evaluate."""
+    )
+
+    #Tool 3: Precomputed ratios and trends
+    financial_ratios_tool = Tool(
+        name="FinancialRatios",
+        func=get_financial_ratios,
+        description="""Use this tool first for precomputed financial ratios and trends: gross, operating and net profit margins, 
+        operating expense ratio, quarter-over-quarter and year-over-year growth, trailing twelve months (TTM) totals, 
+        compound annual growth rate (CAGR) and z-scores of any metric. Provide the company name, the ratio or metric and the period. 
+        Without a period the latest reported quarter is returned."""
+    )
+
+    #Tools
+    tools = [financial_data_retriever_tool, calculator_tool, financial_ratios_tool]
+
+    return initialize_agent(
+        tools=tools,
+        llm=llm,
+        agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
+        verbose=True,
+        handle_parsing_errors=True,
+        max_iterations=10,
+        early_stopping_method="generate"
+    )
+
+#Query handler; memory is a conversation session or a batch's shared retrievals, reused by the data tool
+async def query_process_agent(query: str, memory=None)-> str:
     logging.info(f"\nFinancial Analyst Assistant")
     logging.info(f"Question: {query}")
+    memory_token = _retrieval_memory.set(memory)
     try:
-        response = agent_executor.invoke({"input": query})
+        agent_executor = await asyncio.to_thread(container.get, "agent_executor")
+        #The agent loop blocks on every LLM and tool call, so it runs in a worker thread
+        response = await asyncio.to_thread(agent_executor.invoke, {"input": query}, config={"callbacks": [TracingCallbackHandler()]})
         final_answer = response.get("output", "The financial analyst could not determine an answer.")
         logging.info(f"\nFinancial Analysis Result: {final_answer}")
         return final_answer
@@ -151,3 +187,5 @@ async def query_process_agent(query: str)-> str:
             error_message = str(e).split("Could not parse LLM output:")[1].strip()
             logging.info(f"LLM Parsing Error Detail: {error_message}")
         return f"financial analyst got an error: {str(e)}"
+    finally:
+        _retrieval_memory.reset(memory_token)
@@ -1,62 +1,129 @@
 import os
-import pandas as pd
+import asyncio
 import logging
-from langchain_pinecone import PineconeVectorStore, Pinecone
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
-from langchain_community.vectorstores import Pinecone
-from pinecone import Pinecone, ServerlessSpec
-from src.backend.services.llm_model import embeddings
-from src.backend.core.config import PINECONE_API_KEY, FILES_METADATA, PROCESSED_CSV_DATA_PATH, PINECONE_INDEX_NAME
+from src.backend.services.vector_db import get_vector_store, ensure_index, delete_stale_facts
+from src.backend.services.fact_store import load_fact_frame
+from src.backend.core.config import FILES_METADATA, PROCESSED_CSV_DATA_PATH, RAG_INDEX_MODE, COMPANY_CONFIGS
+
+#Stable vector id for a fact so re-ingesting overwrites instead of duplicating
+def fact_document_id(symbol, metric, period):
+    return f"{symbol}-{metric}-{period}".replace(" ", "_").replace("/", "-")
+
+#(symbol, metric, period) of the quarters the fact ledgers derive from year-to-date figures
+def derived_facts():
+    import pandas as pd
+    derived = set()
+    for symbol, config in COMPANY_CONFIGS.items():
+        ledger_csv = config.get("ledger_csv")
+        if not ledger_csv or not os.path.exists(ledger_csv):
+            continue
+        ledger = pd.read_csv(ledger_csv, dtype=str)
+        rows = ledger[ledger["status"] == "derived"]
+        derived.update((symbol, metric, period) for metric, period in zip(rows["metric"], rows["period"]))
+    return derived
+
+#How the page states a quarter: reported as a 3-month figure, or derived as the difference of year-to-date figures
+def fact_period_text(period, source):
+    if source == "derived":
+        return f"quarter ended {period}, derived from year-to-date figures"
+    return f"3 months ended {period}"
+
+#Build one compact document per (company, metric, period)
+def build_fact_documents(facts=None, derived=None):
+    """Converts the long-format fact table to small documents with typed metadata."""
+    facts = (load_fact_frame() if facts is None else facts).dropna(subset=["value"])
+    derived = derived_facts() if derived is None else derived
+    all_docs = []
+    for fact in facts.itertuples(index=False):
+        source = "derived" if (fact.symbol, fact.metric, fact.period) in derived else "reported"
+        page_content = (
+            f"{fact.company} ({fact.symbol}) {fact.metric} for Q{fact.quarter} {fact.year} "
+            f"({fact_period_text(fact.period, source)}): {fact.value:,.0f}"
+        )
+        doc_metadata = {
+            "doc_type": "fact",
+            "company": fact.company,
+            "symbol": fact.symbol,
+            "metric": fact.metric,
+            "period": fact.period,
+            "quarter": int(fact.quarter),
+            "year": int(fact.year),
+            "value": float(fact.value),
+            "source": source,
+            "source_file": fact.source_file,
+        }
+        all_docs.append(Document(
+            id=fact_document_id(fact.symbol, fact.metric, fact.period),
+            page_content=page_content,
+            metadata=doc_metadata
+        ))
+
+    logging.info(f"Total fact documents created: {len(all_docs)}")
+    if all_docs:
+        logging.info(f"Sample fact document: {all_docs[0].page_content}")
+    return all_docs
+
+#Build one document per csv row containing every period
+def build_row_documents():
+    """Loads CSVs, converts rows to text, and adds metadata."""
+    import pandas as pd
+    all_docs = []
+    for filename, metadata in FILES_METADATA.items():
+        logging.info(f"file name: {filename}")
+        file_path = os.path.join(PROCESSED_CSV_DATA_PATH, filename)
+        #Skip missing files
+        if not os.path.exists(file_path):
+            logging.info(f"Warning: File {file_path} not found. Skipping.")
+            continue
+
+        try:
+            #see data
+            df = pd.read_csv(file_path)
+            logging.info(f"df {filename}: {df.head()}")
+            logging.info(f"Loaded {filename} with {len(df)} rows.")
+        except Exception as e:
+            logging.info(f"Error loading {filename}: {e}")
+            continue
+
+        for index, row in df.iterrows():
+            #Prepend company information to the page_content
+            company_info = f"Company: {metadata['company']} ({metadata['symbol']}). Data Point: {row.get('Data Point Name', 'N/A')}."
+            
+            #Remove 'Data Point Name' from content_parts if it's already handled.
+            row_data_string = ", ".join([f"{col}: {val}" for col, val in row.drop('Data Point Name', errors='ignore').dropna().items()])
+            page_content = f"{company_info} Values: {row_data_string}"
+            
+            #Add metadata
+            doc_metadata = metadata.copy() 
+            doc_metadata["doc_type"] = "row"
+            doc_metadata["source_file"] = filename
+            doc_metadata["row_index"] = index 
+            
+            # Add data point name to metadata
+            if 'Data Point Name' in row:
+                doc_metadata['data_point_name'] = str(row['Data Point Name'])
+            if 'Year' in row:
+                doc_metadata['year'] = str(row['Year'])
+
+            all_docs.append(Document(page_content=page_content, metadata=doc_metadata))
+    
+    logging.info(f"Total documents created before splitting: {len(all_docs)}")
+    if all_docs:
+        logging.info(f"Sample document content before splitting: {all_docs[0].page_content}")
+        logging.info(f"Sample document metadata before splitting: {all_docs[0].metadata}")
+    return all_docs
+
+#Build the documents for the configured index mode
+def build_documents(mode=RAG_INDEX_MODE):
+    if mode == "fact":
+        return build_fact_documents()
+    return build_row_documents()
 
 #load and convert csv files
-async def load_and_prepare_documents():
+async def load_and_prepare_documents(mode=RAG_INDEX_MODE):
     try:
-        """Loads CSVs, converts rows to text, and adds metadata."""
-        all_docs = []
-        for filename, metadata in FILES_METADATA.items():
-            logging.info(f"file name: {filename}")
-            file_path = os.path.join(PROCESSED_CSV_DATA_PATH, filename)
-            #Skip missing files
-            if not os.path.exists(file_path):
-                logging.info(f"Warning: File {file_path} not found. Skipping.")
-                continue
-
-            try:
-                #see data
-                df = pd.read_csv(file_path)
-                logging.info(f"df {filename}: {df.head()}")
-                logging.info(f"Loaded {filename} with {len(df)} rows.")
-            except Exception as e:
-                logging.info(f"Error loading {filename}: {e}")
-                continue
-
-            for index, row in df.iterrows():
-                #Prepend company information to the page_content
-                company_info = f"Company: {metadata['company']} ({metadata['symbol']}). Data Point: {row.get('Data Point Name', 'N/A')}."
-                
-                #Remove 'Data Point Name' from content_parts if it's already handled.
-                row_data_string = ", ".join([f"{col}: {val}" for col, val in row.drop('Data Point Name', errors='ignore').dropna().items()])
-                page_content = f"{company_info} Values: {row_data_string}"
-                
-                #Add metadata
-                doc_metadata = metadata.copy() 
-                doc_metadata["source_file"] = filename
-                doc_metadata["row_index"] = index 
-                
-                # Add data point name to metadata
-                if 'Data Point Name' in row:
-                    doc_metadata['data_point_name'] = str(row['Data Point Name'])
-                if 'Year' in row:
-                    doc_metadata['year'] = str(row['Year'])
-
-                all_docs.append(Document(page_content=page_content, metadata=doc_metadata))
-        
-        logging.info(f"Total documents created before splitting: {len(all_docs)}")
-        if all_docs:
-            logging.info(f"Sample document content before splitting: {all_docs[0].page_content}")
-            logging.info(f"Sample document metadata before splitting: {all_docs[0].metadata}")
-        return all_docs
+        return await asyncio.to_thread(build_documents, mode)
     except Exception as e:
         logging.error(f"Error in loading and prepairing docs: {e}")
         return
@@ -66,6 +133,7 @@ async def load_and_prepare_documents():
 async def split_documents(documents):
     try:
         """Splits documents into smaller chunks."""
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=2000,
             chunk_overlap=0,
@@ -81,21 +149,9 @@ async def split_documents(documents):
 #Main pipeline for loading, processing, and storing document
 async def rag_pipeline():
     logging.info("strat rag pipeline")
-    pc = Pinecone(
-        api_key=PINECONE_API_KEY
-    )
     try:
         #check the pinecone index
-        if PINECONE_INDEX_NAME not in pc.list_indexes().names():
-            pc.create_index(
-                name=PINECONE_INDEX_NAME,
-                dimension=768,
-                metric='cosine',
-                spec=ServerlessSpec(
-                    cloud='aws',
-                    region='us-east-1'
-                )
-            )
+        await asyncio.to_thread(ensure_index)
     except Exception as e:
         logging.error(f"Error creating Pinecone index: {e}")
         return
@@ -108,9 +164,12 @@ async def rag_pipeline():
         logging.info("No documents loaded. Exiting.")
         return
 
-    #Split Documents
-    logging.info("Splitting documents...")
-    chunked_documents = await split_documents(raw_documents)
+    #Split Documents (per-fact documents are already small)
+    if RAG_INDEX_MODE == "fact":
+        chunked_documents = raw_documents
+    else:
+        logging.info("Splitting documents...")
+        chunked_documents = await split_documents(raw_documents)
     if not chunked_documents:
         logging.info("No documents to process after splitting. Exiting.")
         return
@@ -118,15 +177,13 @@ async def rag_pipeline():
     logging.info(f"Sample chunk 0 metadata: {chunked_documents[0].metadata if chunked_documents else 'N/A'}")
     logging.info(f"Sample chunk 0 content: {chunked_documents[0].page_content[:100] if chunked_documents else 'N/A'}...")
 
-    index_name = PINECONE_INDEX_NAME
-
     try:
         #Embed and store into Pinecone index
-        PineconeVectorStore.from_documents(
-            documents=chunked_documents,
-            embedding=embeddings,
-            index_name=index_name,
-        )
+        ids = [doc.id for doc in chunked_documents] if RAG_INDEX_MODE == "fact" else None
+        await asyncio.to_thread(get_vector_store().add_documents, chunked_documents, ids=ids)
+        if ids:
+            symbols = sorted(metadata["symbol"] for metadata in FILES_METADATA.values())
+            await asyncio.to_thread(delete_stale_facts, symbols, set(ids))
 
         logging.info("Embeddings stored successfully in Pinecone.")
 
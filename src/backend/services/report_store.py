@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+from contextlib import contextmanager
+from src.backend.core.config import RAW_STORE_DIR, CATALOGUE_DIR
+from src.backend.services.file_io import atomic_write, FileLock
+
+#Content-addressed store of raw reports: one immutable blob per distinct file, however many urls serve it
+def blob_path(sha256):
+    return os.path.join(RAW_STORE_DIR, "blobs", sha256[:2], f"{sha256}.pdf")
+
+#Store report bytes once; returns the hash and whether the blob is new
+def put_blob(content: bytes):
+    sha256 = hashlib.sha256(content).hexdigest()
+    path = blob_path(sha256)
+    if os.path.exists(path):
+        return sha256, False
+    with atomic_write(path, "wb") as f:
+        f.write(content)
+    return sha256, True
+
+#Working copy of a blob in a company's input directory; a hard link where the filesystem allows it
+def materialize(sha256, path):
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    try:
+        os.link(blob_path(sha256), path)
+    except OSError:
+        shutil.copyfile(blob_path(sha256), path)
+
+#Reports are named by their content, so a filename always means the same report
+def report_filename(symbol, sha256):
+    return f"financial_report_{symbol}_{sha256[:12]}.pdf"
+
+#Per-company catalogue: source url -> {sha256, filename, period, bytes, downloaded_at}
+def catalogue_path(symbol):
+    return os.path.join(CATALOGUE_DIR, f"{symbol}.json")
+
+def load_catalogue(symbol):
+    path = catalogue_path(symbol)
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.info(f"Ignoring unreadable catalogue {path}: {e}")
+    return {"symbol": symbol, "reports": {}}
+
+def save_catalogue(catalogue):
+    with atomic_write(catalogue_path(catalogue["symbol"])) as f:
+        json.dump(catalogue, f, indent=2)
+
+#Read-modify-write of a catalogue; scrapes and the ingest pipeline both update it
+@contextmanager
+def edit_catalogue(symbol):
+    with FileLock(f"catalogue_{symbol}"):
+        catalogue = load_catalogue(symbol)
+        yield catalogue
+        save_catalogue(catalogue)
+
+#Record a downloaded url. Content already in the catalogue under another url keeps that report's
+#filename, so a re-posted filing never reaches the ingest pipeline twice. Returns (filename, new report)
+def record_download(catalogue, url, sha256, size):
+    existing = next((entry for entry in catalogue["reports"].values() if entry.get("sha256") == sha256), None)
+    filename = existing["filename"] if existing else report_filename(catalogue["symbol"], sha256)
+    catalogue["reports"][url] = {
+        "sha256": sha256,
+        "filename": filename,
+        "period": existing.get("period") if existing else None,
+        "bytes": size,
+        "downloaded_at": time.time(),
+    }
+    return filename, existing is None
+
+#Catalogued urls whose report is still in the input directory; a missing working copy is restored from
+#its blob, and entries from before the blob store get their hash and blob here
+def known_urls(catalogue, report_dir):
+    known = set()
+    for url, entry in catalogue["reports"].items():
+        path = os.path.join(report_dir, entry["filename"])
+        if not entry.get("sha256") and os.path.exists(path):
+            with open(path, "rb") as f:
+                entry["sha256"], _ = put_blob(f.read())
+        if entry.get("sha256") and os.path.exists(blob_path(entry["sha256"])):
+            materialize(entry["sha256"], path)
+        if os.path.exists(path):
+            known.add(url)
+    return known
+
+#Reports named by row position from before the catalogue, moved into the store under their content name.
+#A legacy file is only removed once a working copy with exactly its sha256 is catalogued and in place
+def migrate_legacy(catalogue, report_dir, pattern):
+    catalogued = {entry["filename"] for entry in catalogue["reports"].values()}
+    migrated = []
+    for filename in sorted(os.listdir(report_dir)):
+        if not pattern.fullmatch(filename) or filename in catalogued:
+            continue
+        path = os.path.join(report_dir, filename)
+        with open(path, "rb") as f:
+            content = f.read()
+        sha256, _ = put_blob(content)
+        target, _ = record_download(catalogue, f"legacy/{filename}", sha256, len(content))
+        target_path = os.path.join(report_dir, target)
+        materialize(sha256, target_path)
+        if target == filename:
+            continue
+        with open(target_path, "rb") as f:
+            materialized = hashlib.sha256(f.read()).hexdigest() == sha256
+        if materialized and os.path.exists(blob_path(sha256)):
+            os.remove(path)
+            migrated.append(filename)
+    return migrated
+
+#Period the ingest parsed from a report, recorded on every url serving it
+def record_period(symbol, filename, period):
+    if not period or period == "Unknown":
+        return
+    with edit_catalogue(symbol) as catalogue:
+        for entry in catalogue["reports"].values():
+            if entry["filename"] == filename:
+                entry["period"] = period
+
+#When each report first appeared in the catalogue, by filename; a later one is the later publication
+def download_times(symbol):
+    times = {}
+    for entry in load_catalogue(symbol)["reports"].values():
+        downloaded_at = entry.get("downloaded_at") or 0
+        times[entry["filename"]] = min(times.get(entry["filename"], downloaded_at), downloaded_at)
+    return times
+
+#Catalogued reports of a company, optionally for one MM/YYYY period
+def catalogued_reports(symbol, period=None):
+    reports = [{"url": url, **entry} for url, entry in load_catalogue(symbol)["reports"].items()]
+    return [report for report in reports if period is None or report.get("period") == period]
@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from src.backend.core.config import COMPANY_CONFIGS, SCRAPE_INTERVAL, SCRAPE_SYMBOL_CONCURRENCY, SCRAPE_INGEST_NEW
+from src.backend.services.file_io import FileLock
+from src.backend.services.web_scrape import sync_reports
+from src.backend.services.report_store import load_catalogue
+from src.backend.services.ingest_pipeline import STAGES, checkpoint_path, start_ingest
+from src.backend.services.tracing import start_trace
+
+#Scheduler task of this worker and the result of the latest check
+_scheduler = {"task": None, "leader": None, "last_check": None}
+
+#Delta check of one company; skipped while a manual scrape of it holds the scrape lock
+async def check_symbol(symbol, semaphore):
+    async with semaphore:
+        try:
+            return await asyncio.to_thread(sync_reports, COMPANY_CONFIGS[symbol]["profile_url"], False, False)
+        except Exception as e:
+            logging.error(f"Error checking filings of {symbol}: {e}")
+            return {"symbol": symbol, "error": str(e)}
+
+#Catalogued reports the ingest has not taken through every stage, e.g. downloaded while an ingest was running
+def pending_reports():
+    pending = []
+    for symbol in COMPANY_CONFIGS:
+        #Urls serving the same file share one report
+        for filename in sorted({entry["filename"] for entry in load_catalogue(symbol)["reports"].values()}):
+            try:
+                with open(checkpoint_path(symbol, filename)) as f:
+                    stages = json.load(f)["stages"]
+            except (OSError, ValueError, KeyError):
+                stages = {}
+            if not all(stage in stages for stage in STAGES):
+                pending.append(f"{symbol}/{filename}")
+    return pending
+
+#Same cross-worker lock as the visualize route; a busy pipeline leaves the reports for the next check
+def start_pending_ingest():
+    pipeline_lock = FileLock("visualize_pipeline")
+    if not pipeline_lock.acquire(blocking=False):
+        logging.info("Ingest pipeline already running, new filings are ingested on the next check")
+        return None
+    try:
+        return start_ingest(on_finish=pipeline_lock.release)
+    except Exception:
+        pipeline_lock.release()
+        raise
+
+#Check every company with bounded concurrency, then ingest whatever is new or still unprocessed
+async def check_filings(symbols=None, ingest=SCRAPE_INGEST_NEW) -> dict:
+    symbols = list(symbols or COMPANY_CONFIGS)
+    started = time.perf_counter()
+    with start_trace("filing_check", symbols=",".join(symbols)):
+        semaphore = asyncio.Semaphore(SCRAPE_SYMBOL_CONCURRENCY)
+        results = await asyncio.gather(*(check_symbol(symbol, semaphore) for symbol in symbols))
+        new_reports = sum(len(result.get("downloaded", [])) for result in results)
+
+        run = None
+        pending = await asyncio.to_thread(pending_reports) if ingest else []
+        if pending:
+            logging.info(f"{len(pending)} reports waiting for ingest")
+            run = start_pending_ingest()
+
+    summary = {
+        "checked_at": time.time(),
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        "new_reports": new_reports,
+        "pending_reports": len(pending),
+        "ingest_run": run.run_id if run else None,
+        "symbols": results,
+    }
+    _scheduler["last_check"] = summary
+    logging.info(f"Filing check: {new_reports} new reports, ingest run {summary['ingest_run']}")
+    return summary
+
+async def scheduler_loop(interval):
+    while True:
+        try:
+            await check_filings()
+        except Exception as e:
+            logging.error(f"Error in scheduled filing check: {e}")
+        await asyncio.sleep(interval)
+
+#Only one worker schedules checks; the others find the leader lock taken
+def start_scheduler(interval=SCRAPE_INTERVAL):
+    leader = FileLock("scrape_scheduler")
+    if not leader.acquire(blocking=False):
+        logging.info(f"Filing checks are scheduled by another worker (pid {os.getpid()} skips)")
+        return None
+    _scheduler["leader"] = leader
+    _scheduler["task"] = asyncio.create_task(scheduler_loop(interval))
+    logging.info(f"Checking CSE listings for new filings every {interval:.0f}s")
+    return _scheduler["task"]
+
+def stop_scheduler():
+    task = _scheduler["task"]
+    if task and not task.done():
+        task.cancel()
+    if _scheduler["leader"]:
+        _scheduler["leader"].release()
+    _scheduler["task"] = _scheduler["leader"] = None
+
+def last_check():
+    return _scheduler["last_check"]
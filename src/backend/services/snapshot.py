@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+from src.backend.core.config import SNAPSHOT_DIR, SNAPSHOT_KEEP
+from src.backend.services.file_io import atomic_write, FileLock
+
+#Arrow IPC files of one snapshot version; the analytics frames are stored with their index as columns
+SNAPSHOT_FILES = {"facts": "facts.arrow", "table": "analytics.arrow", "cagr": "cagr.arrow"}
+SNAPSHOT_INDEX = {"table": ["symbol", "date"], "cagr": ["symbol", "measure"]}
+CURRENT_FILE = "CURRENT"
+
+def current_path():
+    return os.path.join(SNAPSHOT_DIR, CURRENT_FILE)
+
+#NaN stays a float value instead of becoming null, so float columns map back to numpy without a copy
+def _arrow_table(frame):
+    import pyarrow as pa
+    return pa.table({
+        str(name): pa.array(frame[name].to_numpy(), from_pandas=frame[name].dtype.kind != "f")
+        for name in frame.columns
+    })
+
+def _write_arrow(path, frame):
+    import pyarrow as pa
+    table = _arrow_table(frame)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    data = sink.getvalue().to_pybytes()
+    with open(path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return hashlib.sha256(data).hexdigest()
+
+def _fsync_dir(path):
+    if os.name == "nt":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def list_versions():
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return []
+    return sorted(name for name in os.listdir(SNAPSHOT_DIR)
+                  if not name.startswith(".") and os.path.isdir(os.path.join(SNAPSHOT_DIR, name)))
+
+#Old versions stay on disk for workers still reading them; mapped files survive the delete on POSIX
+def prune_versions(current):
+    stale = [version for version in list_versions()[:-SNAPSHOT_KEEP] if version != current]
+    for version in stale:
+        shutil.rmtree(os.path.join(SNAPSHOT_DIR, version), ignore_errors=True)
+    return stale
+
+#Write facts and analytics from the processed csvs into a new immutable version and point CURRENT at it.
+#The version directory is complete before it is renamed into place, and CURRENT is replaced atomically,
+#so every worker sees either the previous snapshot or the new one
+def publish_snapshot() -> str:
+    from src.backend.services.fact_store import load_fact_frame
+    from src.backend.services.analytics import compute_analytics
+
+    facts = load_fact_frame()
+    analytics = compute_analytics(facts)
+    frames = {"facts": facts, "table": analytics["table"].reset_index(), "cagr": analytics["cagr"].reset_index()}
+
+    with FileLock("snapshot"):
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        staging = os.path.join(SNAPSHOT_DIR, f".staging-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        os.makedirs(staging)
+        try:
+            digest = hashlib.sha256()
+            for name, filename in SNAPSHOT_FILES.items():
+                digest.update(_write_arrow(os.path.join(staging, filename), frames[name]).encode())
+            digest = digest.hexdigest()[:12]
+
+            #Unchanged data keeps the current version, so worker caches stay warm
+            current = read_current()
+            if current and current.endswith(f"-{digest}") and os.path.isdir(os.path.join(SNAPSHOT_DIR, current)):
+                logging.info(f"Snapshot {current} is unchanged")
+                return current
+
+            version = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{digest}"
+            with open(os.path.join(staging, "manifest.json"), "w") as f:
+                json.dump({
+                    "version": version,
+                    "created_at": time.time(),
+                    "files": SNAPSHOT_FILES,
+                    "index": SNAPSHOT_INDEX,
+                    "facts": len(facts),
+                    "company_quarters": len(analytics["table"]),
+                }, f, indent=2)
+            _fsync_dir(staging)
+            if os.path.isdir(os.path.join(SNAPSHOT_DIR, version)):
+                shutil.rmtree(staging)
+            else:
+                os.replace(staging, os.path.join(SNAPSHOT_DIR, version))
+            with atomic_write(current_path()) as f:
+                f.write(version)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        pruned = prune_versions(version)
+    logging.info(f"Published snapshot {version} with {len(facts)} facts" + (f", pruned {len(pruned)} old versions" if pruned else ""))
+    return version
+
+def read_current():
+    try:
+        with open(current_path()) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+#Version CURRENT points at; the file is only re-read when its inode or mtime changes
+_current_cache = {"state": (None, None)}
+
+def current_version():
+    try:
+        stat = os.stat(current_path())
+    except FileNotFoundError:
+        return None
+    pointer = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    cached_pointer, version = _current_cache["state"]
+    if cached_pointer != pointer:
+        version = read_current()
+        _current_cache["state"] = (pointer, version)
+    return version
+
+#Memory-map one version; numeric columns without nulls stay views on the mapped file
+def load_snapshot(version):
+    import pyarrow as pa
+    from src.backend.services.analytics import with_lookups
+
+    directory = os.path.join(SNAPSHOT_DIR, version)
+    frames = {}
+    for name, filename in SNAPSHOT_FILES.items():
+        table = pa.ipc.open_file(pa.memory_map(os.path.join(directory, filename), "r")).read_all()
+        frame = table.to_pandas(split_blocks=True)
+        if name in SNAPSHOT_INDEX:
+            frame = frame.set_index(SNAPSHOT_INDEX[name])
+        frames[name] = frame
+    return {"version": version, "facts": frames["facts"], "analytics": with_lookups({"table": frames["table"], "cagr": frames["cagr"]})}
+
+#Snapshot this worker serves; swaps to the new version on the first read after CURRENT moves
+_snapshot_lock = threading.Lock()
+_snapshot_cache = {"snapshot": None}
+
+def get_snapshot():
+    version = current_version()
+    if version is None:
+        return None
+    snapshot = _snapshot_cache["snapshot"]
+    if snapshot is not None and snapshot["version"] == version:
+        return snapshot
+
+    with _snapshot_lock:
+        snapshot = _snapshot_cache["snapshot"]
+        if snapshot is None or snapshot["version"] != version:
+            try:
+                snapshot = load_snapshot(version)
+            except (OSError, ValueError) as e:
+                #Keep serving the version already loaded, if any
+                logging.error(f"Error loading snapshot {version}: {e}")
+                return snapshot
+            _snapshot_cache["snapshot"] = snapshot
+            logging.info(f"Serving snapshot {version} with {len(snapshot['facts'])} facts")
+        return snapshot
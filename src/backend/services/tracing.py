@@ -0,0 +1,270 @@
+import time
+import uuid
+import threading
+import contextvars
+from collections import deque, defaultdict
+from contextlib import contextmanager
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+from src.backend.core.config import TRACE_BUFFER_SIZE
+from src.backend.services.context_budget import estimate_tokens
+
+#Histogram buckets in seconds, shared by request and span latencies
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+#Completed traces, oldest dropped first
+_traces = deque(maxlen=TRACE_BUFFER_SIZE)
+_traces_lock = threading.Lock()
+
+#Aggregates for the Prometheus endpoint, keyed by (kind, name)
+_histograms = defaultdict(lambda: {"buckets": [0] * len(LATENCY_BUCKETS), "sum": 0.0, "count": 0})
+_tokens = defaultdict(int)
+_errors = defaultdict(int)
+_metrics_lock = threading.Lock()
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+def _observe(kind: str, name: str, seconds: float, error: bool = False, tokens_in: int = 0, tokens_out: int = 0):
+    with _metrics_lock:
+        histogram = _histograms[(kind, name)]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += seconds
+        histogram["count"] += 1
+        if error:
+            _errors[(kind, name)] += 1
+        if tokens_in:
+            _tokens[(kind, name, "in")] += tokens_in
+        if tokens_out:
+            _tokens[(kind, name, "out")] += tokens_out
+
+#Id of the trace active in this context, if any
+def current_trace_id():
+    trace = _current_trace.get()
+    return trace["trace_id"] if trace else None
+
+#Open a span under the current span; returns None when no trace is active
+def open_span(name: str, kind: str, parent_id: str = None, **attributes):
+    trace = _current_trace.get()
+    if trace is None:
+        return None
+    parent = _current_span.get()
+    span = {
+        "span_id": uuid.uuid4().hex[:16],
+        "parent_id": parent_id or (parent["span_id"] if parent else None),
+        "name": name,
+        "kind": kind,
+        "start_offset_ms": round((time.perf_counter() - trace["_start"]) * 1000, 3),
+        "duration_ms": None,
+        "attributes": dict(attributes),
+        "error": None,
+        "_start": time.perf_counter(),
+    }
+    with trace["_lock"]:
+        trace["spans"].append(span)
+    return span
+
+def close_span(span, error: BaseException = None):
+    if span is None:
+        return
+    seconds = time.perf_counter() - span.pop("_start")
+    span["duration_ms"] = round(seconds * 1000, 3)
+    if error is not None:
+        span["error"] = str(error)
+    attributes = span["attributes"]
+    _observe(span["kind"], span["name"], seconds, error is not None,
+             int(attributes.get("tokens_in") or 0), int(attributes.get("tokens_out") or 0))
+
+#Time a block as a child span of the current span
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes):
+    current = open_span(name, kind, **attributes)
+    token = _current_span.set(current) if current else None
+    try:
+        yield current if current is not None else {"attributes": {}}
+    except BaseException as e:
+        close_span(current, e)
+        raise
+    else:
+        close_span(current)
+    finally:
+        if token is not None:
+            _current_span.reset(token)
+
+#Record one request as a trace; kept in the ring buffer when it finishes
+@contextmanager
+def start_trace(name: str, **attributes):
+    trace = {
+        "trace_id": uuid.uuid4().hex,
+        "name": name,
+        "started_at": time.time(),
+        "duration_ms": None,
+        "attributes": dict(attributes),
+        "error": None,
+        "spans": [],
+        "_start": time.perf_counter(),
+        "_lock": threading.Lock(),
+    }
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    error = None
+    try:
+        yield trace
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        seconds = time.perf_counter() - trace["_start"]
+        trace["duration_ms"] = round(seconds * 1000, 3)
+        trace["error"] = str(error) if error is not None else None
+        _observe("request", name, seconds, error is not None)
+        with _traces_lock:
+            _traces.append(trace)
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+def _public(trace):
+    return {key: value for key, value in trace.items() if not key.startswith("_")}
+
+#Look up a buffered trace by id
+def get_trace(trace_id: str):
+    with _traces_lock:
+        for trace in _traces:
+            if trace["trace_id"] == trace_id:
+                with trace["_lock"]:
+                    result = _public(trace)
+                    result["spans"] = [_public(span) for span in trace["spans"]]
+                return result
+    return None
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+#Summaries of buffered traces and the p50/p95 per stage
+def latency_breakdown():
+    with _traces_lock:
+        traces = list(_traces)
+
+    stages = defaultdict(list)
+    for trace in traces:
+        stages[("request", trace["name"])].append(trace["duration_ms"])
+        for span in list(trace["spans"]):
+            if span["duration_ms"] is not None:
+                stages[(span["kind"], span["name"])].append(span["duration_ms"])
+
+    return {
+        "traces": [
+            {"trace_id": t["trace_id"], "name": t["name"], "started_at": t["started_at"],
+             "duration_ms": t["duration_ms"], "spans": len(t["spans"]), "error": t["error"]}
+            for t in reversed(traces)
+        ],
+        "stages": [
+            {"kind": kind, "name": name, "count": len(durations),
+             "p50_ms": _percentile(durations, 0.5), "p95_ms": _percentile(durations, 0.95)}
+            for (kind, name), durations in sorted(stages.items())
+        ],
+    }
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+#Prometheus text exposition format
+def render_prometheus() -> str:
+    lines = [
+        "# HELP agent_stage_duration_seconds Duration of requests and traced stages.",
+        "# TYPE agent_stage_duration_seconds histogram",
+    ]
+    with _metrics_lock:
+        for (kind, name), histogram in sorted(_histograms.items()):
+            labels = f'kind="{_label_value(kind)}",name="{_label_value(name)}"'
+            for bound, count in zip(LATENCY_BUCKETS, histogram["buckets"]):
+                lines.append(f'agent_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'agent_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram["count"]}')
+            lines.append(f"agent_stage_duration_seconds_sum{{{labels}}} {histogram['sum']:.6f}")
+            lines.append(f"agent_stage_duration_seconds_count{{{labels}}} {histogram['count']}")
+
+        lines.append("# HELP agent_stage_errors_total Failed requests and stages.")
+        lines.append("# TYPE agent_stage_errors_total counter")
+        for (kind, name), count in sorted(_errors.items()):
+            lines.append(f'agent_stage_errors_total{{kind="{_label_value(kind)}",name="{_label_value(name)}"}} {count}')
+
+        lines.append("# HELP agent_tokens_total Tokens sent to and received from models.")
+        lines.append("# TYPE agent_tokens_total counter")
+        for (kind, name, direction), count in sorted(_tokens.items()):
+            lines.append(f'agent_tokens_total{{kind="{_label_value(kind)}",name="{_label_value(name)}",direction="{direction}"}} {count}')
+
+    lines.append("# HELP agent_traces_buffered Traces currently held in the ring buffer.")
+    lines.append("# TYPE agent_traces_buffered gauge")
+    lines.append(f"agent_traces_buffered {len(_traces)}")
+    return "\n".join(lines) + "\n"
+
+#LangChain callbacks: one span per LLM call and tool call
+class TracingCallbackHandler(BaseCallbackHandler):
+    def __init__(self):
+        self._spans = {}
+
+    def _start(self, run_id, parent_run_id, name, kind, **attributes):
+        parent = self._spans.get(parent_run_id)
+        current = open_span(name, kind, parent_id=parent["span"]["span_id"] if parent else None, **attributes)
+        if current is not None:
+            self._spans[run_id] = {"span": current, "previous": _current_span.get()}
+            #Spans opened inside a tool function nest under the tool span
+            if kind == "tool":
+                _current_span.set(current)
+
+    def _end(self, run_id, error=None, **attributes):
+        entry = self._spans.pop(run_id, None)
+        if entry is None:
+            return
+        entry["span"]["attributes"].update(attributes)
+        if entry["span"]["kind"] == "tool":
+            _current_span.set(entry["previous"])
+        close_span(entry["span"], error)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        name = (kwargs.get("invocation_params") or {}).get("model") or (serialized or {}).get("name", "llm")
+        self._start(run_id, parent_run_id, name, "llm", tokens_in=sum(estimate_tokens(p) for p in prompts), estimated=True)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        name = (kwargs.get("invocation_params") or {}).get("model") or (serialized or {}).get("name", "llm")
+        text = " ".join(str(m.content) for batch in messages for m in batch)
+        self._start(run_id, parent_run_id, name, "llm", tokens_in=estimate_tokens(text), estimated=True)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        attributes = {}
+        try:
+            message = response.generations[0][0].message
+            usage = getattr(message, "usage_metadata", None) or {}
+            if usage:
+                attributes = {"tokens_in": usage.get("input_tokens", 0), "tokens_out": usage.get("output_tokens", 0), "estimated": False}
+        except (AttributeError, IndexError):
+            pass
+        self._end(run_id, **attributes)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, (serialized or {}).get("name", "tool"), "tool", input=input_str[:500])
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+#Embeddings wrapper that records a span per embedding call
+class TracedEmbeddings(Embeddings):
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def embed_query(self, text):
+        with span("embed_query", "embedding", texts=1):
+            return self.embeddings.embed_query(text)
+
+    def embed_documents(self, texts):
+        with span("embed_documents", "embedding", texts=len(texts)):
+            return self.embeddings.embed_documents(texts)
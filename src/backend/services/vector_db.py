@@ -0,0 +1,60 @@
+import logging
+from src.backend.core.config import PINECONE_API_KEY, PINECONE_INDEX_NAME
+from src.backend.services import container
+from src.backend.services.llm_model import get_embeddings
+
+#Pinecone Setup
+@container.register("pinecone_client")
+def build_pinecone_client():
+    from pinecone import Pinecone
+    return Pinecone(api_key=PINECONE_API_KEY)
+
+@container.register("pinecone_index")
+def build_pinecone_index():
+    return container.get("pinecone_client").Index(PINECONE_INDEX_NAME)
+
+@container.register("vector_store")
+def build_vector_store():
+    from langchain_pinecone import PineconeVectorStore
+    return PineconeVectorStore(index=container.get("pinecone_index"), embedding=get_embeddings())
+
+def get_vector_store():
+    return container.get("vector_store")
+
+#Create the serverless index on first ingest
+def ensure_index():
+    from pinecone import ServerlessSpec
+    pc = container.get("pinecone_client")
+    if PINECONE_INDEX_NAME not in pc.list_indexes().names():
+        logging.info(f"Creating Pinecone index {PINECONE_INDEX_NAME}")
+        pc.create_index(
+            name=PINECONE_INDEX_NAME,
+            dimension=768,
+            metric='cosine',
+            spec=ServerlessSpec(
+                cloud='aws',
+                region='us-east-1'
+            )
+        )
+
+#Delete a company's fact vectors whose ids are not in keep_ids, e.g. quarters the current ledger no longer
+#resolves, so stale values cannot be retrieved. Fact ids start with the symbol
+def delete_stale_facts(symbols, keep_ids, batch_size=1000):
+    index = get_vector_store().index
+    stale = [vector_id for symbol in symbols for page in index.list(prefix=f"{symbol}-") for vector_id in page if vector_id not in keep_ids]
+    for start in range(0, len(stale), batch_size):
+        index.delete(ids=stale[start:start + batch_size])
+    if stale:
+        logging.info(f"Deleted {len(stale)} fact vectors no longer in the dataset: {stale[:10]}")
+    return len(stale)
+
+#Upsert documents whose embeddings are already computed, with the text under the key PineconeVectorStore reads back
+def upsert_embedded(documents, vectors, batch_size=100):
+    index = get_vector_store().index
+    entries = [
+        {"id": doc.id, "values": vector, "metadata": {**doc.metadata, "text": doc.page_content}}
+        for doc, vector in zip(documents, vectors)
+    ]
+    for start in range(0, len(entries), batch_size):
+        index.upsert(vectors=entries[start:start + batch_size])
+    return len(entries)
@@ -1,30 +1,71 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
 import os
 import re
-import requests
+import math
+import asyncio
 import logging
+from src.backend.services import container
+from src.backend.services.file_io import FileLock
+from src.backend.services.report_store import edit_catalogue, known_urls, put_blob, materialize, record_download, migrate_legacy
+from src.backend.core.config import COMPANY_CONFIGS, HISTORY_QUARTERS, EXTRACTION_MODE
 
-async def web_scrape(url):
-    #Set up headless Chrome inside the function
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")
+#Headless Chrome factory; each scrape gets its own driver
+@container.register("browser_factory")
+def build_browser_factory():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    def new_driver():
+        chrome_options = Options()
+        chrome_options.add_argument("--headless")
+        return webdriver.Chrome(options=chrome_options)
+    return new_driver
+
+#Shared HTTP session so report downloads reuse connections
+@container.register("http_session")
+def build_http_session():
+    import requests
+    return requests.Session()
+
+#Newest report links to read from the Financials tab
+def links_needed(history_quarters=HISTORY_QUARTERS, mode=EXTRACTION_MODE):
+    if mode != "multi":
+        return history_quarters
+    return 8 * math.ceil(history_quarters / 8) - 4
+
+#Report links to download, newest first, as (row index, url). Each report also carries the prior-year
+#quarter in multi-period mode, so taking four quarters and skipping the next four covers the same history
+#with about half the reports
+def select_report_links(links, history_quarters=HISTORY_QUARTERS, mode=EXTRACTION_MODE):
+    links = links[:links_needed(history_quarters, mode)]
+    if mode != "multi":
+        return list(enumerate(links))
+    return [(i, link) for i, link in enumerate(links) if (i // 4) % 2 == 0]
+
+#Reports named by the old row-position scheme, moved into the raw report store on the next scrape
+def legacy_report_pattern(symbol):
+    return re.compile(rf"financial_report_{re.escape(symbol)}_\d+\.pdf")
+
+def symbol_from_url(url):
+    match = re.search(r"symbol=([A-Z]+)\.N0000", url)
+    return match.group(1) if match else "UNKNOWN"
 
-    driver = webdriver.Chrome(options=chrome_options)
+def report_dir(symbol):
+    if symbol in COMPANY_CONFIGS:
+        return COMPANY_CONFIGS[symbol]["input_dir"]
+    return os.path.join("data", "unprocess_data")
+
+#Newest report links on the Financials tab of a company profile page
+def list_report_links(url, needed):
+    #Selenium is only needed when a scrape actually runs
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
+    #Set up headless Chrome inside the function
+    driver = container.get("browser_factory")()
     wait = WebDriverWait(driver, 15)
 
     try:
-        #Extract company symbol from URL
-        match = re.search(r"symbol=([A-Z]+)\.N0000", url)
-        if match:
-            exact_company = match.group(1)
-            logging.info(f"exact_company: {exact_company}")
-        else:
-            exact_company = "UNKNOWN"
-
         #Load the web page
         driver.get(url)
 
@@ -36,45 +77,109 @@ async def web_scrape(url):
             (By.XPATH, '//*[@id="21b"]/div/div/div/table/tbody/tr')
         ))
 
-        #Find the first 12 PDF links from the financials section
+        #Find the PDF links from the financials section
         pdf_links = []
         #Check more rows just in case
-        for i in range(1, 15):
+        for i in range(1, needed + 3):
             try:
                 xpath = f'//*[@id="21b"]/div/div/div/table/tbody/tr[{i}]/td[2]/div/div[2]/a[1]'
                 link_element = driver.find_element(By.XPATH, xpath)
                 href = link_element.get_attribute("href")
                 if href and href.endswith(".pdf"):
                     pdf_links.append(href)
-                if len(pdf_links) == 12:
+                if len(pdf_links) == needed:
                     break
             except:
                 continue
+        return pdf_links
 
-        #Create output directory
-        if exact_company in ['REXP', 'DIPD']:
-            output_dir = os.path.join("data", "unprocess_data", exact_company)
-        else:
-            output_dir = os.path.join("data", "unprocess_data")
+    finally:
+        #Clean up the browser
+        driver.quit()
 
-        os.makedirs(output_dir, exist_ok=True)
+#Links to download: a full scrape fills in the whole history window, a delta check only takes
+#filings listed above the newest report already downloaded
+def wanted_links(links, known, full=True):
+    if full or not known.intersection(links):
+        return [link for _, link in select_report_links(links) if link not in known]
+    wanted = []
+    for link in links:
+        if link in known:
+            break
+        wanted.append(link)
+    return wanted
 
-        #Download and save PDFs
-        logging.info("Found PDF links:")
-        for i, pdf_url in enumerate(pdf_links, start=1):
-            logging.info(f"[{i}] {pdf_url}")
-            response = requests.get(pdf_url)
-            filename = os.path.join(output_dir, f"financial_report_{exact_company}_{i}.pdf")
-            with open(filename, "wb") as f:
-                f.write(response.content)
-            logging.info(f"Saved: {filename}")
+def download_report(url):
+    response = container.get("http_session").get(url)
+    response.raise_for_status()
+    return response.content
 
-        return f"Web scrape completed for {exact_company}."
+#Compare the listing with the catalogue and download what is missing. Scrapes of one company never overlap:
+#a manual scrape waits for a running one, a scheduled check (blocking=False) skips the company instead
+def sync_reports(url, full=True, blocking=True) -> dict:
+    symbol = symbol_from_url(url)
+    scrape_lock = FileLock(f"scrape_{symbol}")
+    if not scrape_lock.acquire(blocking=blocking):
+        logging.info(f"Scrape for {symbol} already running, skipping its filing check")
+        return {"symbol": symbol, "skipped": "scrape already running"}
+    try:
+        return _sync_reports(symbol, url, full)
+    finally:
+        scrape_lock.release()
+
+#The catalogue lock is held only to read and update the catalogue, not through the listing and downloads,
+#so the ingest can record periods and read the catalogue while a scrape runs
+def _sync_reports(symbol, url, full):
+    logging.info(f"exact_company: {symbol}")
+    output_dir = report_dir(symbol)
+    os.makedirs(output_dir, exist_ok=True)
+    migrated = []
+    with edit_catalogue(symbol) as catalogue:
+        #Row-position names from before the catalogue are stored first, so a download of the same filing is
+        #recognised as a copy instead of being ingested twice
+        if symbol in COMPANY_CONFIGS:
+            migrated = migrate_legacy(catalogue, output_dir, legacy_report_pattern(symbol))
+            if migrated:
+                logging.info(f"Moved {len(migrated)} reports named by row position into the report store: {migrated}")
+        known = known_urls(catalogue, output_dir)
+
+    links = list_report_links(url, links_needed())
+    fetched, failed = [], []
+    for pdf_url in wanted_links(links, known, full):
+        try:
+            content = download_report(pdf_url)
+        except Exception as e:
+            logging.error(f"Error downloading {pdf_url}: {e}")
+            failed.append(pdf_url)
+            continue
+        sha256, _ = put_blob(content)
+        fetched.append((pdf_url, sha256, len(content)))
+
+    downloaded, duplicates = [], []
+    with edit_catalogue(symbol) as catalogue:
+        for pdf_url, sha256, size in fetched:
+            filename, new_report = record_download(catalogue, pdf_url, sha256, size)
+            materialize(sha256, os.path.join(output_dir, filename))
+            if new_report:
+                downloaded.append(filename)
+                logging.info(f"Saved: {filename} from {pdf_url}")
+            else:
+                #Same bytes under another url: catalogued, but nothing new for the ingest
+                duplicates.append(pdf_url)
+                logging.info(f"{pdf_url} is a copy of {filename}")
+
+    return {"symbol": symbol, "listed": len(links), "downloaded": downloaded, "duplicates": duplicates,
+            "failed": failed, "migrated": migrated}
+
+#Selenium and the downloads block, so the scrape runs in a worker thread
+async def web_scrape(url):
+    return await asyncio.to_thread(scrape_reports, url)
+
+def scrape_reports(url):
+    try:
+        result = sync_reports(url, full=True)
+        return f"Web scrape completed for {result['symbol']}: {len(result['downloaded'])} new reports."
 
     except Exception as e:
         logging.error(f"Error occured in web scraping: {e}")
         return f"Error occured in web scraping: {str(e)}"
-
-    finally:
-        #Clean up the browser
-        driver.quit()
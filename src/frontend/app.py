@@ -50,182 +50,142 @@ if st.session_state.scrape_complete and not st.session_state.visualization_ready
         except requests.exceptions.RequestException as e:
             st.error(f"Request failed: {e}")
 
-#Load and process data
-if st.session_state.visualization_ready:
-    dipd_df = pd.read_csv("data/processed_csv/dipd_processed_financial_data.csv")
-    rexp_df = pd.read_csv("data/processed_csv/rexp_processed_financial_data.csv")
-
-    #format column date
-    month_map = {
-        "Jan": "01", "Feb": "02", "Mar": "03", "Apr": "04",
-        "May": "05", "Jun": "06", "Jul": "07", "Aug": "08",
-        "Sep": "09", "Oct": "10", "Nov": "11", "Dec": "12"
-    }
-
-    orig_columns = dipd_df.columns[1:]
-    formatted_columns = []
-    for col in orig_columns:
-        #Remove all non-alphanumeric characters
-        clean_col = ''.join(filter(str.isalnum, col))  #e.g. "Mar2022", "June2023", "032022"
-        
-        #Handle 3-letter month + 4-digit year (e.g. Mar2022)
-        month_abbr = clean_col[:3].title()
-        year = clean_col[-4:]
-        
-        if month_abbr in month_map:
-            month = month_map[month_abbr]
-            formatted_columns.append(f"{month}/{year}")
-        else:
-            #numeric format, assume MMYYYY
-            if len(clean_col) == 6:  #e.g. "032022"
-                formatted_columns.append(f"{clean_col[:2]}/{clean_col[-4:]}")
-            else:
-                #fallback to original
-                formatted_columns.append(col)  
+#Fetch dashboard series; the ETag cache in session state turns unchanged data into a 304
+def fetch_dashboard_series(start=None, end=None):
+    params = {key: value for key, value in {"start": start, "end": end}.items() if value}
+    cache_key = f"{start}-{end}"
+    cache = st.session_state.setdefault("dashboard_cache", {})
+    cached = cache.get(cache_key)
+    headers = {"If-None-Match": cached["etag"]} if cached else {}
+
+    response = requests.get(f"http://localhost:8000/dashboard/{API_VERSION}/series", params=params, headers=headers)
+    if response.status_code == 304 and cached:
+        return cached["etag"], cached["payload"]
+    if response.status_code != 200:
+        raise requests.exceptions.RequestException(response.json().get("detail", "Unknown error"))
+
+    etag = response.headers.get("ETag", "")
+    cache[cache_key] = {"etag": etag, "payload": response.json()}
+    return etag, cache[cache_key]["payload"]
+
+#Long-format frame of one metric across companies
+def metric_frame(payload, metric):
+    return pd.DataFrame([
+        {"Date": period, "Value": value, "Company": symbol}
+        for symbol in payload["symbols"]
+        for period, value in zip(payload["periods"], payload["series"][symbol].get(metric, []))
+    ])
 
+#Figures depend only on the payload version, so reruns with the same ETag reuse them
+@st.cache_data(max_entries=32)
+def build_figures(etag, _payload):
+    payload = _payload
+    series = payload["series"]
+    figures = {}
+
+    symbols_label = " vs ".join(payload["symbols"])
+    figures["revenue"] = px.line(metric_frame(payload, "Revenue"), x="Date", y="Value", color="Company",
+                                 title=f"Revenue Trend - {symbols_label}")
+    figures["net_income"] = px.line(metric_frame(payload, "Net Income"), x="Date", y="Value", color="Company",
+                                    title=f"Net Income Trend - {symbols_label}")
+
+    for symbol in payload["symbols"]:
+        #Revenue vs Cost
+        figures[f"rev_cost_{symbol}"] = px.scatter(
+            x=series[symbol].get("Revenue", []), y=series[symbol].get("COGS", []),
+            labels={"x": "Revenue", "y": "Cost"}, title=f"Revenue vs Cost - {symbol}"
+        )
+        #Income vs Expenses
+        figures[f"income_exp_{symbol}"] = px.scatter(
+            x=series[symbol].get("Operating Income", []), y=series[symbol].get("Operating Expenses", []),
+            labels={"x": "Operational Income", "y": "Operating Expenses"}, title=f"Income vs Expenses - {symbol}"
+        )
+
+    #Revenue Distribution (DIPD) and Net Income Distribution (REXP)
+    if "DIPD" in series:
+        figures["revenue_dist"] = px.pie(names=payload["periods"], values=series["DIPD"].get("Revenue", []),
+                                         title="Revenue Distribution - DIPD")
+    if "REXP" in series:
+        figures["net_income_dist"] = px.pie(names=payload["periods"], values=series["REXP"].get("Net Income", []),
+                                            title="Net Income Distribution - REXP")
+    return figures
+
+def format_amount(value):
+    return f"Rs. {value:,.2f}" if value is not None else "N/A"
+
+def format_ratio(value):
+    return f"{value} %" if value is not None else "N/A"
 
-    dipd_df.columns = ["Data Point Name"] + formatted_columns
-    rexp_df.columns = ["Data Point Name"] + formatted_columns
-        
-    #Convert to datetime for filtering
+#Load and process data
+if st.session_state.visualization_ready:
     try:
-        date_columns_dt = pd.to_datetime(formatted_columns, format='%m/%Y')
+        _, full_payload = fetch_dashboard_series()
+    except requests.exceptions.RequestException as e:
+        st.error(f"Request failed: {e}")
+        st.stop()
 
-    except ValueError as e:
-        st.error(f"Date parsing error: {e}")
+    available_range = full_payload["available_range"]
+    if not available_range["start"]:
+        st.info("No processed financial data available yet.")
         st.stop()
 
     #Date range slider
+    date_min = pd.to_datetime(available_range["start"], format="%m/%Y").date()
+    date_max = pd.to_datetime(available_range["end"], format="%m/%Y").date()
     st.subheader("Financial Dashboard")
     selected_range = st.slider(
         "Select Date Range:",
-        min_value=date_columns_dt.min().date(),
-        max_value=date_columns_dt.max().date(),
-        value=(date_columns_dt.min().date(), date_columns_dt.max().date())
+        min_value=date_min,
+        max_value=date_max,
+        value=(date_min, date_max)
     )
 
-    #Filter data based on range
-    filtered_date_strs = [
-        dt.strftime('%m/%Y') for dt in date_columns_dt
-        if selected_range[0] <= dt.date() <= selected_range[1]
-    ]
-    existing_columns = [col for col in filtered_date_strs if col in dipd_df.columns]
-    filtered_columns = ["Data Point Name"] + existing_columns
-
-    dipd_filtered = dipd_df.loc[:, filtered_columns]
-    rexp_filtered = rexp_df.loc[:, filtered_columns]
+    #Filter data based on range (server side)
+    try:
+        etag, payload = fetch_dashboard_series(selected_range[0].strftime("%m/%Y"), selected_range[1].strftime("%m/%Y"))
+    except requests.exceptions.RequestException as e:
+        st.error(f"Request failed: {e}")
+        st.stop()
 
     #KPI metrics
+    latest = payload["latest"]
     kpi = st.columns(4)
-    kpi[0].metric("DIPD - Revenue", f"Rs. {dipd_filtered.iloc[0, -1]:,.2f}")
-    kpi[1].metric("DIPD - Net Income", f"Rs. {dipd_filtered.iloc[5, -1]:,.2f}")
-    kpi[2].metric("REXP - Revenue", f"Rs. {rexp_filtered.iloc[0, -1]:,.2f}")
-    kpi[3].metric("REXP - Net Income", f"Rs. {rexp_filtered.iloc[5, -1]:,.2f}")
+    kpi_cells = [(symbol, metric) for symbol in payload["symbols"][:2] for metric in ("Revenue", "Net Income")]
+    for column, (symbol, metric) in zip(kpi, kpi_cells):
+        yoy = latest.get(symbol, {}).get(f"{metric.lower().replace(' ', '_')}_yoy")
+        column.metric(f"{symbol} - {metric}", format_amount(latest.get(symbol, {}).get(metric)),
+                      delta=f"{yoy} % YoY" if yoy is not None else None)
 
     #Financial ratios
-    ratios = st.columns(4)
-
-    def get_ratio(numerator, denominator):
-        try:
-            return round((numerator / denominator) * 100, 2)
-        except ZeroDivisionError:
-            return 0.0
-
-    gross_profit_margin = get_ratio(
-        dipd_filtered.iloc[0, -1] - dipd_filtered.iloc[1, -1], dipd_filtered.iloc[0, -1]
-    )
-    operating_margin = get_ratio(
-        dipd_filtered.iloc[4, -1], dipd_filtered.iloc[0, -1]
-    )
-    net_profit_margin = get_ratio(
-        dipd_filtered.iloc[5, -1], dipd_filtered.iloc[0, -1]
-    )
-    opex_ratio = get_ratio(
-        dipd_filtered.iloc[3, -1], dipd_filtered.iloc[0, -1]
-    )
-
-    ratios[0].metric("Gross Profit Margin", f"{gross_profit_margin} %")
-    ratios[1].metric("Operating Margin", f"{operating_margin} %")
-    ratios[2].metric("Net Profit Margin", f"{net_profit_margin} %")
-    ratios[3].metric("Operating Expense Ratio", f"{opex_ratio} %")
+    for symbol in payload["symbols"]:
+        ratios = st.columns(4)
+        company_latest = latest.get(symbol, {})
+        ratios[0].metric(f"{symbol} - Gross Profit Margin", format_ratio(company_latest.get("gross_margin")))
+        ratios[1].metric(f"{symbol} - Operating Margin", format_ratio(company_latest.get("operating_margin")))
+        ratios[2].metric(f"{symbol} - Net Profit Margin", format_ratio(company_latest.get("net_margin")))
+        ratios[3].metric(f"{symbol} - Operating Expense Ratio", format_ratio(company_latest.get("opex_ratio")))
 
     #Visualization charts
-
-    #Revenue
-    combined_revenue_df = pd.concat([
-        dipd_filtered[dipd_filtered["Data Point Name"] == "Revenue"].melt(
-            id_vars=["Data Point Name"], var_name="Date", value_name="Value"
-        ).assign(Company="DIPD"),
-        rexp_filtered[rexp_filtered["Data Point Name"] == "Revenue"].melt(
-            id_vars=["Data Point Name"], var_name="Date", value_name="Value"
-        ).assign(Company="REXP")
-    ])
-    fig_revenue_combined = px.line(
-        combined_revenue_df, x="Date", y="Value", color="Company",
-        title="Revenue Trend - DIPD vs REXP"
-    )
-
-    #Net Income
-    combined_net_income_df = pd.concat([
-        dipd_filtered[dipd_filtered["Data Point Name"] == "Net Income"].melt(
-            id_vars=["Data Point Name"], var_name="Date", value_name="Value"
-        ).assign(Company="DIPD"),
-        rexp_filtered[rexp_filtered["Data Point Name"] == "Net Income"].melt(
-            id_vars=["Data Point Name"], var_name="Date", value_name="Value"
-        ).assign(Company="REXP")
-    ])
-    fig_net_income_combined = px.line(
-        combined_net_income_df, x="Date", y="Value", color="Company",
-        title="Net Income Trend - DIPD vs REXP"
-    )
-
-    #Revenue vs Cost
-    fig_dipd_rev_cost = px.scatter(
-        x=dipd_filtered.iloc[0, 1:], y=dipd_filtered.iloc[1, 1:],
-        labels={"x": "Revenue", "y": "Cost"}, title="Revenue vs Cost - DIPD"
-    )
-    fig_rexp_rev_cost = px.scatter(
-        x=rexp_filtered.iloc[0, 1:], y=rexp_filtered.iloc[1, 1:],
-        labels={"x": "Revenue", "y": "Cost"}, title="Revenue vs Cost - REXP"
-    )
-
-    #Income vs Expenses
-    fig_dipd_income_exp = px.scatter(
-        x=dipd_filtered.iloc[4, 1:], y=dipd_filtered.iloc[3, 1:],
-        labels={"x": "Operational Income", "y": "Operating Expenses"},
-        title="Income vs Expenses - DIPD"
-    )
-    fig_rexp_income_exp = px.scatter(
-        x=rexp_filtered.iloc[4, 1:], y=rexp_filtered.iloc[3, 1:],
-        labels={"x": "Operational Income", "y": "Operating Expenses"},
-        title="Income vs Expenses - REXP"
-    )
-
-    #Revenue Distribution (DIPD)
-    fig_dipd_revenue_dist = px.pie(
-        dipd_filtered[dipd_filtered["Data Point Name"] == "Revenue"].melt(var_name="Date", value_name="Value"),
-        names="Date", values="Value", title="Revenue Distribution - DIPD"
-    )
-
-    #Net Income Distribution (REXP)
-    fig_rexp_net_income_dist = px.pie(
-        rexp_filtered[rexp_filtered["Data Point Name"] == "Net Income"].melt(var_name="Date", value_name="Value"),
-        names="Date", values="Value", title="Net Income Distribution - REXP"
-    )
+    figures = build_figures(etag, payload)
 
     #Chart layout
     row3 = st.columns(4)
-    row3[0].plotly_chart(fig_revenue_combined, use_container_width=True, key="revenue_chart_1")
-    row3[1].plotly_chart(fig_net_income_combined, use_container_width=True, key="net_income_chart")
-
-    row3[2].plotly_chart(fig_rexp_rev_cost, use_container_width=True)
-    row3[3].plotly_chart(fig_dipd_rev_cost, use_container_width=True)
+    row3[0].plotly_chart(figures["revenue"], use_container_width=True, key="revenue_chart_1")
+    row3[1].plotly_chart(figures["net_income"], use_container_width=True, key="net_income_chart")
+    if "rev_cost_REXP" in figures:
+        row3[2].plotly_chart(figures["rev_cost_REXP"], use_container_width=True)
+    if "rev_cost_DIPD" in figures:
+        row3[3].plotly_chart(figures["rev_cost_DIPD"], use_container_width=True)
 
     row4 = st.columns(4)
-    row4[0].plotly_chart(fig_dipd_income_exp, use_container_width=True)
-    row4[1].plotly_chart(fig_rexp_income_exp, use_container_width=True)
-    row4[2].plotly_chart(fig_dipd_revenue_dist, use_container_width=True)
-    row4[3].plotly_chart(fig_rexp_net_income_dist, use_container_width=True)
+    if "income_exp_DIPD" in figures:
+        row4[0].plotly_chart(figures["income_exp_DIPD"], use_container_width=True)
+    if "income_exp_REXP" in figures:
+        row4[1].plotly_chart(figures["income_exp_REXP"], use_container_width=True)
+    if "revenue_dist" in figures:
+        row4[2].plotly_chart(figures["revenue_dist"], use_container_width=True)
+    if "net_income_dist" in figures:
+        row4[3].plotly_chart(figures["net_income_dist"], use_container_width=True)
 
 
 #Chatbot Section
@@ -233,10 +193,12 @@ st.subheader("Chatbot")
 user_query = st.text_input("Enter Your Query")
 
 if st.button("Submit"):
-    payload = {"query": user_query}
+    #The session id lets the backend resolve follow-up questions against earlier ones
+    payload = {"query": user_query, "session_id": st.session_state.get("chat_session_id")}
     try:
         response = requests.post(f"http://localhost:8000/query/{API_VERSION}/query_data", json=payload)
         if response.status_code == 200:
+            st.session_state.chat_session_id = response.headers.get("X-Session-Id")
             data = response.json()
             st.success(f"Answer: {data}")
         else: